@@ -0,0 +1,335 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Feedback Event Scheduler
+#
+# The only feedback of the live loops was the text drawn into the OpenCV window, inside the same loop as the
+# inference. This module turns the results of the loops into feedback events and delivers them away from it:
+#
+# * **FeedbackScheduler** - the loop reports its labels and rep counts, and the scheduler turns them into events
+#   (a pose achieved, a hold time reached, a rep completed, a flow completed). Handing an event over is a put on a
+#   bounded queue that never blocks: when the queue is full the event is dropped and counted.
+# * A dispatcher thread drops the events already delivered within the last few seconds, like a pose flickering in
+#   and out, and passes the others to every sink.
+# * Every sink runs on a thread of its own with a small queue of its own, and takes at most one event per
+#   min_interval seconds. The events that come in meanwhile wait their turn, and a newer event about the same
+#   subject replaces the one waiting, so the sink says "rep 5" rather than every rep it missed. A sink that falls
+#   behind drops its oldest events, stale feedback is worse than none, and never holds up the other sinks or the
+#   loop.
+# * **ConsoleSink**, **WebPushSink** (a JSON POST to a URL) and **SpeechSink** (a text-to-speech stub that takes
+#   as long as saying the message would) are the sinks.
+#
+# Usage:
+#     python RealTimePoseDetection.py --source media/exercising.mp4 --feedback console speech
+
+import json
+import logging
+import queue
+import sys
+import threading
+from collections import namedtuple
+from time import sleep, time
+from urllib.request import Request, urlopen
+
+logger = logging.getLogger(__name__)
+
+# A feedback event.
+#   kind: 'pose', 'hold', 'rep' or 'flow'.
+#   subject: What the event is about, the pose, counter or flow name.
+#   message: The text of the feedback.
+#   time: The time of the event in seconds.
+FeedbackEvent = namedtuple('FeedbackEvent', ['kind', 'subject', 'message', 'time'])
+
+
+class ConsoleSink:
+    '''
+    Prints the feedback events.
+    Args:
+        stream: The stream to print to.
+        min_interval: The shortest time in seconds between two events of this sink.
+    '''
+
+    def __init__(self, stream=None, min_interval=0.0):
+        self.stream = stream or sys.stdout
+        self.min_interval = min_interval
+
+    def send(self, event):
+        print(f'[feedback] {event.message}', file=self.stream, flush=True)
+
+
+class WebPushSink:
+    '''
+    Posts the feedback events as JSON to a URL, like a web push service or a webhook of the web app.
+    Args:
+        url: The URL to post to.
+        timeout: The timeout of a request in seconds.
+        min_interval: The shortest time in seconds between two events of this sink.
+    '''
+
+    def __init__(self, url, timeout=2.0, min_interval=0.0):
+        self.url = url
+        self.timeout = timeout
+        self.min_interval = min_interval
+
+    def send(self, event):
+        request = Request(self.url, data=json.dumps(event._asdict()).encode('utf-8'),
+                          headers={'Content-Type': 'application/json'}, method='POST')
+        with urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class SpeechSink:
+    '''
+    A text-to-speech stub: it logs the message and takes as long as saying it would. A real engine can replace
+    speak without changing the scheduler.
+    Args:
+        words_per_second: The speaking rate.
+        min_interval: The shortest time in seconds between two events of this sink, so messages are not spoken
+                      back to back.
+    '''
+
+    def __init__(self, words_per_second=2.5, min_interval=1.5):
+        self.words_per_second = words_per_second
+        self.min_interval = min_interval
+
+    def speak(self, text):
+        logger.info('Saying: %s', text)
+        sleep(len(text.split()) / self.words_per_second)
+
+    def send(self, event):
+        self.speak(event.message)
+
+
+class _SinkWorker:
+    '''
+    Delivers the events of one sink on a thread of its own.
+    Args:
+        sink: An object with a send(event) method and a min_interval attribute.
+        queue_size: The number of events waiting for the sink, the oldest are dropped beyond it.
+    '''
+
+    def __init__(self, sink, queue_size=8):
+        self.sink = sink
+        self.min_interval = getattr(sink, 'min_interval', 0.0)
+        self.sent = self.dropped = self.failed = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f'feedback-{type(sink).__name__}')
+        self._thread.start()
+
+    def put(self, event):
+        # Only the dispatcher thread puts, so there is room after taking one out.
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            try:
+                self._queue.get_nowait()
+                self.dropped += 1
+            except queue.Empty:
+                pass
+            self._queue.put_nowait(event)
+
+    def _take(self, pending, event):
+        # A newer event of a kind and subject replaces the one still waiting.
+        for index, waiting in enumerate(pending):
+            if (waiting.kind, waiting.subject) == (event.kind, event.subject):
+                del pending[index]
+                self.dropped += 1
+                break
+        pending.append(event)
+
+    def _run(self):
+        last = None
+        pending = []
+        closing = False
+        while pending or not closing:
+            if not pending:
+                event = self._queue.get()
+
+                # Check if the scheduler is being closed.
+                if event is None:
+                    break
+                pending.append(event)
+
+            # Rate limit the sink: wait out the rest of min_interval after the last event.
+            if last is not None:
+                remaining = self.min_interval - (time() - last)
+                if remaining > 0:
+                    sleep(remaining)
+
+            # Take the events that came in meanwhile, then send the oldest one.
+            while not closing:
+                try:
+                    event = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if event is None:
+                    closing = True
+                else:
+                    self._take(pending, event)
+            event = pending.pop(0)
+
+            try:
+                self.sink.send(event)
+                self.sent += 1
+            except Exception:
+                self.failed += 1
+                logger.exception('Feedback sink %s failed', type(self.sink).__name__)
+            last = time()
+
+    def close(self, timeout):
+        # A sink that is still busy is left behind, its thread is a daemon.
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+
+class FeedbackScheduler:
+    '''
+    Turns the labels and rep counts of a loop into feedback events and delivers them to sinks on other threads.
+    Args:
+        sinks: A list of sinks, objects with a send(event) method and an optional min_interval attribute.
+        hold_seconds: The hold times in seconds that are announced while a pose is held.
+        dedupe_seconds: The time in seconds an event is not delivered again after it was.
+        queue_size: The number of events waiting for the dispatcher, newer events are dropped beyond it.
+        sink_queue_size: The number of events waiting for every sink, the oldest are dropped beyond it.
+    '''
+
+    def __init__(self, sinks, hold_seconds=(5, 10, 30), dedupe_seconds=3.0, queue_size=256, sink_queue_size=8):
+        self.hold_seconds = sorted(hold_seconds)
+        self.dedupe_seconds = dedupe_seconds
+        self.dropped = 0
+        self._workers = [_SinkWorker(sink, sink_queue_size) for sink in sinks]
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._delivered = {}
+        self._label = None
+        self._label_since = None
+        self._next_hold = 0
+        self._reps = {}
+        self._thread = threading.Thread(target=self._run, daemon=True, name='feedback-dispatcher')
+        self._thread.start()
+
+    def emit(self, kind, subject, message, timestamp=None):
+        '''
+        This function hands an event over to the dispatcher without blocking.
+        Args:
+            kind: The kind of the event.
+            subject: What the event is about.
+            message: The text of the feedback.
+            timestamp: The time of the event in seconds, now by default.
+        '''
+
+        try:
+            self._queue.put_nowait(FeedbackEvent(kind, subject, message, time() if timestamp is None else timestamp))
+        except queue.Full:
+            self.dropped += 1
+
+    def updatePose(self, label, timestamp=None):
+        '''
+        This function reports the pose label of a frame, and emits an event when a pose is achieved and whenever
+        it has been held for one of the hold times.
+        Args:
+            label: The label of classifyPose, 'Unknown Pose' or None when no pose is known.
+            timestamp: The time of the frame in seconds, now by default.
+        '''
+
+        timestamp = time() if timestamp is None else timestamp
+        if label != self._label:
+            self._label, self._label_since, self._next_hold = label, timestamp, 0
+            if label is not None and label != 'Unknown Pose':
+                self.emit('pose', label, f'{label} achieved', timestamp)
+            return
+
+        if label is None or label == 'Unknown Pose' or self._next_hold >= len(self.hold_seconds):
+            return
+        hold = self.hold_seconds[self._next_hold]
+        if timestamp - self._label_since >= hold:
+            self._next_hold += 1
+            self.emit('hold', label, f'{label} held for {hold} seconds', timestamp)
+
+    def updateReps(self, reps, name='reps', timestamp=None):
+        '''
+        This function reports the rep count of a counter, and emits an event when it went up.
+        Args:
+            reps: The number of reps counted.
+            name: The name of the counter, such as left_curl.
+            timestamp: The time of the frame in seconds, now by default.
+        '''
+
+        previous = self._reps.get(name, 0)
+        self._reps[name] = reps
+        if reps > previous:
+            self.emit('rep', name, f'{name.replace("_", " ")} rep {reps}', timestamp)
+
+    def _run(self):
+        while True:
+            event = self._queue.get()
+
+            # Check if the scheduler is being closed.
+            if event is None:
+                break
+
+            # Drop an event that was delivered a moment ago.
+            key = (event.kind, event.subject, event.message)
+            last = self._delivered.get(key)
+            if last is not None and event.time - last < self.dedupe_seconds:
+                continue
+            self._delivered[key] = event.time
+            if len(self._delivered) > 1024:
+                self._delivered = {key: delivered for key, delivered in self._delivered.items()
+                                   if event.time - delivered < self.dedupe_seconds}
+
+            for worker in self._workers:
+                worker.put(event)
+
+    @property
+    def stats(self):
+        '''The number of events dropped before the dispatcher, and sent, dropped and failed by every sink in order.'''
+        return {'dropped': self.dropped,
+                'sinks': [{'sink': type(worker.sink).__name__, 'sent': worker.sent, 'dropped': worker.dropped,
+                           'failed': worker.failed} for worker in self._workers]}
+
+    def close(self, timeout=5.0):
+        '''
+        This function delivers the events still queued and stops the threads, waiting at most timeout seconds for
+        every thread.
+        Args:
+            timeout: The time in seconds to wait for a thread.
+        '''
+
+        self._queue.put(None)
+        self._thread.join(timeout)
+        for worker in self._workers:
+            worker.close(timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def makeSinks(names, push_url=None):
+    '''
+    This function creates the sinks named on the command line.
+    Args:
+        names: A list of 'console', 'speech' and 'push'.
+        push_url: The URL of the 'push' sink.
+    Returns:
+        sinks: A list of sinks.
+    '''
+
+    sinks = []
+    for name in names:
+        if name == 'console':
+            sinks.append(ConsoleSink())
+        elif name == 'speech':
+            sinks.append(SpeechSink())
+        elif name == 'push':
+            if not push_url:
+                raise ValueError('The push feedback sink needs a URL')
+            sinks.append(WebPushSink(push_url))
+        else:
+            raise ValueError(f'Unknown feedback sink {name}')
+    return sinks
@@ -0,0 +1,409 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Shared-Memory Frame Ring Buffer
+#
+# Sending 1280x960 frames from a capture process to an inference process through a multiprocessing queue pickles
+# and copies every frame several times, which costs more than the inference. The FrameRing keeps a fixed number
+# of frame slots in one shared memory block instead:
+#
+# * the capture process decodes every frame straight into the next slot with VideoCapture.read(slot),
+# * the inference processes get a NumPy view of the slot, so a frame crosses the process boundary without a copy.
+#
+# There is one producer and any number of consumers, and no locks. Every slot has a sequence number: the producer
+# marks the slot as being written (-1), writes the frame, stores its sequence number and then advances the head.
+# A consumer checks the sequence number of the slot when it takes the view and again once it has copied or
+# processed the frame (intact); if the number changed the producer reused the slot in between and the frame is
+# dropped. Consumers of a live camera always take the newest frame. Consumers of a video file publish how far they
+# have read, and the producer waits for them, so no frame of the file is skipped: the capture process registers the
+# cursor of the consumer at frame 0 before it publishes the first frame.
+#
+# Memory ordering: the header fields are plain NumPy stores into shared memory, without any barrier. The protocol
+# assumes that the stores of one process become visible to the others in the order they were made (the frame, then
+# its sequence number, then the head), which the total store order of x86 and x86-64 guarantees. On CPUs with a
+# weaker memory model, such as ARM, a consumer could see the new head before the frame or its sequence number; the
+# sequence check of read and intact catches a slot seen as being written, but not a frame whose pixels arrive after
+# its sequence number, so the separate capture process should only be used on x86.
+#
+# Lifetime: the views handed out by read stay valid after release. The arrays of a ring are built on a ctypes
+# array that holds a buffer export of the shared memory, which cannot be closed while it is alive (NumPy itself
+# keeps no export), so release only closes the memory once the last view is gone and otherwise keeps it open until a later release or the exit of the process. The capture process
+# removes the name of the memory once the consumer has attached to it, the memory itself lives on until both
+# processes closed it.
+
+import atexit
+import ctypes
+import multiprocessing
+from multiprocessing import shared_memory
+from queue import Empty
+from time import sleep, time
+
+import cv2
+import numpy as np
+
+# The fields of the ring header.
+_HEAD, _SLOTS, _SLOT_BYTES, _CONSUMERS, _CLOSED = range(5)
+_HEADER_FIELDS = 8
+
+# The fields of the header of every slot.
+_SEQUENCE, _HEIGHT, _WIDTH, _CHANNELS, _TIMESTAMP = range(5)
+_SLOT_FIELDS = 5
+
+# The consumer cursor of a consumer that does not hold the producer back.
+_INACTIVE = -1
+
+# The shared memory of released rings whose frames are still viewed somewhere, closed once the views are gone.
+_lingering = []
+
+
+def _closeLingering():
+    for memory in list(_lingering):
+        try:
+            memory.close()
+        except BufferError:
+            continue
+        _lingering.remove(memory)
+
+
+atexit.register(_closeLingering)
+
+
+class FrameRing:
+    '''
+    A ring of frame slots in shared memory, written by one process and read by others.
+    Args:
+        name: The name of an existing ring to attach to, or None to create a new one.
+        slots: The number of frame slots of a new ring.
+        frame_shape: The largest (height, width, channels) frame a new ring holds.
+        consumers: The number of consumers of a new ring that can read every frame.
+    '''
+
+    def __init__(self, name=None, slots=8, frame_shape=(960, 1280, 3), consumers=4):
+        self.owner = name is None
+        if self.owner:
+            slot_bytes = int(np.prod(frame_shape))
+            size = (_HEADER_FIELDS + consumers + slots * _SLOT_FIELDS) * 8 + slots * slot_bytes
+            self._memory = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self._memory = shared_memory.SharedMemory(name=name)
+
+        # Every view of the arrays keeps this export alive, so the memory cannot be closed under one of them.
+        buffer = (ctypes.c_uint8 * self._memory.size).from_buffer(self._memory.buf)
+        self._header = np.ndarray((_HEADER_FIELDS,), np.int64, buffer)
+        if self.owner:
+            self._header[:] = 0
+            self._header[_SLOTS], self._header[_SLOT_BYTES], self._header[_CONSUMERS] = slots, slot_bytes, consumers
+        self.slots, self.slot_bytes = int(self._header[_SLOTS]), int(self._header[_SLOT_BYTES])
+        consumers = int(self._header[_CONSUMERS])
+
+        offset = _HEADER_FIELDS * 8
+        self._cursors = np.ndarray((consumers,), np.int64, buffer, offset)
+        offset += consumers * 8
+        self._slot_headers = np.ndarray((self.slots, _SLOT_FIELDS), np.int64, buffer, offset)
+        offset += self.slots * _SLOT_FIELDS * 8
+        self._data = np.ndarray((self.slots, self.slot_bytes), np.uint8, buffer, offset)
+        if self.owner:
+            self._cursors[:] = _INACTIVE
+            self._slot_headers[:, _SEQUENCE] = -1
+
+    @property
+    def name(self):
+        return self._memory.name
+
+    @property
+    def head(self):
+        '''The sequence number the next frame will get, that is the number of frames written so far.'''
+        return int(self._header[_HEAD])
+
+    @property
+    def closed(self):
+        return bool(self._header[_CLOSED])
+
+    def _view(self, slot, shape):
+        return self._data[slot, :int(np.prod(shape))].reshape(shape)
+
+    def _waitForConsumers(self, sequence, timeout):
+        # Wait until every consumer reading all the frames has read the frame that used the slot before.
+        deadline = time() + timeout
+        while True:
+            active = self._cursors[self._cursors != _INACTIVE]
+            if not len(active) or sequence - int(active.min()) < self.slots or self.closed:
+                return True
+            if time() > deadline:
+                return False
+            sleep(0.0005)
+
+    def reserve(self, shape, timeout=10.0):
+        '''
+        This function takes the slot of the next frame for the producer to write the frame into.
+        Args:
+            shape: The (height, width, channels) of the frame.
+            timeout: The number of seconds to wait for slow consumers that read every frame.
+        Returns:
+            frame: A writable view of the slot, None if the consumers did not catch up in time.
+        '''
+
+        if int(np.prod(shape)) > self.slot_bytes:
+            raise ValueError(f'A frame of shape {shape} does not fit in a slot of {self.slot_bytes} bytes')
+        sequence = self.head
+        if not self._waitForConsumers(sequence, timeout):
+            return None
+        slot = sequence % self.slots
+        # Mark the slot as being written before touching the frame, so consumers of its old frame notice.
+        self._slot_headers[slot, _SEQUENCE] = -1
+        self._slot_headers[slot, _HEIGHT:_CHANNELS + 1] = shape
+        return self._view(slot, shape)
+
+    def publish(self, timestamp=None):
+        '''
+        This function makes the frame written into the reserved slot available to the consumers.
+        Args:
+            timestamp: The capture time of the frame, now by default.
+        Returns:
+            sequence: The sequence number of the frame.
+        '''
+
+        sequence = self.head
+        slot = sequence % self.slots
+        self._slot_headers[slot, _TIMESTAMP] = int((time() if timestamp is None else timestamp) * 1e9)
+        # The frame must be visible before its sequence number and the sequence number before the head, which
+        # relies on the in-order stores of x86 (see the top of the module).
+        self._slot_headers[slot, _SEQUENCE] = sequence
+        self._header[_HEAD] = sequence + 1
+        return sequence
+
+    def write(self, frame, timestamp=None, timeout=10.0):
+        '''
+        This function copies a frame into the next slot and publishes it.
+        Args:
+            frame: The frame to write.
+            timestamp: The capture time of the frame, now by default.
+            timeout: The number of seconds to wait for slow consumers that read every frame.
+        Returns:
+            sequence: The sequence number of the frame, None if the consumers did not catch up in time.
+        '''
+
+        view = self.reserve(frame.shape, timeout)
+        if view is None:
+            return None
+        view[:] = frame
+        return self.publish(timestamp)
+
+    def close(self):
+        '''This function tells the consumers that no more frames will be written.'''
+        self._header[_CLOSED] = 1
+
+    def read(self, sequence):
+        '''
+        This function returns a view of a frame if the slot still holds it.
+        Args:
+            sequence: The sequence number of the frame.
+        Returns:
+            frame: A read-only view of the frame, None if the frame was overwritten or is being written.
+            timestamp: The capture time of the frame.
+        '''
+
+        slot = sequence % self.slots
+        header = self._slot_headers[slot].copy()
+        if header[_SEQUENCE] != sequence:
+            return None, None
+        frame = self._view(slot, tuple(header[_HEIGHT:_CHANNELS + 1]))
+        frame.flags.writeable = False
+        return frame, header[_TIMESTAMP] / 1e9
+
+    def intact(self, sequence):
+        '''
+        This function tells whether a frame taken with read was not overwritten since, so what was read from it
+        is a consistent frame.
+        Args:
+            sequence: The sequence number of the frame.
+        Returns:
+            intact: A boolean value that is true if the slot still holds the frame.
+        '''
+
+        return int(self._slot_headers[sequence % self.slots, _SEQUENCE]) == sequence
+
+    def attachConsumer(self, consumer, sequence=None):
+        '''
+        This function makes the producer wait for a consumer, so the consumer reads every frame from sequence on.
+        To read every frame from the first one, the consumer must be attached before the first frame is published.
+        Args:
+            consumer: The index of the consumer, below the number of consumers of the ring.
+            sequence: The first frame the consumer reads, the next frame to be written by default.
+        '''
+
+        self._cursors[consumer] = self.head if sequence is None else sequence
+
+    def advance(self, consumer, sequence):
+        '''
+        This function records that a consumer attached with attachConsumer is done with the frames up to sequence.
+        '''
+
+        self._cursors[consumer] = sequence + 1
+
+    def detachConsumer(self, consumer):
+        self._cursors[consumer] = _INACTIVE
+
+    def release(self):
+        '''
+        This function detaches from the shared memory, and removes it if this ring created it. The memory is closed
+        once no frame read from the ring is viewed anymore.
+        '''
+
+        del self._header, self._cursors, self._slot_headers, self._data
+        if self.owner:
+            self._memory.unlink()
+        _lingering.append(self._memory)
+        _closeLingering()
+
+
+def _openCapture(source, width, height):
+    camera_video = cv2.VideoCapture(source)
+    if width and height:
+        camera_video.set(3, width)
+        camera_video.set(4, height)
+    return camera_video
+
+
+def _captureProcess(source, ring_ready, attached, slots, width, height):
+    # Open the source in this process and create the ring once the frame size is known.
+    camera_video = _openCapture(source, width, height)
+    ok, frame = camera_video.read()
+    if not ok:
+        ring_ready.put(None)
+        return
+
+    ring = FrameRing(slots=slots, frame_shape=frame.shape)
+    # The consumer of a video stored in the disk reads every frame from the first one, so its cursor is active
+    # before anything is published, however late the consumer attaches to the ring.
+    if isinstance(source, str):
+        ring.attachConsumer(0, 0)
+    ring_ready.put(ring.name)
+    ring.write(frame)
+    try:
+        while camera_video.isOpened() and not ring.closed:
+            # Decode the frame straight into the slot, a camera can change the frame size in between.
+            slot = ring.reserve(frame.shape)
+            if slot is None:
+                continue
+            ok, frame = camera_video.read(slot)
+            if not ok:
+                # Stop at the end of a video stored in the disk, and skip the empty frames of a camera.
+                if isinstance(source, str):
+                    break
+                continue
+            if frame is not slot:
+                # The frame size changed, the slot is reserved again for the new size.
+                ring.write(frame)
+                continue
+            ring.publish()
+    finally:
+        ring.close()
+        camera_video.release()
+        # Remove the name only once the consumer opened the memory, which then lives on until it releases it.
+        attached.wait()
+        ring.release()
+
+
+def _waitFor(queue, process):
+    # Wait for a message of the capture process, None if it ended without sending one.
+    while True:
+        try:
+            return queue.get(timeout=0.5)
+        except Empty:
+            if not process.is_alive():
+                return None
+
+
+class CapturedFrames:
+    '''
+    The frames of a webcam or a video, read by a capture process and passed through a FrameRing, or read in this
+    process like the loops always did.
+    Args:
+        source: The index of the webcam, or the path of a video stored in the disk.
+        separate_process: Whether a separate process captures the frames.
+        slots: The number of frame slots of the ring.
+        width: The frame width to request from a webcam, None to keep its default.
+        height: The frame height to request from a webcam, None to keep its default.
+    Iterating yields the frames as views of the ring, that may only be read. Call intact() after copying a frame
+    to make sure the capture process did not overwrite it meanwhile.
+    '''
+
+    def __init__(self, source, separate_process=True, slots=8, width=1280, height=960):
+        self.source = source
+        self.separate_process = separate_process
+        self.slots = slots
+        self.width = width
+        self.height = height
+        self.sequence = None
+        self.ring = None
+
+    def __iter__(self):
+        if not self.separate_process:
+            yield from self._readInProcess()
+            return
+
+        context = multiprocessing.get_context('spawn')
+        ring_ready = context.Queue()
+        attached = context.Event()
+        process = context.Process(target=_captureProcess, daemon=True,
+                                  args=(self.source, ring_ready, attached, self.slots, self.width, self.height))
+        process.start()
+        name = _waitFor(ring_ready, process)
+        if name is None:
+            process.join()
+            return
+
+        try:
+            self.ring = FrameRing(name)
+        finally:
+            attached.set()
+        # A video stored in the disk is read frame by frame, its cursor was attached at frame 0 by the capture
+        # process, a webcam always from the newest frame.
+        every_frame = isinstance(self.source, str)
+        try:
+            sequence = 0
+            while True:
+                head = self.ring.head
+                if head <= sequence:
+                    if self.ring.closed and self.ring.head <= sequence:
+                        break
+                    sleep(0.001)
+                    continue
+                if not every_frame:
+                    sequence = head - 1
+                frame, _ = self.ring.read(sequence)
+                if frame is not None:
+                    self.sequence = sequence
+                    yield frame
+                if every_frame:
+                    self.ring.advance(0, sequence)
+                sequence += 1
+        finally:
+            self.ring.close()
+            # The last frame yielded may still be viewed by the caller, release keeps its memory open until then.
+            self.ring.release()
+            self.ring = None
+            process.join(timeout=5)
+
+    def _readInProcess(self):
+        camera_video = _openCapture(self.source, self.width, self.height)
+        try:
+            while camera_video.isOpened():
+                ok, frame = camera_video.read()
+                if not ok:
+                    if isinstance(self.source, str):
+                        break
+                    continue
+                yield frame
+        finally:
+            camera_video.release()
+
+    def intact(self):
+        '''
+        This function tells whether the last frame yielded was not overwritten since.
+        Returns:
+            intact: A boolean value that is true if the frame is still consistent.
+        '''
+
+        return self.ring is None or self.ring.intact(self.sequence)
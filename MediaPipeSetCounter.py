@@ -12,58 +12,42 @@
 # In[2]:
 
 
+import argparse
 import cv2
-import mediapipe as mp
 import numpy as np
-mp_drawing = mp.solutions.drawing_utils
-mp_pose = mp.solutions.pose
 
+# mediapipe is only imported when a feed is started, so importing this module stays fast and opens no camera.
+from FrameRing import CapturedFrames
+from OverlayRenderer import SkeletonRenderer, StatusPanel, formatAngle
+from PoseLandmarks import (LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_ELBOW, RIGHT_ELBOW, LEFT_WRIST, RIGHT_WRIST,
+                           LEFT_HIP, RIGHT_HIP, LEFT_KNEE, RIGHT_KNEE, LEFT_ANKLE, RIGHT_ANKLE)
+from RealTimePoseDetection import loadMediapipe
+from VideoExport import AnnotatedVideoWriter
 
-# In[3]:
 
+# In[3]:
 
-# VIDEO FEED
-cap = cv2.VideoCapture(0)
-while cap.isOpened():
-    ret, frame = cap.read()
-    cv2.imshow('Mediapipe Feed', frame)
-    
-    if cv2.waitKey(10) & 0xFF == ord('q'):
-        break
-        
-cap.release()
-cv2.destroyAllWindows()
 
+# The skeleton of all the feeds, in the colors of the DrawingSpecs they were drawn with (see OverlayRenderer)
+_SKELETON = SkeletonRenderer(connection_color=(245,66,230), landmark_color=(245,117,66))
 
-# # 1. Make Detections
 
-# In[4]:
+def pixelLandmarks(pose_landmarks, image):
+    # The x, y, z and visibility of the landmarks, with x and y in the pixel coordinates of the image
+    landmarks = np.array([(landmark.x, landmark.y, landmark.z, landmark.visibility)
+                          for landmark in pose_landmarks.landmark])
+    landmarks[:, :2] *= [image.shape[1], image.shape[0]]
+    return landmarks
 
 
-cap = cv2.VideoCapture(0)
-## Setup mediapipe instance
-with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
+def show_feed(source=0):
+    # VIDEO FEED
+    cap = cv2.VideoCapture(source)
     while cap.isOpened():
         ret, frame = cap.read()
-        
-        # Recolor image to RGB
-        image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        image.flags.writeable = False
-      
-        # Make detection
-        results = pose.process(image)
-    
-        # Recolor back to BGR
-        image.flags.writeable = True
-        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-        
-        # Render detections
-        mp_drawing.draw_landmarks(image, results.pose_landmarks, mp_pose.POSE_CONNECTIONS,
-                                mp_drawing.DrawingSpec(color=(245,117,66), thickness=2, circle_radius=2), 
-                                mp_drawing.DrawingSpec(color=(245,66,230), thickness=2, circle_radius=2) 
-                                )               
-        
-        cv2.imshow('Mediapipe Feed', image)
+        if not ret:
+            break
+        cv2.imshow('Mediapipe Feed', frame)
 
         if cv2.waitKey(10) & 0xFF == ord('q'):
             break
@@ -71,278 +55,326 @@ with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as
     cap.release()
     cv2.destroyAllWindows()
 
-# In[5]:
 
+# # 1. Make Detections
 
-#mp_drawing.DrawingSpec(color=(245,66,230), thickness=2, circle_radius=2)
+# In[4]:
 
 
-# # 2. Determining Joints
+def show_detections(source=0):
+    mp_pose, _ = loadMediapipe()
+    cap = cv2.VideoCapture(source)
+    ## Setup mediapipe instance
+    with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
+        while cap.isOpened():
+            ret, frame = cap.read()
+            if not ret:
+                break
 
-# <img src="https://i.imgur.com/3j8BPdc.png" style="height:300px" >
+            # Recolor image to RGB
+            image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            image.flags.writeable = False
 
-# In[6]:
+            # Make detection
+            results = pose.process(image)
 
+            # Recolor back to BGR
+            image.flags.writeable = True
+            image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
 
-cap = cv2.VideoCapture(0)
-## Setup mediapipe instance
-with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
-    while cap.isOpened():
-        ret, frame = cap.read()
-        
-        # Recolor image to RGB
-        image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        image.flags.writeable = False
-      
-        # Make detection
-        results = pose.process(image)
-    
-        # Recolor back to BGR
-        image.flags.writeable = True
-        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-        
-        # Extract landmarks
-        try:
-            landmarks = results.pose_landmarks.landmark
-            print(landmarks)
-        except:
-            pass
-        
-        
-        # Render detections
-        mp_drawing.draw_landmarks(image, results.pose_landmarks, mp_pose.POSE_CONNECTIONS,
-                                mp_drawing.DrawingSpec(color=(245,117,66), thickness=2, circle_radius=2), 
-                                mp_drawing.DrawingSpec(color=(245,66,230), thickness=2, circle_radius=2) 
-                                 )               
-        
-        cv2.imshow('Mediapipe Feed', image)
+            # Extract landmarks
+            try:
+                landmarks = results.pose_landmarks.landmark
+                print(landmarks)
+            except:
+                pass
 
-        if cv2.waitKey(10) & 0xFF == ord('q'):
-            break
+            # Render detections in pixel coordinates with the prebuilt skeleton (see OverlayRenderer)
+            if results.pose_landmarks:
+                _SKELETON.draw(image, pixelLandmarks(results.pose_landmarks, image))
 
-    cap.release()
-    cv2.destroyAllWindows()
+            cv2.imshow('Mediapipe Feed', image)
 
+            if cv2.waitKey(10) & 0xFF == ord('q'):
+                break
 
-# In[7]:
+        cap.release()
+        cv2.destroyAllWindows()
 
 
-len(landmarks)
+# # 2. Determining Joints
 
+# <img src="https://i.imgur.com/3j8BPdc.png" style="height:300px" >
+#
+# The landmarks are indexed by mp_pose.PoseLandmark, e.g. landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value]
+# is the left shoulder with its x, y, z and visibility.
 
-# In[8]:
+# # 3. Calculate Angles
 
+# In[12]:
 
-for lndmrk in mp_pose.PoseLandmark:
-    print(lndmrk)
 
+def calculate_angle(a,b,c):
+    # The points are [x, y] pairs, or arrays of shape (..., 2) to calculate many angles at once
+    a = np.asarray(a) # First
+    b = np.asarray(b) # Mid
+    c = np.asarray(c) # End
 
-# In[9]:
+    radians = np.arctan2(c[...,1]-b[...,1], c[...,0]-b[...,0]) - np.arctan2(a[...,1]-b[...,1], a[...,0]-b[...,0])
+    angle = np.abs(radians*180.0/np.pi)
 
+    # Fold the angles above 180 degrees back into [0, 180]
+    return np.minimum(angle, 360-angle)
 
-landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].visibility
 
+# In[17]:
 
-# In[10]:
 
+def show_angle(source=0):
+    mp_pose, _ = loadMediapipe()
+    cap = cv2.VideoCapture(source)
+    ## Setup mediapipe instance
+    with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
+        while cap.isOpened():
+            ret, frame = cap.read()
+            if not ret:
+                break
 
-landmarks[mp_pose.PoseLandmark.LEFT_ELBOW.value]
+            # Recolor image to RGB
+            image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            image.flags.writeable = False
 
+            # Make detection
+            results = pose.process(image)
 
-# In[11]:
+            # Recolor back to BGR
+            image.flags.writeable = True
+            image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
 
+            # Extract landmarks
+            try:
+                landmarks = results.pose_landmarks.landmark
 
-landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value]
+                # Get coordinates
+                shoulder = [landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].x,landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].y]
+                elbow = [landmarks[mp_pose.PoseLandmark.LEFT_ELBOW.value].x,landmarks[mp_pose.PoseLandmark.LEFT_ELBOW.value].y]
+                wrist = [landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value].x,landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value].y]
 
+                # Calculate angle
+                angle = calculate_angle(shoulder, elbow, wrist)
 
-# # 3. Calculate Angles
+                # Visualize angle
+                cv2.putText(image, formatAngle(angle),
+                               tuple(np.multiply(elbow, [image.shape[1], image.shape[0]]).astype(int)),
+                               cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2, cv2.LINE_AA
+                                    )
 
-# In[12]:
+            except:
+                pass
 
+            # Render detections in pixel coordinates with the prebuilt skeleton (see OverlayRenderer)
+            if results.pose_landmarks:
+                _SKELETON.draw(image, pixelLandmarks(results.pose_landmarks, image))
 
-def calculate_angle(a,b,c):
-    a = np.array(a) # First
-    b = np.array(b) # Mid
-    c = np.array(c) # End
-    
-    radians = np.arctan2(c[1]-b[1], c[0]-b[0]) - np.arctan2(a[1]-b[1], a[0]-b[0])
-    angle = np.abs(radians*180.0/np.pi)
-    
-    if angle >180.0:
-        angle = 360-angle
-        
-    return angle 
+            cv2.imshow('Mediapipe Feed', image)
 
+            if cv2.waitKey(10) & 0xFF == ord('q'):
+                break
 
-# In[13]:
+        cap.release()
+        cv2.destroyAllWindows()
 
 
-shoulder = [landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].x,landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].y]
-elbow = [landmarks[mp_pose.PoseLandmark.LEFT_ELBOW.value].x,landmarks[mp_pose.PoseLandmark.LEFT_ELBOW.value].y]
-wrist = [landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value].x,landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value].y]
+# # 4. Curl Counter
 
+# In[18]:
 
-# In[14]:
 
+def curl_counter_step(angle, counter, stage):
+    # Curl counter logic
+    if angle > 160:
+        stage = "down"
+    if angle < 30 and stage =='down':
+        stage="up"
+        counter +=1
 
-shoulder, elbow, wrist
+    return counter, stage
 
 
-# In[15]:
+# The joints counted at once: the (first, mid, end) landmarks and the angles below which a rep is counted and
+# above which the next rep starts, like in curl_counter_step
+COUNTER_JOINTS = {
+    'left_curl': (LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST, 30, 160),
+    'right_curl': (RIGHT_SHOULDER, RIGHT_ELBOW, RIGHT_WRIST, 30, 160),
+    'left_squat': (LEFT_HIP, LEFT_KNEE, LEFT_ANKLE, 90, 160),
+    'right_squat': (RIGHT_HIP, RIGHT_KNEE, RIGHT_ANKLE, 90, 160),
+}
 
+STAGES = (None, 'down', 'up')
 
-calculate_angle(shoulder, elbow, wrist)
 
+class JointCounter:
+    # Counts the reps of several joints at once, every frame gathers the points of all the joints from one
+    # landmark array and calculates all their angles with one call of calculate_angle
 
-# In[16]:
+    def __init__(self, joints=COUNTER_JOINTS):
+        self.names = list(joints)
+        first, mid, end, low, high = zip(*joints.values())
+        self.first, self.mid, self.end = np.array(first), np.array(mid), np.array(end)
+        self._low, self._high = np.array(low, dtype=float), np.array(high, dtype=float)
+        self.counters = np.zeros(len(self.names), dtype=int)
+        # Index into STAGES of every joint
+        self._stages = np.zeros(len(self.names), dtype=np.int8)
 
+    @property
+    def stages(self):
+        return [STAGES[stage] for stage in self._stages]
 
-tuple(np.multiply(elbow, [640, 480]).astype(int))
+    def update(self, points):
+        # points is an array of shape (33, 2) of the landmark x and y coordinates of a frame
+        angles = calculate_angle(points[self.first], points[self.mid], points[self.end])
 
+        # The curl_counter_step logic for every joint, NaN angles change nothing
+        down = angles > self._high
+        counted = (angles < self._low) & (self._stages == 1)
+        self._stages[down] = 1
+        self._stages[counted] = 2
+        self.counters += counted
 
-# In[17]:
+        return angles, counted
 
 
-cap = cv2.VideoCapture(0)
-## Setup mediapipe instance
-with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
-    while cap.isOpened():
-        ret, frame = cap.read()
-        
-        # Recolor image to RGB
-        image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        image.flags.writeable = False
-      
-        # Make detection
-        results = pose.process(image)
-    
-        # Recolor back to BGR
-        image.flags.writeable = True
-        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-        
-        # Extract landmarks
-        try:
-            landmarks = results.pose_landmarks.landmark
-            
-            # Get coordinates
-            shoulder = [landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].x,landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].y]
-            elbow = [landmarks[mp_pose.PoseLandmark.LEFT_ELBOW.value].x,landmarks[mp_pose.PoseLandmark.LEFT_ELBOW.value].y]
-            wrist = [landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value].x,landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value].y]
-            
-            # Calculate angle
-            angle = calculate_angle(shoulder, elbow, wrist)
-            
-            # Visualize angle
-            cv2.putText(image, str(angle), 
-                           tuple(np.multiply(elbow, [640, 480]).astype(int)), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2, cv2.LINE_AA
-                                )
-                       
-        except:
-            pass
-        
-        
-        # Render detections
-        mp_drawing.draw_landmarks(image, results.pose_landmarks, mp_pose.POSE_CONNECTIONS,
-                                mp_drawing.DrawingSpec(color=(245,117,66), thickness=2, circle_radius=2), 
-                                mp_drawing.DrawingSpec(color=(245,66,230), thickness=2, circle_radius=2) 
-                                 )               
-        
-        cv2.imshow('Mediapipe Feed', image)
+def run_curl_counter(source=0, capture_process=False, joints=COUNTER_JOINTS, headless=False, feedback=None,
+                     record=None, record_fps=30):
+    mp_pose, _ = loadMediapipe()
+    # A separate process can read the frames and pass them through shared memory (see FrameRing)
+    cap = CapturedFrames(source, separate_process=capture_process, width=None, height=None)
 
-        if cv2.waitKey(10) & 0xFF == ord('q'):
-            break
+    # Counter variables of all the joints
+    counter = JointCounter(joints)
 
-    cap.release()
-    cv2.destroyAllWindows()
+    # The overlay is set up once: the skeleton colors and the status box with its labels (see OverlayRenderer)
+    panel = StatusPanel(counter.names, header='REPS   STAGE')
 
+    # The frames are drawn when they are displayed or recorded to a video (see VideoExport), also in headless mode
+    recorder = None
 
-# # 4. Curl Counter
+    ## Setup mediapipe instance
+    with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
+        for frame in cap:
 
-# In[18]:
+            # Recolor image to RGB
+            image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            image.flags.writeable = False
 
+            # Skip the frame if the capture process overwrote it while it was recolored
+            if not cap.intact():
+                continue
 
-cap = cv2.VideoCapture(0)
+            # Make detection
+            results = pose.process(image)
 
-# Curl counter variables
-counter = 0 
-stage = None
+            # Extract landmarks
+            if results.pose_landmarks:
 
-## Setup mediapipe instance
-with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
-    while cap.isOpened():
-        ret, frame = cap.read()
-        
-        # Recolor image to RGB
-        image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        image.flags.writeable = False
-      
-        # Make detection
-        results = pose.process(image)
-    
-        # Recolor back to BGR
-        image.flags.writeable = True
-        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-        
-        # Extract landmarks
-        try:
-            landmarks = results.pose_landmarks.landmark
-            
-            # Get coordinates
-            shoulder = [landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].x,landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].y]
-            elbow = [landmarks[mp_pose.PoseLandmark.LEFT_ELBOW.value].x,landmarks[mp_pose.PoseLandmark.LEFT_ELBOW.value].y]
-            wrist = [landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value].x,landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value].y]
-            
-            # Calculate angle
-            angle = calculate_angle(shoulder, elbow, wrist)
-            
-            # Visualize angle
-            cv2.putText(image, str(angle), 
-                           tuple(np.multiply(elbow, [640, 480]).astype(int)), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2, cv2.LINE_AA
-                                )
-            
-            # Curl counter logic
-            if angle > 160:
-                stage = "down"
-            if angle < 30 and stage =='down':
-                stage="up"
-                counter +=1
-                print(counter)
-                       
-        except:
-            pass
-        
-        # Render curl counter
-        # Setup status box
-        cv2.rectangle(image, (0,0), (225,73), (245,117,16), -1)
-        
-        # Rep data
-        cv2.putText(image, 'REPS', (15,12), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,0,0), 1, cv2.LINE_AA)
-        cv2.putText(image, str(counter), 
-                    (10,60), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 2, (255,255,255), 2, cv2.LINE_AA)
-        
-        # Stage data
-        cv2.putText(image, 'STAGE', (65,12), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,0,0), 1, cv2.LINE_AA)
-        cv2.putText(image, stage, 
-                    (60,60), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 2, (255,255,255), 2, cv2.LINE_AA)
-        
-        
-        # Render detections
-        mp_drawing.draw_landmarks(image, results.pose_landmarks, mp_pose.POSE_CONNECTIONS,
-                                mp_drawing.DrawingSpec(color=(245,117,66), thickness=2, circle_radius=2), 
-                                mp_drawing.DrawingSpec(color=(245,66,230), thickness=2, circle_radius=2) 
-                                 )               
-        
-        cv2.imshow('Mediapipe Feed', image)
+                # Get the coordinates and visibility of all the landmarks at once
+                landmarks = np.array([(landmark.x, landmark.y, landmark.z, landmark.visibility)
+                                      for landmark in results.pose_landmarks.landmark])
+                points = landmarks[:, :2]
 
-        if cv2.waitKey(10) & 0xFF == ord('q'):
-            break
+                # Calculate the angles and run the counter logic of all the joints
+                angles, counted = counter.update(points)
+
+                for index in np.flatnonzero(counted):
+                    print(counter.names[index], counter.counters[index])
+                    # The feedback delivers the rep on its own threads (see FeedbackScheduler)
+                    if feedback:
+                        feedback.updateReps(counter.counters[index], counter.names[index])
+
+            # Nothing is drawn or displayed in headless mode, unless the frames are recorded
+            if headless and record is None:
+                continue
+
+            # Recolor back to BGR
+            image.flags.writeable = True
+            image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+
+            if results.pose_landmarks:
+
+                # Render detections in pixel coordinates
+                size = np.array([image.shape[1], image.shape[0]])
+                landmarks[:, :2] *= size
+                _SKELETON.draw(image, landmarks)
+
+                # Visualize angles
+                for angle, mid in zip(angles, counter.mid):
+                    cv2.putText(image, formatAngle(angle), tuple(landmarks[mid, :2].astype(int)),
+                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2, cv2.LINE_AA)
+
+            # Render counters, the status box has one row per joint
+            panel.draw(image, [f'{reps:>3} {stage or ""}' for reps, stage in zip(counter.counters, counter.stages)])
+
+            # The writer encodes the frame on its own thread
+            if record is not None:
+                if recorder is None:
+                    recorder = AnnotatedVideoWriter(record, record_fps, (image.shape[1], image.shape[0]))
+                recorder.write(image)
+            if headless:
+                continue
+
+            cv2.imshow('Mediapipe Feed', image)
+
+            if cv2.waitKey(10) & 0xFF == ord('q'):
+                break
+
+        if not headless:
+            cv2.destroyAllWindows()
+        if recorder is not None:
+            recorder.close()
 
-    cap.release()
-    cv2.destroyAllWindows()
 
+# # 5. Command Line
+
+# In[ ]:
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Curl counter with Mediapipe.')
+    parser.add_argument('--mode', choices=['counter', 'feed', 'detections', 'angle'], default='counter',
+                        help='the curl counter (default), or one of the earlier steps of the lesson')
+    parser.add_argument('--source', default='0', help='webcam index or video path')
+    parser.add_argument('--joints', nargs='+', choices=list(COUNTER_JOINTS), default=list(COUNTER_JOINTS),
+                        help='the joints the counter tracks, all of them by default')
+    parser.add_argument('--headless', action='store_true', help='count without drawing or displaying the frames')
+    parser.add_argument('--feedback', nargs='+', choices=['console', 'speech', 'push'], default=[],
+                        help='sinks the completed reps are announced to')
+    parser.add_argument('--push-url', help='URL the push feedback sink posts the events to')
+    parser.add_argument('--capture-process', action='store_true',
+                        help='read the frames of the counter in a separate process and pass them through shared memory')
+    parser.add_argument('--record', help='path of a video file the annotated counter is recorded to')
+    args = parser.parse_args(argv)
+
+    # Use a webcam index when the source is a number and a video path otherwise.
+    source = int(args.source) if args.source.isdigit() else args.source
+
+    if args.mode == 'counter':
+        feedback = None
+        if args.feedback:
+            from FeedbackScheduler import FeedbackScheduler, makeSinks
+            feedback = FeedbackScheduler(makeSinks(args.feedback, args.push_url))
+        try:
+            run_curl_counter(source, args.capture_process, {name: COUNTER_JOINTS[name] for name in args.joints},
+                             args.headless, feedback, args.record)
+        finally:
+            if feedback:
+                feedback.close()
+    elif args.mode == 'feed':
+        show_feed(source)
+    elif args.mode == 'detections':
+        show_detections(source)
+    else:
+        show_angle(source)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,431 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Multi-Person Pose Detection
+#
+# The MediaPipe Pose solution only predicts the landmarks of the most prominent person in the frame. In a studio
+# a single camera covers the whole class, so this module first localizes every person and then runs a separate
+# pose landmarker on each person's region of interest:
+#
+# * **Person detection** - OpenCV's HOG people detector runs on a downscaled frame, and only every few frames.
+#   In between, each person's box is derived from their own landmarks of the previous frame, the same way MediaPipe
+#   tracks a single person, so detection cost does not grow with the class size. A track that lost its landmarks
+#   coasts on its last box until the next detection, or until it is dropped.
+# * **Tracking** - detections are matched by IoU to the boxes the tracks are cropped with, their landmark boxes
+#   enlarged by the margin, so every person keeps a stable track ID. A detection that matches no track only starts
+#   one once the detector found it again on the following frames, so a false positive of the detector does not
+#   create a landmarker. When two tracks end up on the same person the one that lost its landmarks, or else the
+#   newer one, is dropped.
+# * **Per-person landmarks** - every track owns its own Pose instance in video mode, and the crops are processed
+#   in parallel threads (MediaPipe releases the GIL while running the graph). The Pose instances of dropped tracks
+#   are kept in a small pool and reset for the next track instead of loading the model again.
+#
+# The landmarks of every track are then fed to classifyPose and to the curl counter independently.
+#
+# Limitation: the legacy MediaPipe Pose solution takes one image per call and cannot batch the crops, so the
+# landmark cost grows linearly with the number of people. The threads only hide it on as many cores as there are
+# people; on a single core a class of n people runs at about 1/n of the single person frame rate.
+
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+from time import time
+
+import cv2
+import numpy as np
+
+from MediaPipeSetCounter import curl_counter_step
+from PoseScoring import JOINT_NAMES, calculateAngles
+from RealTimePoseDetection import VIDEO_POSE_OPTIONS, classifyPose, loadMediapipe
+
+
+# Index of the left elbow angle in the output of calculateAngles, used by the curl counter.
+_LEFT_ELBOW = JOINT_NAMES.index('left_elbow')
+
+
+def iouMatrix(boxes1, boxes2):
+    '''
+    This function calculates the intersection over union between two sets of boxes.
+    Args:
+        boxes1: An array of shape (N, 4) of boxes as (x1, y1, x2, y2).
+        boxes2: An array of shape (M, 4) of boxes as (x1, y1, x2, y2).
+    Returns:
+        iou: An array of shape (N, M) with the IoU of every pair of boxes.
+    '''
+
+    # Calculate the corners of the intersection of every pair of boxes.
+    boxes1, boxes2 = np.asarray(boxes1, dtype=float)[:, None], np.asarray(boxes2, dtype=float)[None]
+    x1 = np.maximum(boxes1[..., 0], boxes2[..., 0])
+    y1 = np.maximum(boxes1[..., 1], boxes2[..., 1])
+    x2 = np.minimum(boxes1[..., 2], boxes2[..., 2])
+    y2 = np.minimum(boxes1[..., 3], boxes2[..., 3])
+
+    # Calculate the areas of the intersections and of the boxes.
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area1 = (boxes1[..., 2] - boxes1[..., 0]) * (boxes1[..., 3] - boxes1[..., 1])
+    area2 = (boxes2[..., 2] - boxes2[..., 0]) * (boxes2[..., 3] - boxes2[..., 1])
+
+    # Return the intersection over union.
+    return intersection / np.maximum(area1 + area2 - intersection, 1e-9)
+
+
+def padBoxes(boxes, margin):
+    '''
+    This function enlarges boxes by a relative margin on every side.
+    Args:
+        boxes: An array of shape (N, 4) of boxes as (x1, y1, x2, y2).
+        margin: The margin as a share of the width and height of every box.
+    Returns:
+        boxes: An array of shape (N, 4) of the enlarged boxes.
+    '''
+
+    boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+    margins = (boxes[:, 2:] - boxes[:, :2]) * margin
+    return np.concatenate([boxes[:, :2] - margins, boxes[:, 2:] + margins], axis=1)
+
+
+def matchBoxes(boxes1, boxes2, min_iou=0.3):
+    '''
+    This function greedily matches two sets of boxes by decreasing IoU.
+    Args:
+        boxes1: An array of shape (N, 4) of boxes, for example the boxes of the current tracks.
+        boxes2: An array of shape (M, 4) of boxes, for example the new detections.
+        min_iou: The minimum IoU for two boxes to be matched.
+    Returns:
+        matches: A list of (index in boxes1, index in boxes2) pairs.
+    '''
+
+    # Check if there is anything to match.
+    if len(boxes1) == 0 or len(boxes2) == 0:
+        return []
+
+    # Calculate the IoU of every pair and visit the pairs from the best to the worst overlap.
+    iou = iouMatrix(boxes1, boxes2)
+    matches, used1, used2 = [], set(), set()
+    for flat_index in np.argsort(iou, axis=None)[::-1]:
+        i, j = np.unravel_index(flat_index, iou.shape)
+
+        # Stop once the remaining pairs do not overlap enough.
+        if iou[i, j] < min_iou:
+            break
+
+        # Match the pair if neither box is already taken.
+        if i not in used1 and j not in used2:
+            matches.append((int(i), int(j)))
+            used1.add(i)
+            used2.add(j)
+
+    return matches
+
+
+class Track:
+    '''
+    A person followed across frames, with their own pose landmarker and curl counter state.
+    '''
+
+    def __init__(self, track_id, box, pose):
+        self.track_id = track_id
+        self.box = np.asarray(box, dtype=float)
+        self.pose = pose
+        self.landmarks = None
+        self.label = 'Unknown Pose'
+        self.counter = 0
+        self.stage = None
+        self.missed = 0
+
+
+class MultiPersonPoseDetector:
+    '''
+    Detects, tracks and classifies the poses of every person in a video stream.
+    Args:
+        detect_every: Run the person detector every this many frames, tracks follow their landmarks in between.
+        detection_scale: The scale at which the frame is downsized for the person detector.
+        max_missed: Drop a track after this many frames without landmarks.
+        box_margin: The relative margin added around a person's box before cropping.
+        max_overlap: The IoU of the boxes of two tracks above which they follow the same person and one is dropped.
+        confirm_detections: The number of detector runs in a row a new person must be found by to start a track.
+        max_workers: The number of threads running the per-person landmarkers.
+        pool_size: The number of Pose instances of dropped tracks kept for new tracks.
+        pose_options: The keyword arguments of mp_pose.Pose used for every track.
+    '''
+
+    def __init__(self, detect_every=15, detection_scale=0.5, max_missed=10, box_margin=0.2, max_overlap=0.6,
+                 confirm_detections=2, max_workers=4, pool_size=4, **pose_options):
+        self.detect_every = detect_every
+        self.detection_scale = detection_scale
+        self.max_missed = max_missed
+        self.box_margin = box_margin
+        self.max_overlap = max_overlap
+        self.confirm_detections = confirm_detections
+        self.pool_size = pool_size
+        self.pose_options = dict(VIDEO_POSE_OPTIONS)
+        self.pose_options.update(pose_options)
+        self.tracks = []
+        self.frame_index = 0
+        self._ids = count(1)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._hog = None
+        # The (box, detector runs in a row) of the detections waiting to start a track, and the idle Pose instances.
+        self._candidates = []
+        self._pool = []
+
+    def close(self):
+        '''
+        This function releases the threads and the landmarkers of all the tracks.
+        '''
+
+        self._executor.shutdown()
+        for pose in [track.pose for track in self.tracks] + self._pool:
+            pose.close()
+        self.tracks, self._pool, self._candidates = [], [], []
+
+    def detectPeople(self, frame):
+        '''
+        This function localizes the people in a frame.
+        Args:
+            frame: The BGR frame.
+        Returns:
+            boxes: An array of shape (N, 4) of person boxes as (x1, y1, x2, y2) in frame pixels.
+        '''
+
+        # Create the HOG people detector on first use.
+        if self._hog is None:
+            self._hog = cv2.HOGDescriptor()
+            self._hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+
+        # Detect the people on a downscaled copy of the frame.
+        small = cv2.resize(frame, None, fx=self.detection_scale, fy=self.detection_scale)
+        rects, _ = self._hog.detectMultiScale(small, winStride=(8, 8), padding=(8, 8), scale=1.05)
+
+        # Check if anyone was found.
+        if len(rects) == 0:
+            return np.zeros((0, 4))
+
+        # Convert the (x, y, w, h) rectangles into corner boxes in the original frame scale.
+        rects = np.asarray(rects, dtype=float) / self.detection_scale
+        return np.column_stack([rects[:, 0], rects[:, 1], rects[:, 0] + rects[:, 2], rects[:, 1] + rects[:, 3]])
+
+    def _newPose(self):
+        '''
+        This function gives a new track a pose landmarker, an idle one of the pool if there is one.
+        '''
+
+        # Restart the graph of a pooled landmarker, so it does not follow the landmarks of its previous track.
+        if self._pool:
+            pose = self._pool.pop()
+            pose.reset()
+            return pose
+
+        mp_pose, _ = loadMediapipe()
+        return mp_pose.Pose(**self.pose_options)
+
+    def _releasePose(self, pose):
+        '''
+        This function keeps the pose landmarker of a dropped track for the next track, or closes it if the pool
+        is full.
+        '''
+
+        if len(self._pool) < self.pool_size:
+            self._pool.append(pose)
+        else:
+            pose.close()
+
+    def _crop(self, frame, box):
+        '''
+        This function returns the region of a frame around a box, enlarged by the box margin.
+        '''
+
+        # Enlarge the box and clip it to the frame.
+        height, width, _ = frame.shape
+        x1, y1, x2, y2 = padBoxes(box, self.box_margin)[0]
+        x1, y1 = int(max(x1, 0)), int(max(y1, 0))
+        x2, y2 = int(min(x2, width)), int(min(y2, height))
+
+        return x1, y1, x2, y2
+
+    def _processTrack(self, track, frame):
+        '''
+        This function runs the landmarker of a track on its crop and converts the landmarks to frame pixels.
+        '''
+
+        # Crop the region of interest of the person.
+        x1, y1, x2, y2 = self._crop(frame, track.box)
+        if x2 - x1 < 16 or y2 - y1 < 16:
+            return None
+
+        # Perform the pose detection on the crop.
+        results = track.pose.process(cv2.cvtColor(frame[y1:y2, x1:x2], cv2.COLOR_BGR2RGB))
+        if not results.pose_landmarks:
+            return None
+
+        # Convert the landmarks into frame pixel coordinates, the z coordinate scaled like detectPose does.
+        landmarks = np.array([(landmark.x, landmark.y, landmark.z, landmark.visibility)
+                              for landmark in results.pose_landmarks.landmark])
+        landmarks[:, 0] = landmarks[:, 0] * (x2 - x1) + x1
+        landmarks[:, 1] = landmarks[:, 1] * (y2 - y1) + y1
+        landmarks[:, 2] = landmarks[:, 2] * (x2 - x1)
+
+        return landmarks
+
+    def _updateTracks(self, boxes):
+        '''
+        This function matches new person detections to the tracks and starts tracks for the unmatched ones.
+        '''
+
+        # Match the detections to the boxes the tracks are cropped with. A track follows the tight box of its
+        # landmarks, which overlaps too little with the looser box of the detector.
+        matches = matchBoxes(padBoxes([track.box for track in self.tracks], self.box_margin), boxes)
+        for i, j in matches:
+            self.tracks[i].box = boxes[j]
+
+        # Count the detector runs in a row every detection that did not match any track was found by, matching
+        # them to the detections waiting from the previous run.
+        matched = {j for _, j in matches}
+        unmatched = [box for j, box in enumerate(boxes) if j not in matched]
+        runs = [1] * len(unmatched)
+        for i, j in matchBoxes([box for box, _ in self._candidates], unmatched):
+            runs[j] = self._candidates[i][1] + 1
+
+        # Start a track for the detections found often enough, the others wait for the next run.
+        self._candidates = []
+        for box, found in zip(unmatched, runs):
+            if found >= self.confirm_detections:
+                self.tracks.append(Track(next(self._ids), box, self._newPose()))
+            else:
+                self._candidates.append((box, found))
+
+    def process(self, frame):
+        '''
+        This function detects, tracks and classifies the poses of everyone in a frame.
+        Args:
+            frame: The BGR frame. The pose labels of the tracks are written on it.
+        Returns:
+            tracks: The list of active tracks with their updated landmarks, label and curl counter.
+        '''
+
+        # Run the person detector periodically, on every frame while there is nobody to follow, and on the next
+        # frame while new detections wait to be confirmed. Lost tracks coast on their last box meanwhile.
+        if self.frame_index % self.detect_every == 0 or not self.tracks or self._candidates:
+            self._updateTracks(self.detectPeople(frame))
+        self.frame_index += 1
+
+        # Run the landmarkers of all the tracks in parallel.
+        results = list(self._executor.map(lambda track: self._processTrack(track, frame), self.tracks))
+
+        # Update every track with its landmarks.
+        for track, landmarks in zip(self.tracks, results):
+            track.landmarks = landmarks
+
+            # Check if the person was lost in this frame.
+            if landmarks is None:
+                track.missed += 1
+                continue
+            track.missed = 0
+
+            # Follow the person with the bounding box of their visible landmarks.
+            visible = landmarks[landmarks[:, 3] > 0.5, :2]
+            if len(visible):
+                track.box = np.concatenate([visible.min(axis=0), visible.max(axis=0)])
+
+            # Perform the Pose Classification, writing the label at the top left of the person's box.
+            x1, y1, x2, y2 = self._crop(frame, track.box)
+            _, track.label = classifyPose(landmarks[:, :3], frame[y1:y2, x1:x2], display=False)
+
+            # Advance the curl counter with the left elbow angle folded into [0, 180].
+            angle = calculateAngles(landmarks)[_LEFT_ELBOW]
+            track.counter, track.stage = curl_counter_step(min(angle, 360 - angle), track.counter, track.stage)
+
+        # Drop the tracks that follow the same person as another one and those lost for too long.
+        self._suppressDuplicates()
+        for track in self.tracks:
+            if track.missed > self.max_missed:
+                self._releasePose(track.pose)
+        self.tracks = [track for track in self.tracks if track.missed <= self.max_missed]
+
+        return self.tracks
+
+    def _suppressDuplicates(self):
+        '''
+        This function drops the tracks whose box overlaps the box of a better track by more than max_overlap,
+        preferring the tracks that found their landmarks and then the older ones.
+        '''
+
+        if len(self.tracks) < 2:
+            return
+
+        # Visit the tracks from the best to the worst and keep those that do not overlap a kept one.
+        iou = iouMatrix([track.box for track in self.tracks], [track.box for track in self.tracks])
+        kept = []
+        for i in sorted(range(len(self.tracks)), key=lambda i: (self.tracks[i].missed, self.tracks[i].track_id)):
+            if all(iou[i, j] <= self.max_overlap for j in kept):
+                kept.append(i)
+            else:
+                self._releasePose(self.tracks[i].pose)
+        self.tracks = [self.tracks[i] for i in sorted(kept)]
+
+
+def drawTracks(frame, tracks):
+    '''
+    This function draws the box, track ID and rep count of every track on a frame.
+    Args:
+        frame: The BGR frame to draw on.
+        tracks: The tracks returned by MultiPersonPoseDetector.process.
+    Returns:
+        frame: The frame with the tracks drawn.
+    '''
+
+    for track in tracks:
+        x1, y1, x2, y2 = track.box.astype(int)
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (245, 117, 16), 2)
+        cv2.putText(frame, f'#{track.track_id} REPS {track.counter}', (x1, max(y2 - 10, 0)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2, cv2.LINE_AA)
+
+    return frame
+
+
+if __name__ == '__main__':
+
+    # Initialize the multi-person detector and the VideoCapture object to read from the webcam.
+    detector = MultiPersonPoseDetector()
+    camera_video = cv2.VideoCapture(0)
+    camera_video.set(3, 1280)
+    camera_video.set(4, 960)
+
+    # Initialize a resizable window.
+    cv2.namedWindow('Multi-Person Pose Classification', cv2.WINDOW_NORMAL)
+
+    # Initialize a variable to store the time of the previous frame.
+    time1 = 0
+
+    # Iterate until the webcam is accessed successfully.
+    while camera_video.isOpened():
+
+        # Read a frame.
+        ok, frame = camera_video.read()
+        if not ok:
+            continue
+
+        # Flip the frame horizontally for natural (selfie-view) visualization.
+        frame = cv2.flip(frame, 1)
+
+        # Detect, track and classify everyone in the frame.
+        tracks = detector.process(frame)
+        drawTracks(frame, tracks)
+
+        # Write the number of frames per second on the frame.
+        time2 = time()
+        if (time2 - time1) > 0:
+            cv2.putText(frame, 'FPS: {} PEOPLE: {}'.format(int(1.0 / (time2 - time1)), len(tracks)), (10, 30),
+                        cv2.FONT_HERSHEY_PLAIN, 2, (0, 255, 0), 3)
+        time1 = time2
+
+        # Display the frame.
+        cv2.imshow('Multi-Person Pose Classification', frame)
+
+        # Check if 'ESC' is pressed.
+        if cv2.waitKey(1) & 0xFF == 27:
+            break
+
+    # Release the VideoCapture object, the detector and close the windows.
+    camera_video.release()
+    detector.close()
+    cv2.destroyAllWindows()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Lightweight Overlay Renderer
+#
+# The live loops drew every frame with mp_drawing.draw_landmarks, which walks the landmarks in Python and draws
+# every connection and landmark with its own OpenCV call, with DrawingSpec objects built again for every frame, and
+# drew the REPS/STAGE box with a rectangle and a putText call per label. This module draws the same overlay with
+# everything that does not change prepared once:
+#
+# * **SkeletonRenderer** - the colors and sizes are fixed when it is created, and a frame costs two polylines
+#   calls: one for all the visible connections and one for all the visible landmarks (a one-point polyline is a
+#   filled dot).
+# * **StatusPanel** - the box and its static labels are rendered once into a small layer, which is copied onto the
+#   frame, so only the values are written every frame.
+# * **formatAngle** - angles are written as whole degrees instead of the full precision float.
+#
+# The loops do not draw at all in headless mode.
+
+import cv2
+import numpy as np
+
+from PoseLandmarks import POSE_CONNECTIONS
+
+
+def formatAngle(angle):
+    '''
+    This function formats an angle for the overlay.
+    Args:
+        angle: The angle in degrees, NaN if it could not be measured.
+    Returns:
+        text: The angle rounded to whole degrees, '-' for NaN.
+    '''
+
+    return '-' if np.isnan(angle) else f'{angle:.0f}'
+
+
+class SkeletonRenderer:
+    '''
+    Draws the skeleton of a pose with prebuilt colors and sizes.
+    Args:
+        connection_color: The BGR color of the connections.
+        landmark_color: The BGR color of the landmarks.
+        thickness: The thickness of the connections.
+        radius: The radius of the landmark dots.
+        min_visibility: The minimum visibility for a landmark to be drawn, like mp_drawing does.
+    '''
+
+    def __init__(self, connection_color=(224, 224, 224), landmark_color=(0, 0, 255), thickness=2, radius=3,
+                 min_visibility=0.5):
+        self.connection_color = connection_color
+        self.landmark_color = landmark_color
+        self.thickness = thickness
+        self.dot_thickness = 2 * radius
+        self.min_visibility = min_visibility
+
+    def draw(self, frame, landmarks):
+        '''
+        This function draws the skeleton on a frame.
+        Args:
+            frame: The BGR frame to draw on.
+            landmarks: An array of shape (33, 2), (33, 3) or (33, 4) or a list of tuples of landmarks in pixel
+                       coordinates. When a fourth column is given, it is the visibility.
+        Returns:
+            frame: The frame with the skeleton drawn.
+        '''
+
+        landmarks = np.asarray(landmarks, dtype=np.float32)
+        if np.isnan(landmarks[:, :2]).any():
+            return frame
+        points = landmarks[:, :2].astype(np.int32)
+
+        if landmarks.shape[1] > 3:
+            visible = landmarks[:, 3] >= self.min_visibility
+            connections = POSE_CONNECTIONS[visible[POSE_CONNECTIONS].all(axis=1)]
+            points_visible = points[visible]
+        else:
+            connections, points_visible = POSE_CONNECTIONS, points
+
+        cv2.polylines(frame, list(points[connections]), False, self.connection_color, self.thickness, cv2.LINE_AA)
+        cv2.polylines(frame, list(points_visible[:, np.newaxis]), True, self.landmark_color, self.dot_thickness,
+                      cv2.LINE_AA)
+        return frame
+
+
+class StatusPanel:
+    '''
+    A box in the top left corner with a static header and one row per counter, rendered once.
+    Args:
+        rows: The labels of the rows.
+        header: The text of the header line.
+        width: The width of the box.
+        row_height: The height of every row.
+        color: The BGR color of the box.
+        value_x: The x coordinate the values of the rows are written at.
+    '''
+
+    def __init__(self, rows, header='', width=300, row_height=30, color=(245, 117, 16), value_x=120):
+        self.rows = list(rows)
+        self.row_height = row_height
+        self.value_x = value_x
+
+        # Render the box and everything in it that does not change.
+        self.layer = np.empty((20 + row_height * len(self.rows), width, 3), dtype=np.uint8)
+        self.layer[:] = color
+        cv2.putText(self.layer, header, (value_x, 14), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1, cv2.LINE_AA)
+        for row, label in enumerate(self.rows):
+            cv2.putText(self.layer, label, (10, self._y(row)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1,
+                        cv2.LINE_AA)
+
+    def _y(self, row):
+        return 42 + self.row_height * row
+
+    def draw(self, frame, values):
+        '''
+        This function copies the box onto a frame and writes the values of the rows.
+        Args:
+            frame: The BGR frame to draw on.
+            values: The text of every row.
+        Returns:
+            frame: The frame with the box drawn.
+        '''
+
+        height, width = min(self.layer.shape[0], frame.shape[0]), min(self.layer.shape[1], frame.shape[1])
+        frame[:height, :width] = self.layer[:height, :width]
+        for row, value in enumerate(values):
+            cv2.putText(frame, value, (self.value_x, self._y(row)), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255),
+                        2, cv2.LINE_AA)
+        return frame
@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Pose Landmark Indexes
+#
+# The indexes of the landmarks the modules measure, as defined by mp.solutions.pose.PoseLandmark, and the
+# connections of the skeleton. They are plain constants so that indexing and drawing saved landmarks needs neither
+# mediapipe nor any of the other modules: the detection modules, the renderers and the scoring and analytics built
+# on them all import them from here.
+
+import numpy as np
+
+# Indexes of the landmarks we need, as defined by mp.solutions.pose.PoseLandmark.
+LEFT_SHOULDER, RIGHT_SHOULDER = 11, 12
+LEFT_ELBOW, RIGHT_ELBOW = 13, 14
+LEFT_WRIST, RIGHT_WRIST = 15, 16
+LEFT_HIP, RIGHT_HIP = 23, 24
+LEFT_KNEE, RIGHT_KNEE = 25, 26
+LEFT_ANKLE, RIGHT_ANKLE = 27, 28
+
+# The pairs of landmarks connected in the skeleton, the same as mp.solutions.pose.POSE_CONNECTIONS.
+POSE_CONNECTIONS = np.array([
+    (0, 1), (0, 4), (1, 2), (2, 3), (3, 7), (4, 5), (5, 6), (6, 8), (9, 10), (11, 12), (11, 13), (11, 23),
+    (12, 14), (12, 24), (13, 15), (14, 16), (15, 17), (15, 19), (15, 21), (16, 18), (16, 20), (16, 22), (17, 19),
+    (18, 20), (23, 24), (23, 25), (24, 26), (25, 27), (26, 28), (27, 29), (27, 31), (28, 30), (28, 32), (29, 31),
+    (30, 32),
+])
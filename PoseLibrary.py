@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Reference Pose Library
+#
+# The reference images in media/ (warriorIIpose*.jpg, treepose*.jpg, Tpose*.jpg, cobrapose*.jpg) used to be
+# decoded and run through the slowest pose model every time a template was needed. This build step processes the
+# whole reference library once, in parallel processes, and stores everything later steps need in one .npz file:
+#
+# * the landmarks of every image in pixel coordinates with their visibility, NaN when no person was found,
+# * the normalized (centred, unit size) shapes, visibility weights and joint angles of PoseScoring's templates,
+# * a small square thumbnail of every image for galleries.
+#
+# Every image is stored with its size and modification time, so a rebuild only runs the detection on the images
+# that were added or changed since the last build. Loading the library takes a few milliseconds: the scoring
+# templates (PoseScoring.loadTemplates) and the classification demo are loaded from it at startup, and fall back to
+# detecting the poses in the images when it was not built. Without network access the lite and heavy models cannot
+# be downloaded, the images are then processed with the model that ships with mediapipe.
+#
+# Usage:
+#     python PoseLibrary.py --output pose_library.npz
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from time import time
+
+import cv2
+import numpy as np
+
+from PoseScoring import POSE_TEMPLATE_IMAGES, PoseTemplate, calculateAngles, normalizeShape
+from RealTimePoseDetection import IMAGE_POSE_OPTIONS, createPose
+
+
+# The file name prefixes of the reference images and the pose they show.
+REFERENCE_POSES = {
+    'warriorIIpose': 'Warrior II Pose',
+    'Tpose': 'T Pose',
+    'treepose': 'Tree Pose',
+    'cobrapose': 'Cobra Pose',
+}
+
+# The lighter model finds the landmarks of these images better, like in runClassificationDemo.
+LIGHT_POSE_OPTIONS = dict(static_image_mode=True, min_detection_confidence=0.5, model_complexity=0)
+LIGHT_MODEL_IMAGES = {'treepose.jpg', 'treepose1.jpg'}
+
+# The default location of the built library.
+LIBRARY_PATH = 'pose_library.npz'
+
+# The arrays stored for every image, in the order of the paths.
+_PER_IMAGE = ('paths', 'labels', 'sizes', 'mtimes', 'landmarks', 'shapes', 'weights', 'angles', 'thumbnails')
+
+# The pose functions of a worker process, created on first use.
+_worker_poses = {}
+
+
+def findReferenceImages(folder='media'):
+    '''
+    This function lists the reference images of a folder.
+    Args:
+        folder: The folder holding the reference images.
+    Returns:
+        images: A sorted list of (path, label) tuples.
+    '''
+
+    images = []
+    for name in sorted(os.listdir(folder)):
+        stem, extension = os.path.splitext(name)
+        if extension.lower() not in ('.jpg', '.jpeg', '.png'):
+            continue
+        for prefix, label in REFERENCE_POSES.items():
+            if stem.startswith(prefix) and stem[len(prefix):].isdigit() or stem == prefix:
+                images.append((os.path.join(folder, name), label))
+                break
+    return images
+
+
+def makeThumbnail(image, size):
+    '''
+    This function shrinks an image into a square thumbnail, padding the shorter side with black.
+    Args:
+        image: The BGR image.
+        size: The width and height of the thumbnail.
+    Returns:
+        thumbnail: A uint8 array of shape (size, size, 3).
+    '''
+
+    height, width = image.shape[:2]
+    scale = size / max(height, width)
+    resized = cv2.resize(image, (max(int(width * scale), 1), max(int(height * scale), 1)),
+                         interpolation=cv2.INTER_AREA)
+    thumbnail = np.zeros((size, size, 3), dtype=np.uint8)
+    top, left = (size - resized.shape[0]) // 2, (size - resized.shape[1]) // 2
+    thumbnail[top:top + resized.shape[0], left:left + resized.shape[1]] = resized
+    return thumbnail
+
+
+def processImage(path, thumbnail_size=128):
+    '''
+    This function runs the pose detection on a reference image in a worker process.
+    Args:
+        path: The path of the image.
+        thumbnail_size: The width and height of the thumbnail.
+    Returns:
+        landmarks: An array of shape (33, 4) of the landmarks in pixel coordinates, NaN if no person was found.
+        thumbnail: The thumbnail of the image.
+    '''
+
+    # The lite and heavy models fall back to the full model when they cannot be downloaded (see createPose).
+    light = os.path.basename(path) in LIGHT_MODEL_IMAGES
+    if light not in _worker_poses:
+        _worker_poses[light] = createPose(LIGHT_POSE_OPTIONS if light else IMAGE_POSE_OPTIONS)
+
+    image = cv2.imread(path)
+    landmarks = np.full((33, 4), np.nan, dtype=np.float32)
+    results = _worker_poses[light].process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    if results.pose_landmarks:
+        # Scale the coordinates like detectPose does.
+        height, width = image.shape[:2]
+        landmarks[:] = [(landmark.x * width, landmark.y * height, landmark.z * width, landmark.visibility)
+                        for landmark in results.pose_landmarks.landmark]
+
+    return landmarks, makeThumbnail(image, thumbnail_size)
+
+
+def loadPoseLibrary(path=LIBRARY_PATH):
+    '''
+    This function loads a built pose library.
+    Args:
+        path: The path of the .npz file.
+    Returns:
+        library: A dictionary of the arrays listed in _PER_IMAGE, or None if the file does not exist.
+    '''
+
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        return {name: data[name] for name in _PER_IMAGE}
+
+
+def buildPoseLibrary(folder='media', output=LIBRARY_PATH, workers=None, thumbnail_size=128):
+    '''
+    This function builds or updates the pose library of a folder of reference images.
+    Args:
+        folder: The folder holding the reference images.
+        output: The path of the .npz file to write.
+        workers: The number of worker processes, the number of CPUs by default.
+        thumbnail_size: The width and height of the thumbnails.
+    Returns:
+        library: The library as returned by loadPoseLibrary.
+        processed: The number of images the detection was run on.
+    '''
+
+    images = findReferenceImages(folder)
+    stats = [os.stat(path) for path, _ in images]
+
+    # Reuse the entries of the images whose size and modification time did not change.
+    previous = loadPoseLibrary(output)
+    reusable = {}
+    if previous is not None and previous['thumbnails'].shape[1] == thumbnail_size:
+        for index, path in enumerate(previous['paths']):
+            reusable[(str(path), int(previous['sizes'][index]), int(previous['mtimes'][index]))] = index
+    keys = [(path, stat.st_size, stat.st_mtime_ns) for (path, _), stat in zip(images, stats)]
+    missing = [index for index, key in enumerate(keys) if key not in reusable]
+
+    # Run the detection on the new and changed images in parallel.
+    landmarks = np.full((len(images), 33, 4), np.nan, dtype=np.float32)
+    thumbnails = np.zeros((len(images), thumbnail_size, thumbnail_size, 3), dtype=np.uint8)
+    if missing:
+        with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count(), len(missing))) as executor:
+            results = executor.map(processImage, [images[index][0] for index in missing],
+                                   [thumbnail_size] * len(missing))
+            for index, (image_landmarks, thumbnail) in zip(missing, results):
+                landmarks[index], thumbnails[index] = image_landmarks, thumbnail
+    for index, key in enumerate(keys):
+        if key in reusable:
+            landmarks[index] = previous['landmarks'][reusable[key]]
+            thumbnails[index] = previous['thumbnails'][reusable[key]]
+
+    # Prepare the templates of all the images at once.
+    shapes, weights = normalizeShape(landmarks)
+    library = {
+        'paths': np.array([path for path, _ in images], dtype=str),
+        'labels': np.array([label for _, label in images], dtype=str),
+        'sizes': np.array([key[1] for key in keys], dtype=np.int64),
+        'mtimes': np.array([key[2] for key in keys], dtype=np.int64),
+        'landmarks': landmarks,
+        'shapes': shapes.astype(np.float32),
+        'weights': weights.astype(np.float32),
+        'angles': calculateAngles(landmarks).astype(np.float32),
+        'thumbnails': thumbnails,
+    }
+
+    # Write next to the output and rename, so a reader never loads half a file.
+    tmp_output = output + '.tmp.npz'
+    np.savez(tmp_output, **library)
+    os.replace(tmp_output, output)
+
+    return library, len(missing)
+
+
+def loadPoseTemplates(path=LIBRARY_PATH):
+    '''
+    This function creates the scoring templates of the poses from a built library.
+    Args:
+        path: The path of the .npz file.
+    Returns:
+        templates: A dictionary mapping every pose of POSE_TEMPLATE_IMAGES to its PoseTemplate, the poses whose
+                   image is missing from the library or has no detected person are left out.
+    '''
+
+    library = loadPoseLibrary(path)
+    if library is None:
+        return {}
+
+    paths = [os.path.normpath(path) for path in library['paths']]
+    templates = {}
+    for label, image_path in POSE_TEMPLATE_IMAGES.items():
+        if os.path.normpath(image_path) not in paths:
+            continue
+        index = paths.index(os.path.normpath(image_path))
+        if np.isnan(library['landmarks'][index]).any():
+            continue
+        templates[label] = PoseTemplate(library['shapes'][index], library['angles'][index],
+                                        library['weights'][index])
+    return templates
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Precompute the landmarks and templates of the reference images.')
+    parser.add_argument('--folder', default='media', help='folder of the reference images')
+    parser.add_argument('--output', default=LIBRARY_PATH, help='path of the .npz file to write')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--thumbnail-size', type=int, default=128, help='width and height of the thumbnails')
+    args = parser.parse_args()
+
+    time1 = time()
+    library, processed = buildPoseLibrary(args.folder, args.output, args.workers, args.thumbnail_size)
+    detected = int((~np.isnan(library['landmarks'][:, 0, 0])).sum())
+    print(f'{len(library["paths"])} reference images ({processed} processed, {detected} with a person) '
+          f'in {time() - time1:.2f}s')
+
+    time1 = time()
+    templates = loadPoseTemplates(args.output)
+    print(f'Loaded {len(templates)} templates in {(time() - time1) * 1000:.1f} ms')
@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Pose Similarity Scoring
+#
+# classifyPose only tells us *which* pose the person is in. To give corrections we also need to know *how close*
+# the person is to a reference pose and which joints are off. This module compares live landmarks against a
+# template pose in two steps:
+#
+# * **Procrustes alignment** - both skeletons are centred, scaled to unit size and the live skeleton is rotated
+#   onto the template, so the residual only measures the difference in body shape, not the position in the frame.
+# * **Per-joint angle deviations** - the same joint triplets used by classifyPose are measured on both skeletons
+#   and the signed difference (in degrees) is reported for every joint.
+#
+# Everything works on NumPy arrays of shape (33, 4) for a single frame or (N, 33, 4) for a whole session, with the
+# columns x, y, z and visibility, so a full session is scored with a handful of array operations.
+
+from collections import namedtuple
+from time import time
+
+import numpy as np
+
+from PoseLandmarks import (LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_ELBOW, RIGHT_ELBOW, LEFT_WRIST, RIGHT_WRIST,
+                           LEFT_HIP, RIGHT_HIP, LEFT_KNEE, RIGHT_KNEE, LEFT_ANKLE, RIGHT_ANKLE)
+
+# The joint triplets measured by classifyPose, in the same (first, mid, end) order, plus both hips.
+JOINT_TRIPLETS = {
+    'left_elbow': (LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST),
+    'right_elbow': (RIGHT_SHOULDER, RIGHT_ELBOW, RIGHT_WRIST),
+    'left_shoulder': (LEFT_ELBOW, LEFT_SHOULDER, LEFT_HIP),
+    'right_shoulder': (RIGHT_HIP, RIGHT_SHOULDER, RIGHT_ELBOW),
+    'left_knee': (LEFT_HIP, LEFT_KNEE, LEFT_ANKLE),
+    'right_knee': (RIGHT_HIP, RIGHT_KNEE, RIGHT_ANKLE),
+    'left_hip': (LEFT_SHOULDER, LEFT_HIP, LEFT_KNEE),
+    'right_hip': (RIGHT_KNEE, RIGHT_HIP, RIGHT_SHOULDER),
+}
+
+# The joint names in the column order of the returned deviation arrays.
+JOINT_NAMES = tuple(JOINT_TRIPLETS)
+
+# Index arrays of the first, mid and end landmark of every joint, used to gather all the joints at once.
+_FIRST, _MID, _END = (np.array(indexes) for indexes in zip(*JOINT_TRIPLETS.values()))
+
+# The reference images from the media folder used as templates for the poses classifyPose recognizes.
+POSE_TEMPLATE_IMAGES = {
+    'Warrior II Pose': 'media/warriorIIpose.jpg',
+    'T Pose': 'media/Tpose.jpg',
+    'Tree Pose': 'media/treepose.jpg',
+}
+
+# A template prepared once so that scoring a frame does not need to recompute anything on the reference side.
+PoseTemplate = namedtuple('PoseTemplate', ['shape', 'angles', 'weights'])
+
+
+def toLandmarkArray(landmarks):
+    '''
+    This function converts landmarks into a float array with the columns x, y, z and visibility.
+    Args:
+        landmarks: A list of (x, y, z) tuples as returned by detectPose, or an array of shape (..., 33, 3)
+                   or (..., 33, 4).
+    Returns:
+        landmarks: A float array of shape (..., 33, 4). A visibility of 1 is assumed when it is missing.
+    '''
+
+    # Convert the landmarks into a float array.
+    landmarks = np.asarray(landmarks, dtype=np.float64)
+
+    # Check if the visibility column is missing.
+    if landmarks.shape[-1] == 3:
+
+        # Append a visibility of 1 for every landmark.
+        landmarks = np.concatenate([landmarks, np.ones(landmarks.shape[:-1] + (1,))], axis=-1)
+
+    # Return the landmarks array.
+    return landmarks
+
+
+def calculateAngles(landmarks):
+    '''
+    This function calculates the angles of all the joints in JOINT_TRIPLETS at once.
+    Args:
+        landmarks: An array of shape (..., 33, 3) or (..., 33, 4) of landmarks in pixel coordinates.
+    Returns:
+        angles: An array of shape (..., len(JOINT_TRIPLETS)) with the angles in degrees in the range [0, 360),
+                computed the same way as calculateAngle.
+    '''
+
+    # Gather the x and y coordinates of the first, mid and end landmark of every joint.
+    points = np.asarray(landmarks)[..., :2]
+    first, mid, end = points[..., _FIRST, :], points[..., _MID, :], points[..., _END, :]
+
+    # Calculate the angle between the three points of every joint.
+    radians = (np.arctan2(end[..., 1] - mid[..., 1], end[..., 0] - mid[..., 0])
+               - np.arctan2(first[..., 1] - mid[..., 1], first[..., 0] - mid[..., 0]))
+
+    # Convert the angles into degrees in the range [0, 360).
+    return np.degrees(radians) % 360.0
+
+
+def _centreAndScale(points, weights):
+    '''
+    This function moves the weighted centroid of points to the origin and scales them to unit weighted size.
+    Args:
+        points: An array of shape (..., 33, 2).
+        weights: The weights of the points of shape (..., 33), summing to 1.
+    Returns:
+        shape: The centred and scaled points of shape (..., 33, 2).
+        centroid: The weighted centroid of the points of shape (..., 2).
+        size: The weighted size of the centred points of shape (...).
+    '''
+
+    # Move the weighted centroid to the origin.
+    centroid = np.einsum('...k,...ki->...i', weights, points)
+    shape = points - centroid[..., None, :]
+
+    # Scale the shape so that its weighted size is 1.
+    size = np.maximum(np.sqrt(np.einsum('...k,...ki,...ki->...', weights, shape, shape)), 1e-9)
+    return shape / size[..., None, None], centroid, size
+
+
+def normalizeShape(landmarks):
+    '''
+    This function centres the x and y coordinates of the landmarks and scales them to unit size.
+    Args:
+        landmarks: An array of shape (..., 33, 4).
+    Returns:
+        shape: The centred and scaled x and y coordinates of shape (..., 33, 2).
+        weights: The normalized visibility weights of shape (..., 33).
+    '''
+
+    # Use the visibility of every landmark as its weight, normalized to sum to 1.
+    weights = np.clip(landmarks[..., 3], 0.0, 1.0)
+    weights = weights / np.maximum(weights.sum(axis=-1, keepdims=True), 1e-9)
+
+    # Return the normalized shape and weights.
+    shape, _, _ = _centreAndScale(landmarks[..., :2], weights)
+    return shape, weights
+
+
+def prepareTemplate(landmarks):
+    '''
+    This function prepares the landmarks of a reference pose to be used as a scoring template.
+    Args:
+        landmarks: The landmarks of the reference pose, as accepted by toLandmarkArray.
+    Returns:
+        template: A PoseTemplate with the normalized shape, the joint angles and the visibility weights.
+    '''
+
+    # Convert the landmarks into an array.
+    landmarks = toLandmarkArray(landmarks)
+
+    # Normalize the shape and calculate the joint angles once.
+    shape, weights = normalizeShape(landmarks)
+
+    # Return the prepared template.
+    return PoseTemplate(shape, calculateAngles(landmarks), weights)
+
+
+def alignPose(landmarks, template):
+    '''
+    This function aligns live landmarks onto a template with a Procrustes (translation, scale, rotation) fit.
+    Args:
+        landmarks: The live landmarks of shape (33, 4) or (N, 33, 4).
+        template: A PoseTemplate returned by prepareTemplate.
+    Returns:
+        aligned: The live x and y coordinates after the alignment, in the coordinates of template.shape, of shape
+                 (..., 33, 2).
+        disparity: The remaining weighted squared distance to the template in the range [0, 1], 0 meaning the
+                   shapes are identical.
+    '''
+
+    # Normalize the live shape.
+    shape, weights = normalizeShape(toLandmarkArray(landmarks))
+
+    # Combine the live and the template visibility, so occluded joints count less on either side.
+    weights = weights * template.weights
+    weights = weights / np.maximum(weights.sum(axis=-1, keepdims=True), 1e-9)
+
+    # The residual below is only the Procrustes residual if both shapes are centred and of unit size under the
+    # combined weights, and each was normalized under its own visibility so far.
+    shape, _, _ = _centreAndScale(shape, weights)
+    reference, centroid, size = _centreAndScale(template.shape, weights)
+
+    # In 2D the optimal rotation has a closed form, so no SVD is needed.
+    # a is the weighted sum of the dot products and b of the cross products between the live and template points.
+    a = np.einsum('...k,...k->...', weights,
+                  shape[..., 0] * reference[..., 0] + shape[..., 1] * reference[..., 1])
+    b = np.einsum('...k,...k->...', weights,
+                  shape[..., 0] * reference[..., 1] - shape[..., 1] * reference[..., 0])
+    theta = np.arctan2(b, a)
+
+    # Rotate the live shape onto the template, and move it to the centroid and size of the template shape.
+    cos, sin = np.cos(theta)[..., None], np.sin(theta)[..., None]
+    aligned = np.stack([shape[..., 0] * cos - shape[..., 1] * sin,
+                        shape[..., 0] * sin + shape[..., 1] * cos], axis=-1)
+    aligned = aligned * size[..., None, None] + centroid[..., None, :]
+
+    # Calculate the weighted residual after the optimal scaling.
+    disparity = np.clip(1.0 - (a * a + b * b), 0.0, 1.0)
+
+    # Return the aligned shape and the disparity.
+    return aligned, disparity
+
+
+def scorePose(landmarks, template, angle_weight=0.5):
+    '''
+    This function scores how similar live landmarks are to a template pose.
+    Args:
+        landmarks: The live landmarks of shape (33, 4) or (N, 33, 4) in pixel coordinates, or a list of (x, y, z)
+                   tuples as returned by detectPose.
+        template: A PoseTemplate returned by prepareTemplate.
+        angle_weight: The share of the score given to the joint angles, the rest goes to the Procrustes fit.
+    Returns:
+        score: The similarity score in the range [0, 100], a float for a single frame or an array of shape (N,).
+        deviations: The signed deviation in degrees of every joint from the template, in the range [-180, 180),
+                    of shape (..., len(JOINT_NAMES)). A positive value means the joint is opened further than
+                    in the template.
+    '''
+
+    # Convert the landmarks into an array.
+    landmarks = toLandmarkArray(landmarks)
+
+    # Fit the live shape onto the template.
+    _, disparity = alignPose(landmarks, template)
+
+    # Calculate the signed deviation of every joint, wrapped into [-180, 180).
+    deviations = (calculateAngles(landmarks) - template.angles + 180.0) % 360.0 - 180.0
+
+    # Combine the shape residual and the mean absolute joint deviation into a single score.
+    angle_error = np.abs(deviations).mean(axis=-1) / 180.0
+    score = 100.0 * (1.0 - (1.0 - angle_weight) * disparity - angle_weight * angle_error)
+
+    # Return a plain float for a single frame.
+    if np.ndim(score) == 0:
+        score = float(score)
+
+    # Return the score and the deviations.
+    return score, deviations
+
+
+def jointDeviations(deviations, tolerance=15.0):
+    '''
+    This function lists the joints of a single frame whose deviation exceeds a tolerance.
+    Args:
+        deviations: The deviations of a single frame as returned by scorePose.
+        tolerance: The deviation in degrees up to which a joint is considered correct.
+    Returns:
+        corrections: A dictionary mapping the name of every joint out of tolerance to its deviation in degrees.
+    '''
+
+    # Keep only the joints that are out of tolerance.
+    return {name: float(deviation) for name, deviation in zip(JOINT_NAMES, deviations)
+            if abs(deviation) > tolerance}
+
+
+def loadPoseTemplate(image_path, pose):
+    '''
+    This function detects the pose in a reference image and prepares it as a template.
+    Args:
+        image_path: The path of the reference image, for example one of POSE_TEMPLATE_IMAGES.
+        pose: The pose setup function required to perform the pose detection.
+    Returns:
+        template: A PoseTemplate, or None if no person was detected in the image.
+    '''
+
+    # Import the detection code only when a template actually has to be built from an image.
+    import cv2
+    from RealTimePoseDetection import detectPose
+
+    # Read the image and perform the pose detection on it.
+    image = cv2.imread(image_path)
+    _, landmarks = detectPose(image, pose, display=False)
+
+    # Check if any landmarks are detected.
+    if not landmarks:
+        return None
+
+    # Return the prepared template.
+    return prepareTemplate(landmarks)
+
+
+def loadTemplates(library_path=None, pose=None):
+    '''
+    This function prepares the templates of the poses of POSE_TEMPLATE_IMAGES at startup, from the built pose
+    library (see PoseLibrary) when it holds them, and by detecting the pose in the images otherwise.
+    Args:
+        library_path: The path of the pose library, LIBRARY_PATH of PoseLibrary by default.
+        pose: The pose setup function used for the images missing from the library, the image Pose function by
+              default.
+    Returns:
+        templates: A dictionary mapping every pose to its PoseTemplate, the poses without a detected person are
+                   left out.
+    '''
+
+    # Import the library only when the templates are loaded, it imports this module.
+    from PoseLibrary import LIBRARY_PATH, loadPoseTemplates
+    templates = loadPoseTemplates(library_path or LIBRARY_PATH)
+
+    # Detect the poses the library does not hold in their images.
+    for label, image_path in POSE_TEMPLATE_IMAGES.items():
+        if label in templates:
+            continue
+        if pose is None:
+            from RealTimePoseDetection import getImagePose
+            pose = getImagePose()
+        template = loadPoseTemplate(image_path, pose)
+        if template is not None:
+            templates[label] = template
+
+    return templates
+
+
+if __name__ == '__main__':
+
+    # Benchmark the scorer on synthetic landmarks: a 10k frames session and a single live frame.
+    rng = np.random.default_rng(0)
+    template = prepareTemplate(np.concatenate([rng.uniform(0, 640, (33, 2)), np.zeros((33, 1)),
+                                               np.ones((33, 1))], axis=1))
+    session = np.concatenate([rng.uniform(0, 640, (10000, 33, 3)), rng.uniform(0, 1, (10000, 33, 1))], axis=-1)
+
+    time1 = time()
+    scorePose(session, template)
+    print(f'Session of {len(session)} frames: {(time() - time1) * 1000:.2f} ms')
+
+    repeats = 1000
+    time1 = time()
+    for frame in session[:repeats]:
+        scorePose(frame, template)
+    print(f'Single frame: {(time() - time1) / repeats * 1e6:.1f} us')
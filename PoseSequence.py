@@ -0,0 +1,358 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Pose Sequence and Flow Recognition
+#
+# classifyPose labels every frame on its own, so a flow from one pose to the next is only a noisy sequence of
+# labels, with 'Unknown Pose' frames while the person moves and wrong labels on single frames. This module decodes
+# the label stream with a hidden Markov model of the allowed transitions instead:
+#
+# * every pose of POSE_GRAPH is a state, the person moving from a pose to one of the poses it leads to is a state
+#   of its own, and 'Unknown Pose' is a rest state any pose can be left for and reached from,
+# * the labels of classifyPose (or the label probabilities of a soft classifier) are the observations, with a
+#   fixed accuracy of the classifier,
+# * a fixed-lag Viterbi decoder keeps the best path into every state and commits the state of a frame once it is
+#   lookback frames old. A frame costs O(states^2) for the step and O(lookback) for the trace back, and the
+#   decoder steps all the users of a studio in one vectorized call,
+# * a FlowTracker per user turns the committed states into pose holds, transitions with their timings and the
+#   FLOWS they complete.
+#
+# Usage:
+#     python PoseSequence.py media/exercising.mp4
+
+import argparse
+from collections import deque, namedtuple
+
+import numpy as np
+
+# The labels of classifyPose, the first one is the label of the frames without a known pose.
+POSE_LABELS = ('Unknown Pose', 'T Pose', 'Warrior II Pose', 'Tree Pose')
+
+# The poses every pose can flow into. Other changes of pose go through the rest state.
+POSE_GRAPH = {
+    'T Pose': ('Warrior II Pose', 'Tree Pose'),
+    'Warrior II Pose': ('T Pose',),
+    'Tree Pose': ('T Pose',),
+}
+
+# The flows recognized in the sequence of poses held.
+FLOWS = {
+    'Warrior Flow': ('T Pose', 'Warrior II Pose', 'T Pose'),
+    'Balance Flow': ('T Pose', 'Tree Pose', 'T Pose'),
+    'Full Flow': ('T Pose', 'Warrior II Pose', 'T Pose', 'Tree Pose', 'T Pose'),
+}
+
+# The hidden Markov model of a pose graph.
+#   states: The names of the states, the rest state first, then the poses, then the moves between them.
+#   labels: The labels observed.
+#   log_transition: An array of shape (states, states) of the log probabilities to go from a state to another.
+#   emission: An array of shape (states, labels) of the probabilities to observe every label in every state.
+#   log_initial: An array of shape (states,) of the log probabilities to start in every state.
+#   pose_of_state: An array of shape (states,) of the label index of the pose states, -1 for the others.
+FlowModel = namedtuple('FlowModel', ['states', 'labels', 'log_transition', 'emission', 'log_initial',
+                                     'pose_of_state'])
+
+
+def buildFlowModel(graph=POSE_GRAPH, labels=POSE_LABELS, accuracy=0.8, switch=0.02, transit_frames=15,
+                   off_graph=0.1):
+    '''
+    This function builds the hidden Markov model of a pose graph.
+    Args:
+        graph: A dictionary mapping every pose to the poses it can flow into.
+        labels: The labels of the classifier, the first one is the label of the rest state.
+        accuracy: The probability that the classifier gives the label of the state the person is in.
+        switch: The probability to leave a pose or the rest state on a frame.
+        transit_frames: The mean number of frames of a move from a pose to the next.
+        off_graph: The share of switch that leaves a pose for the rest state instead of a pose of the graph.
+    Returns:
+        model: A FlowModel.
+    '''
+
+    poses = list(dict.fromkeys([pose for pose in graph] + [pose for nexts in graph.values() for pose in nexts]))
+    moves = [(pose, next_pose) for pose in graph for next_pose in graph[pose]]
+    states = [labels[0]] + poses + [f'{pose} -> {next_pose}' for pose, next_pose in moves]
+    index = {state: number for number, state in enumerate(states)}
+    label_index = {label: number for number, label in enumerate(labels)}
+
+    transition = np.zeros((len(states), len(states)))
+    emission = np.zeros((len(states), len(labels)))
+
+    # The rest state is left for any pose.
+    transition[0, 0] = 1 - switch
+    transition[0, [index[pose] for pose in poses]] = switch / len(poses)
+    emission[0, 0] = accuracy
+
+    # A pose is left for the moves to the poses it flows into, or for the rest state.
+    for pose in poses:
+        transition[index[pose], index[pose]] = 1 - switch
+        nexts = graph.get(pose, ())
+        transition[index[pose], 0] = switch * (off_graph if nexts else 1)
+        for next_pose in nexts:
+            transition[index[pose], index[f'{pose} -> {next_pose}']] = switch * (1 - off_graph) / len(nexts)
+        emission[index[pose], label_index[pose]] = accuracy
+
+    # A move ends in its pose, or is given up for the rest state. While moving, the classifier mostly sees no pose
+    # and sometimes one of the two poses.
+    for pose, next_pose in moves:
+        move = index[f'{pose} -> {next_pose}']
+        transition[move, move] = 1 - 1 / transit_frames
+        transition[move, index[next_pose]] = (1 - off_graph) / transit_frames
+        transition[move, 0] = off_graph / transit_frames
+        emission[move, 0] = accuracy
+        emission[move, [label_index[pose], label_index[next_pose]]] = (1 - accuracy) / 3
+
+    # The other labels share what is left of every row.
+    for row in emission:
+        others = row == 0
+        row[others] = (1 - row.sum()) / max(others.sum(), 1)
+
+    initial = np.zeros(len(states))
+    initial[:len(poses) + 1] = 1 / (len(poses) + 1)
+    pose_of_state = np.array([label_index[state] if state in poses else -1 for state in states])
+
+    with np.errstate(divide='ignore'):
+        return FlowModel(states, tuple(labels), np.log(transition), emission / emission.sum(axis=1, keepdims=True),
+                         np.log(initial), pose_of_state)
+
+
+class FlowDecoder:
+    '''
+    A fixed-lag Viterbi decoder of the states of a FlowModel for a batch of users.
+    Args:
+        model: The FlowModel to decode.
+        users: The number of users decoded together.
+        lookback: The number of frames a state is committed after, the longest trace back of a step.
+    '''
+
+    def __init__(self, model, users=1, lookback=15):
+        self.model = model
+        self.users = users
+        self.lookback = max(int(lookback), 1)
+        self.frames = 0
+        self.delta = np.tile(model.log_initial, (users, 1))
+        self._log_emission = np.log(model.emission)
+        # The best previous state of every state on the last lookback frames, in a ring.
+        self._pointers = np.zeros((self.lookback, users, len(model.states)), dtype=np.intp)
+        self._users = np.arange(users)
+
+    def _logEmission(self, observations):
+        observations = np.asarray(observations)
+        if observations.ndim == 1:
+            return self._log_emission[:, observations].T
+        # Label probabilities of a soft classifier: the probability of the observation in every state.
+        with np.errstate(divide='ignore'):
+            return np.log(observations @ self.model.emission.T)
+
+    def _traceBack(self, states, steps):
+        for back in range(steps):
+            states = self._pointers[(self.frames - 1 - back) % self.lookback, self._users, states]
+        return states
+
+    def step(self, observations):
+        '''
+        This function adds a frame of every user and commits the states of the frame lookback - 1 frames before it.
+        Args:
+            observations: An array of shape (users,) of label indexes, or of shape (users, labels) of label
+                          probabilities.
+        Returns:
+            states: An array of shape (users,) of the committed state indexes, None until lookback frames were
+                    added.
+        '''
+
+        scores = self.delta[:, :, np.newaxis] + self.model.log_transition
+        pointers = scores.argmax(axis=1)
+        delta = np.take_along_axis(scores, pointers[:, np.newaxis], axis=1)[:, 0] + self._logEmission(observations)
+        # Keep the scores near zero, only their differences matter.
+        self.delta = delta - delta.max(axis=1, keepdims=True)
+        self._pointers[self.frames % self.lookback] = pointers
+        self.frames += 1
+
+        if self.frames < self.lookback:
+            return None
+        return self._traceBack(self.delta.argmax(axis=1), self.lookback - 1)
+
+    def flush(self):
+        '''
+        This function commits the states of the frames that are not committed yet, at the end of the stream.
+        Returns:
+            states: An array of shape (users, frames) of the state indexes of the last min(frames, lookback - 1)
+                    frames, in order.
+        '''
+
+        count = min(self.frames, self.lookback - 1)
+        states = np.zeros((self.users, count), dtype=np.intp)
+        current = self.delta.argmax(axis=1)
+        for back in range(count):
+            states[:, count - 1 - back] = current
+            current = self._pointers[(self.frames - 1 - back) % self.lookback, self._users, current]
+        return states
+
+
+class FlowTracker:
+    '''
+    Turns the committed states of one user into pose holds, transitions and flows.
+    Args:
+        model: The FlowModel of the states.
+        flows: A dictionary mapping the name of every flow to its sequence of poses.
+    '''
+
+    def __init__(self, model, flows=FLOWS):
+        self.model = model
+        self.flows = {name: tuple(poses) for name, poses in flows.items()}
+        self._pose = -1
+        self._start = self._last = None
+        # The last poses held with the time they were reached, as many as the longest flow.
+        self._history = deque(maxlen=max(map(len, self.flows.values()), default=1))
+        self._left_at = None
+
+    def update(self, state, timestamp):
+        '''
+        This function adds the committed state of a frame.
+        Args:
+            state: The state index.
+            timestamp: The time of the frame in seconds.
+        Returns:
+            events: A list of dictionaries, one per event the frame ended: a 'pose' hold with its 'start', 'end'
+                    and 'seconds', a 'transition' 'from' a pose 'to' the next with its 'start', 'end' and
+                    'seconds', and a 'flow' with its 'start' and 'end'.
+        '''
+
+        pose = self.model.pose_of_state[state]
+        if pose == self._pose:
+            self._last = timestamp
+            return []
+
+        events = []
+        labels = self.model.labels
+        if self._pose >= 0:
+            events.append({'event': 'pose', 'pose': labels[self._pose], 'start': self._start, 'end': self._last,
+                           'seconds': self._last - self._start})
+            self._left_at = self._last
+
+        # A pose held again after a moment without one continues the sequence instead of being a transition.
+        if pose >= 0 and (not self._history or self._history[-1][0] != labels[pose]):
+            if self._history:
+                previous = self._history[-1][0]
+                events.append({'event': 'transition', 'from': previous, 'to': labels[pose], 'start': self._left_at,
+                               'end': timestamp, 'seconds': timestamp - self._left_at})
+            self._history.append((labels[pose], timestamp))
+            sequence = tuple(label for label, _ in self._history)
+            for name, poses in self.flows.items():
+                if sequence[-len(poses):] == poses:
+                    events.append({'event': 'flow', 'flow': name, 'start': self._history[-len(poses)][1],
+                                   'end': timestamp})
+
+        self._pose, self._start, self._last = pose, timestamp, timestamp
+        return events
+
+    def finish(self):
+        '''
+        This function ends the stream.
+        Returns:
+            events: A list with the 'pose' event of the pose still held, if any.
+        '''
+
+        events = []
+        if self._pose >= 0:
+            events.append({'event': 'pose', 'pose': self.model.labels[self._pose], 'start': self._start,
+                           'end': self._last, 'seconds': self._last - self._start})
+        self._pose = -1
+        return events
+
+
+class FlowRecognizer:
+    '''
+    Recognizes the holds, transitions and flows of the label streams of several users at once.
+    Args:
+        users: The number of users.
+        lookback: The number of frames an event is delayed by, the longest trace back of a frame.
+        model: The FlowModel, buildFlowModel() by default.
+        flows: A dictionary mapping the name of every flow to its sequence of poses.
+    '''
+
+    def __init__(self, users=1, lookback=15, model=None, flows=FLOWS):
+        self.model = model or buildFlowModel()
+        self.decoder = FlowDecoder(self.model, users, lookback)
+        self.trackers = [FlowTracker(self.model, flows) for _ in range(users)]
+        self._label_index = {label: number for number, label in enumerate(self.model.labels)}
+        self._timestamps = deque(maxlen=self.decoder.lookback)
+
+    def update(self, labels, timestamp):
+        '''
+        This function adds a frame of every user.
+        Args:
+            labels: A list of the labels of classifyPose of every user, labels it does not know count as
+                    'Unknown Pose', or an array of shape (users, labels) of label probabilities.
+            timestamp: The time of the frame in seconds.
+        Returns:
+            events: A list of (user, event) tuples of the events of the frame committed on this call.
+        '''
+
+        if not isinstance(labels, np.ndarray):
+            labels = np.array([self._label_index.get(label, 0) for label in labels])
+        self._timestamps.append(timestamp)
+        states = self.decoder.step(labels)
+        if states is None:
+            return []
+        committed_at = self._timestamps[0]
+        return [(user, event) for user, tracker in enumerate(self.trackers)
+                for event in tracker.update(states[user], committed_at)]
+
+    def finish(self):
+        '''
+        This function commits the frames still pending at the end of the streams.
+        Returns:
+            events: A list of (user, event) tuples.
+        '''
+
+        states = self.decoder.flush()
+        timestamps = list(self._timestamps)[-states.shape[1]:] if states.shape[1] else []
+        events = []
+        for user, tracker in enumerate(self.trackers):
+            for state, timestamp in zip(states[user], timestamps):
+                events.extend((user, event) for event in tracker.update(state, timestamp))
+            events.extend((user, event) for event in tracker.finish())
+        return events
+
+
+def formatEvent(event):
+    '''
+    This function writes an event of a FlowTracker as one line of text.
+    Args:
+        event: The event dictionary.
+    Returns:
+        text: The line of text.
+    '''
+
+    if event['event'] == 'pose':
+        return f'{event["start"]:8.2f}s  held {event["pose"]} for {event["seconds"]:.2f}s'
+    if event['event'] == 'transition':
+        return f'{event["start"]:8.2f}s  {event["from"]} -> {event["to"]} in {event["seconds"]:.2f}s'
+    return f'{event["start"]:8.2f}s  {event["flow"]} completed in {event["end"] - event["start"]:.2f}s'
+
+
+if __name__ == '__main__':
+
+    from VideoProcessing import processVideo
+
+    parser = argparse.ArgumentParser(description='Recognize the pose holds, transitions and flows of a video.')
+    parser.add_argument('source', help='a recorded video, or the .npz saved by VideoProcessing.py --output')
+    parser.add_argument('--lookback', type=int, default=15, help='number of frames a state is committed after')
+    args = parser.parse_args()
+
+    if args.source.endswith('.npz'):
+        with np.load(args.source) as data:
+            labels, fps = data['labels'], float(data['fps'])
+    else:
+        result = processVideo(args.source)
+        labels, fps = result['labels'], result['fps']
+
+    recognizer = FlowRecognizer(lookback=args.lookback)
+    events = []
+    for frame_index, label in enumerate(labels):
+        events.extend(recognizer.update([label], frame_index / fps))
+    events.extend(recognizer.finish())
+
+    for _, event in events:
+        print(formatEvent(event))
+    print(f'{len(labels)} frames, {sum(event["event"] == "flow" for _, event in events)} flows')
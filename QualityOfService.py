@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Quality of Service for the Live Loops
+#
+# The live classification loop runs at whatever speed pose.process allows, so on a slow or busy machine the
+# feedback falls further and further behind. The QoSController watches the processing time of every frame
+# against a frame budget (1 / target FPS) and moves along a ladder of settings, from the best to the cheapest:
+#
+# * a lower input height than the 640 pixels of the live loops,
+# * the lighter model (model_complexity=0),
+# * frame skipping: the detection only runs on every n-th frame and the frames in between reuse its landmarks.
+#
+# It steps down as soon as the smoothed cost of a frame is over budget for a few frames, and steps back up only
+# after a longer stretch with plenty of headroom, so it does not flap between two levels. Every decision is
+# logged with the measured cost.
+
+import logging
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# One setting of the live loop: the frame height, the model_complexity and detecting every skip-th frame.
+QoSLevel = namedtuple('QoSLevel', ['height', 'model_complexity', 'skip'])
+
+# From the setting of the live loops down to the cheapest one.
+QOS_LEVELS = (
+    QoSLevel(640, 1, 1),
+    QoSLevel(480, 1, 1),
+    QoSLevel(360, 1, 1),
+    QoSLevel(360, 0, 1),
+    QoSLevel(360, 0, 2),
+    QoSLevel(270, 0, 2),
+    QoSLevel(270, 0, 3),
+)
+
+
+class QoSController:
+    '''
+    Chooses the QoSLevel of every frame from the measured processing times.
+    Args:
+        target_fps: The frame rate to keep, the frame budget is 1 / target_fps.
+        levels: The ladder of settings, from the best to the cheapest.
+        smoothing: The weight of the newest frame in the moving average of the frame cost.
+        down_frames: The number of frames over budget after which the controller steps down.
+        up_frames: The number of frames with headroom after which the controller steps up.
+        headroom: The share of the budget the estimated cost of the next better level must stay under.
+    '''
+
+    def __init__(self, target_fps=15, levels=QOS_LEVELS, smoothing=0.2, down_frames=5, up_frames=60,
+                 headroom=0.7):
+        self.budget = 1.0 / target_fps
+        self.levels = levels
+        self.smoothing = smoothing
+        self.down_frames = down_frames
+        self.up_frames = up_frames
+        self.headroom = headroom
+        self.index = 0
+        self.cost = None
+        self._over = 0
+        self._under = 0
+        self._skipped = -1
+        self._frames = 0
+        self._stepped_down = False
+        # The last smoothed detection time measured at every level, and how much slower every level measured to
+        # be than the next cheaper one, to predict the cost of stepping up.
+        self._level_latency = {}
+        self._slowdown = {}
+
+    @property
+    def level(self):
+        return self.levels[self.index]
+
+    def shouldDetect(self):
+        '''
+        This function tells whether the detection runs on the next frame or the frame reuses the last landmarks.
+        Returns:
+            detect: A boolean value that is true if the detection should run on the frame.
+        '''
+
+        # The first frame after a change of level always runs the detection, since the last landmarks were found
+        # at another frame height.
+        self._skipped = (self._skipped + 1) % self.level.skip
+        return self._skipped == 0
+
+    def update(self, latency):
+        '''
+        This function records the processing time of a frame the detection ran on and adapts the level.
+        Args:
+            latency: The processing time of the frame in seconds.
+        Returns:
+            changed: A boolean value that is true if the level changed and the next frame uses a new setting.
+        '''
+
+        # The cost of a displayed frame is the detection time spread over the frames that reuse it.
+        latency_average = latency if self.cost is None else \
+            self.smoothing * latency + (1 - self.smoothing) * self.cost * self.level.skip
+        self._level_latency[self.index] = latency_average
+        self.cost = latency_average / self.level.skip
+        self._frames += 1
+
+        # Once the average settled after stepping down, compare it with the level above. The ratio stays valid
+        # when the load of the machine changes, unlike the latency measured there.
+        if self._stepped_down and self._frames == self.down_frames:
+            self._slowdown[self.index - 1] = self._level_latency[self.index - 1] / latency_average
+
+        if self.cost > self.budget:
+            self._over, self._under = self._over + 1, 0
+            if self._over >= self.down_frames and self.index < len(self.levels) - 1:
+                return self._move(+1, 'over budget')
+        else:
+            self._over = 0
+            self._under = self._under + 1 if self._canStepUp() else 0
+            if self._under >= self.up_frames:
+                return self._move(-1, 'headroom')
+        return False
+
+    def exclude(self, model_complexity, reason):
+        '''
+        This function stops using a model, for example when it cannot be downloaded. Its levels use the model of
+        the closest better level instead, so their lower height and frame skipping are kept.
+        Args:
+            model_complexity: The model_complexity to stop using.
+            reason: The reason logged with the decision.
+        '''
+
+        previous = self.level
+        others = [level.model_complexity for level in self.levels[self.index::-1] + self.levels[self.index:]
+                  if level.model_complexity != model_complexity]
+        if not others:
+            raise ValueError(f'Every QoS level uses model_complexity={model_complexity}')
+
+        # Replace the model and drop the levels that became duplicates.
+        levels = []
+        for level in self.levels:
+            if level.model_complexity == model_complexity:
+                level = level._replace(model_complexity=others[0])
+            if level not in levels:
+                levels.append(level)
+        current = previous._replace(model_complexity=others[0]) \
+            if previous.model_complexity == model_complexity else previous
+        self.levels = tuple(levels)
+        self.index = self.levels.index(current)
+        self._level_latency, self._slowdown = {}, {}
+        self.cost, self._over, self._under, self._skipped, self._frames = None, 0, 0, -1, 0
+        self._stepped_down = False
+        logger.warning('QoS model %d excluded (%s): %s -> %s', model_complexity, reason, _describe(previous),
+                       _describe(self.level))
+
+    def _canStepUp(self):
+        if self.index == 0:
+            return False
+        # Predict the detection time of the better level from the measured slowdown, or from the pixel count when
+        # the better level was never measured.
+        better = self.levels[self.index - 1]
+        slowdown = self._slowdown.get(self.index - 1, (better.height / self.level.height) ** 2)
+        return self._level_latency[self.index] * slowdown / better.skip < self.headroom * self.budget
+
+    def _move(self, step, reason):
+        previous = self.level
+        self.index += step
+        self.cost, self._over, self._under, self._skipped, self._frames = None, 0, 0, -1, 0
+        self._stepped_down = step > 0
+        logger.info('QoS %s: %.1f ms per frame for a budget of %.1f ms, %s -> %s', reason,
+                    self._level_latency[self.index - step] / previous.skip * 1000, self.budget * 1000,
+                    _describe(previous), _describe(self.level))
+        return True
+
+
+def _describe(level):
+    return f'{level.height}px/model {level.model_complexity}/every {level.skip} frame(s)'
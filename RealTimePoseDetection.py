@@ -25,12 +25,24 @@
 # In[1]:
 
 
+import argparse
+import logging
 import math
+import os
 import cv2
 import numpy as np
 from time import time
-import mediapipe as mp
-import matplotlib.pyplot as plt
+
+from FrameRing import CapturedFrames
+from OverlayRenderer import SkeletonRenderer
+from PoseLandmarks import (LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_ELBOW, RIGHT_ELBOW, LEFT_WRIST, RIGHT_WRIST,
+                           LEFT_HIP, RIGHT_HIP, LEFT_KNEE, RIGHT_KNEE, LEFT_ANKLE, RIGHT_ANKLE)
+
+logger = logging.getLogger(__name__)
+
+# mediapipe and matplotlib take most of the startup time, so they are only imported when they are first needed,
+# that is when a model is set up or when a result is displayed. Importing this module stays fast and runs nothing,
+# the demos below are started from the command line (see main at the end of the file).
 
 
 # ## **<font style="color:rgb(134,19,348)">Initialize the Pose Detection Model</font>**
@@ -55,14 +67,82 @@ import matplotlib.pyplot as plt
 # In[2]:
 
 
-# Initializing mediapipe pose class.
-mp_pose = mp.solutions.pose
+# The Pose setup used for images and for videos.
+IMAGE_POSE_OPTIONS = dict(static_image_mode=True, min_detection_confidence=0.3, model_complexity=2)
+VIDEO_POSE_OPTIONS = dict(static_image_mode=False, min_detection_confidence=0.5, model_complexity=1)
+
+# The skeleton drawn by detectPose, in the colors of mp_drawing.draw_landmarks.
+_SKELETON = SkeletonRenderer(connection_color=(224, 224, 224), landmark_color=(0, 0, 255))
+
+
+def loadMediapipe():
+    '''
+    This function imports mediapipe. Only the first call pays for the import.
+    Returns:
+        mp_pose: The mediapipe pose class.
+        mp_drawing: The mediapipe drawing class, useful for annotation.
+    '''
 
-# Setting up the Pose function.
-pose = mp_pose.Pose(static_image_mode=True, min_detection_confidence=0.3, model_complexity=2)
+    import mediapipe as mp
+    return mp.solutions.pose, mp.solutions.drawing_utils
 
-# Initializing mediapipe drawing class, useful for annotation.
-mp_drawing = mp.solutions.drawing_utils 
+
+# The model_complexity of the model that ships with mediapipe, the lite and heavy models are downloaded on first use.
+BUNDLED_MODEL_COMPLEXITY = 1
+
+
+def createPose(options):
+    '''
+    This function sets up a Pose function, with the bundled model when the model of the options cannot be
+    downloaded.
+    Args:
+        options: The keyword arguments of mp_pose.Pose, such as IMAGE_POSE_OPTIONS.
+    Returns:
+        pose: The pose setup function.
+    '''
+
+    mp_pose, _ = loadMediapipe()
+    try:
+        return mp_pose.Pose(**options)
+    except Exception as e:
+        # mediapipe downloads the lite and heavy models on first use, which fails without network access.
+        model_complexity = options.get('model_complexity', BUNDLED_MODEL_COMPLEXITY)
+        if model_complexity == BUNDLED_MODEL_COMPLEXITY:
+            raise
+        logger.warning('Pose model %d unavailable (%s), using model %d', model_complexity, e,
+                       BUNDLED_MODEL_COMPLEXITY)
+        return mp_pose.Pose(**dict(options, model_complexity=BUNDLED_MODEL_COMPLEXITY))
+
+
+# The Pose function for images, set up on first use.
+_image_pose = None
+
+
+def getImagePose():
+    '''
+    This function returns the Pose function for images, setting it up on first use.
+    Returns:
+        pose: The pose setup function with IMAGE_POSE_OPTIONS.
+    '''
+
+    global _image_pose
+
+    # Setting up the Pose function.
+    if _image_pose is None:
+        _image_pose = createPose(IMAGE_POSE_OPTIONS)
+
+    return _image_pose
+
+
+def __getattr__(name):
+    # Keep pose, mp_pose and mp_drawing available as module attributes, created only when first accessed.
+    if name == 'pose':
+        return getImagePose()
+    if name == 'mp_pose':
+        return loadMediapipe()[0]
+    if name == 'mp_drawing':
+        return loadMediapipe()[1]
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 
 # ### **<font style="color:rgb(134,19,348)">Read an Image</font>**
@@ -72,14 +152,27 @@ mp_drawing = mp.solutions.drawing_utils
 # In[3]:
 
 
-# Read an image from the specified path.
-sample_img = cv2.imread('media/sample.jpg')
+def readSampleImage(image_path='media/sample.jpg'):
+    '''
+    This function reads a sample image and displays it.
+    Args:
+        image_path: The path of the sample image.
+    Returns:
+        sample_img: The sample image.
+    '''
+
+    import matplotlib.pyplot as plt
+
+    # Read an image from the specified path.
+    sample_img = cv2.imread(image_path)
+
+    # Specify a size of the figure.
+    plt.figure(figsize = [10, 10])
 
-# Specify a size of the figure.
-plt.figure(figsize = [10, 10])
+    # Display the sample image, also convert BGR to RGB for display.
+    plt.title("Sample Image");plt.axis('off');plt.imshow(sample_img[:,:,::-1]);plt.show()
 
-# Display the sample image, also convert BGR to RGB for display. 
-plt.title("Sample Image");plt.axis('off');plt.imshow(sample_img[:,:,::-1]);plt.show()
+    return sample_img
 
 
 # ## **<font style="color:rgb(134,19,348)">Perform Pose Detection</font>**
@@ -103,17 +196,31 @@ plt.title("Sample Image");plt.axis('off');plt.imshow(sample_img[:,:,::-1]);plt.s
 # In[4]:
 
 
-# Perform pose detection after converting the image into RGB format.
-results = pose.process(cv2.cvtColor(sample_img, cv2.COLOR_BGR2RGB))
+def printFirstLandmarks(sample_img):
+    '''
+    This function performs pose detection on the sample image and displays the first two normalized landmarks.
+    Args:
+        sample_img: The sample image.
+    Returns:
+        results: The pose detection results.
+    '''
 
-# Check if any landmarks are found.
-if results.pose_landmarks:
-    
-    # Iterate two times as we only want to display first two landmarks.
-    for i in range(2):
-        
-        # Display the found normalized landmarks.
-        print(f'{mp_pose.PoseLandmark(i).name}:\n{results.pose_landmarks.landmark[mp_pose.PoseLandmark(i).value]}') 
+    mp_pose, _ = loadMediapipe()
+    pose = getImagePose()
+
+    # Perform pose detection after converting the image into RGB format.
+    results = pose.process(cv2.cvtColor(sample_img, cv2.COLOR_BGR2RGB))
+
+    # Check if any landmarks are found.
+    if results.pose_landmarks:
+
+        # Iterate two times as we only want to display first two landmarks.
+        for i in range(2):
+
+            # Display the found normalized landmarks.
+            print(f'{mp_pose.PoseLandmark(i).name}:\n{results.pose_landmarks.landmark[mp_pose.PoseLandmark(i).value]}')
+
+    return results
 
 
 # Now we will convert the two normalized landmarks displayed above into their original scale by using the width and height of the  image.
@@ -121,21 +228,31 @@ if results.pose_landmarks:
 # In[5]:
 
 
-# Retrieve the height and width of the sample image.
-image_height, image_width, _ = sample_img.shape
+def printScaledLandmarks(sample_img, results):
+    '''
+    This function displays the first two landmarks of the sample image in their original scale.
+    Args:
+        sample_img: The sample image.
+        results: The pose detection results of the sample image.
+    '''
+
+    mp_pose, _ = loadMediapipe()
+
+    # Retrieve the height and width of the sample image.
+    image_height, image_width, _ = sample_img.shape
 
-# Check if any landmarks are found.
-if results.pose_landmarks:
-    
-    # Iterate two times as we only want to display first two landmark.
-    for i in range(2):
-        
-        # Display the found landmarks after converting them into their original scale.
-        print(f'{mp_pose.PoseLandmark(i).name}:') 
-        print(f'x: {results.pose_landmarks.landmark[mp_pose.PoseLandmark(i).value].x * image_width}')
-        print(f'y: {results.pose_landmarks.landmark[mp_pose.PoseLandmark(i).value].y * image_height}')
-        print(f'z: {results.pose_landmarks.landmark[mp_pose.PoseLandmark(i).value].z * image_width}')
-        print(f'visibility: {results.pose_landmarks.landmark[mp_pose.PoseLandmark(i).value].visibility}\n')
+    # Check if any landmarks are found.
+    if results.pose_landmarks:
+
+        # Iterate two times as we only want to display first two landmark.
+        for i in range(2):
+
+            # Display the found landmarks after converting them into their original scale.
+            print(f'{mp_pose.PoseLandmark(i).name}:')
+            print(f'x: {results.pose_landmarks.landmark[mp_pose.PoseLandmark(i).value].x * image_width}')
+            print(f'y: {results.pose_landmarks.landmark[mp_pose.PoseLandmark(i).value].y * image_height}')
+            print(f'z: {results.pose_landmarks.landmark[mp_pose.PoseLandmark(i).value].z * image_width}')
+            print(f'visibility: {results.pose_landmarks.landmark[mp_pose.PoseLandmark(i).value].visibility}\n')
 
 
 # Now we will draw the detected landmarks on the sample image using the function **`mp.solutions.drawing_utils.draw_landmarks()`** and display the resultant image using the [**`matplotlib`**](https://matplotlib.org/stable/index.html) library. 
@@ -143,20 +260,31 @@ if results.pose_landmarks:
 # In[6]:
 
 
-# Create a copy of the sample image to draw landmarks on.
-img_copy = sample_img.copy()
+def drawSampleLandmarks(sample_img, results):
+    '''
+    This function draws the detected landmarks on the sample image and displays it.
+    Args:
+        sample_img: The sample image.
+        results: The pose detection results of the sample image.
+    '''
 
-# Check if any landmarks are found.
-if results.pose_landmarks:
-    
-    # Draw Pose landmarks on the sample image.
-    mp_drawing.draw_landmarks(image=img_copy, landmark_list=results.pose_landmarks, connections=mp_pose.POSE_CONNECTIONS)
-       
-    # Specify a size of the figure.
-    fig = plt.figure(figsize = [10, 10])
+    import matplotlib.pyplot as plt
+    mp_pose, mp_drawing = loadMediapipe()
+
+    # Create a copy of the sample image to draw landmarks on.
+    img_copy = sample_img.copy()
+
+    # Check if any landmarks are found.
+    if results.pose_landmarks:
+
+        # Draw Pose landmarks on the sample image.
+        mp_drawing.draw_landmarks(image=img_copy, landmark_list=results.pose_landmarks, connections=mp_pose.POSE_CONNECTIONS)
 
-    # Display the output image with the landmarks drawn, also convert BGR to RGB for display. 
-    plt.title("Output");plt.axis('off');plt.imshow(img_copy[:,:,::-1]);plt.show()
+        # Specify a size of the figure.
+        fig = plt.figure(figsize = [10, 10])
+
+        # Display the output image with the landmarks drawn, also convert BGR to RGB for display.
+        plt.title("Output");plt.axis('off');plt.imshow(img_copy[:,:,::-1]);plt.show()
 
 
 # Now we will go a step further and visualize the landmarks in three-dimensions (3D) using the function **`mp.solutions.drawing_utils.plot_landmarks()`**. We will need the POSE_WORLD_LANDMARKS that is another list of pose landmarks in world coordinates that has the 3D coordinates in meters with the origin at the center between the hips of the person. 
@@ -166,8 +294,17 @@ if results.pose_landmarks:
 # In[7]:
 
 
-# Plot Pose landmarks in 3D.
-mp_drawing.plot_landmarks(results.pose_world_landmarks, mp_pose.POSE_CONNECTIONS)
+def plotSampleLandmarks3D(results):
+    '''
+    This function plots the world landmarks of the sample image in 3D.
+    Args:
+        results: The pose detection results of the sample image.
+    '''
+
+    mp_pose, mp_drawing = loadMediapipe()
+
+    # Plot Pose landmarks in 3D.
+    mp_drawing.plot_landmarks(results.pose_world_landmarks, mp_pose.POSE_CONNECTIONS)
 
 
 # **Note:** This is actually a neat hack by mediapipe, the coordinates returned are not actually in **3D** but by setting hip landmark as the origin allows us to measure relative distance of the other points from the hip, and since this distance increases or decreases depending upon if you're close or further from the camera it gives us a sense of depth of each landmark point. 
@@ -179,7 +316,7 @@ mp_drawing.plot_landmarks(results.pose_world_landmarks, mp_pose.POSE_CONNECTIONS
 # In[8]:
 
 
-def detectPose(image, pose, display=True):
+def detectPose(image, pose, display=True, draw=True, return_skeleton=False):
     '''
     This function performs pose detection on an image.
     Args:
@@ -187,13 +324,19 @@ def detectPose(image, pose, display=True):
         pose: The pose setup function required to perform the pose detection.
         display: A boolean value that is if set to true the function displays the original input image, the resultant image, 
                  and the pose landmarks in 3D plot and returns nothing.
+        draw: A boolean value that is if set to false the landmarks are not drawn and the input image itself is
+              returned, for headless loops.
+        return_skeleton: A boolean value that is if set to true the skeleton is returned too, to draw it again on
+                         other frames.
     Returns:
         output_image: The input image with the detected pose landmarks drawn.
         landmarks: A list of detected landmarks converted into their original scale.
+        skeleton: An array of shape (33, 4) of the x, y, z and visibility of the landmarks, with x and y in pixels,
+                  or None if no landmarks were detected. Only returned if return_skeleton is true.
     '''
     
-    # Create a copy of the input image.
-    output_image = image.copy()
+    # Create a copy of the input image to draw on.
+    output_image = image.copy() if draw or display else image
     
     # Convert the image from BGR into RGB format.
     imageRGB = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
@@ -206,23 +349,33 @@ def detectPose(image, pose, display=True):
     
     # Initialize a list to store the detected landmarks.
     landmarks = []
+    skeleton = None
     
     # Check if any landmarks are detected.
     if results.pose_landmarks:
-    
-        # Draw Pose landmarks on the output image.
-        mp_drawing.draw_landmarks(image=output_image, landmark_list=results.pose_landmarks,
-                                  connections=mp_pose.POSE_CONNECTIONS)
-        
+
         # Iterate over the detected landmarks.
         for landmark in results.pose_landmarks.landmark:
             
             # Append the landmark into the list.
             landmarks.append((int(landmark.x * width), int(landmark.y * height),
                                   (landmark.z * width)))
+
+        # Keep the visibility next to the landmarks, so the landmarks that are not visible are not drawn like
+        # mp_drawing does.
+        skeleton = np.hstack([np.array(landmarks, dtype=np.float32),
+                              [(landmark.visibility,) for landmark in results.pose_landmarks.landmark]])
+
+        # Draw Pose landmarks on the output image.
+        if draw or display:
+            _SKELETON.draw(output_image, skeleton)
     
     # Check if the original input image and the resultant image are specified to be displayed.
     if display:
+
+        # Load matplotlib and mediapipe only when something has to be displayed.
+        import matplotlib.pyplot as plt
+        mp_pose, mp_drawing = loadMediapipe()
     
         # Display the original input image and the resultant image.
         plt.figure(figsize=[22,22])
@@ -236,6 +389,8 @@ def detectPose(image, pose, display=True):
     else:
         
         # Return the output image and the found landmarks.
+        if return_skeleton:
+            return output_image, landmarks, skeleton
         return output_image, landmarks
 
 
@@ -244,25 +399,26 @@ def detectPose(image, pose, display=True):
 # In[9]:
 
 
-# Read another sample image and perform pose detection on it.
-image = cv2.imread('media/sample1.jpg')
-detectPose(image, pose, display=True)
-
-
-# In[10]:
-
-
-# Read another sample image and perform pose detection on it.
-image = cv2.imread('media/sample2.jpg')
-detectPose(image, pose, display=True)
+def runImageDemo():
+    '''
+    This function walks through the pose detection on the sample images and displays the results.
+    '''
 
+    import matplotlib.pyplot as plt
 
-# In[11]:
+    # Read the sample image, detect its landmarks and display them.
+    sample_img = readSampleImage()
+    results = printFirstLandmarks(sample_img)
+    printScaledLandmarks(sample_img, results)
+    drawSampleLandmarks(sample_img, results)
+    plotSampleLandmarks3D(results)
 
+    # Read the other sample images and perform pose detection on them.
+    for image_path in ['media/sample1.jpg', 'media/sample2.jpg', 'media/sample3.jpg']:
+        image = cv2.imread(image_path)
+        detectPose(image, getImagePose(), display=True)
 
-# Read another sample image and perform pose detection on it.
-image = cv2.imread('media/sample3.jpg')
-detectPose(image, pose, display=True)
+    plt.show()
 
 
 # ### **<font style="color:rgb(134,19,348)">Pose Detection On Real-Time Webcam Feed/Video</font>**
@@ -272,84 +428,88 @@ detectPose(image, pose, display=True)
 # In[12]:
 
 
-# Setup Pose function for video.
-pose_video = mp_pose.Pose(static_image_mode=False, min_detection_confidence=0.5, model_complexity=1)
+def runPoseDetection(source=1):
+    '''
+    This function performs pose detection on a real-time webcam feed or a video and displays the results.
+    Args:
+        source: The index of the webcam, or the path of a video stored in the disk such as 'media/exercising.mp4'.
+    '''
 
-# Initialize the VideoCapture object to read from the webcam.
-video = cv2.VideoCapture(1)
+    # Setup Pose function for video.
+    mp_pose, _ = loadMediapipe()
+    pose_video = mp_pose.Pose(**VIDEO_POSE_OPTIONS)
 
-# Create named window for resizing purposes
-cv2.namedWindow('Pose Detection', cv2.WINDOW_NORMAL)
+    # Initialize the VideoCapture object to read from the webcam, or from a video stored in the disk.
+    video = cv2.VideoCapture(source)
 
+    # Create named window for resizing purposes
+    cv2.namedWindow('Pose Detection', cv2.WINDOW_NORMAL)
 
-# Initialize the VideoCapture object to read from a video stored in the disk.
-#video = cv2.VideoCapture('media/running.mp4')
+    # Set video camera size
+    video.set(3,1280)
+    video.set(4,960)
 
-# Set video camera size
-video.set(3,1280)
-video.set(4,960)
+    # Initialize a variable to store the time of the previous frame.
+    time1 = 0
 
-# Initialize a variable to store the time of the previous frame.
-time1 = 0
+    # Iterate until the video is accessed successfully.
+    while video.isOpened():
 
-# Iterate until the video is accessed successfully.
-while video.isOpened():
-    
-    # Read a frame.
-    ok, frame = video.read()
-    
-    # Check if frame is not read properly.
-    if not ok:
-        
-        # Break the loop.
-        break
-    
-    # Flip the frame horizontally for natural (selfie-view) visualization.
-    frame = cv2.flip(frame, 1)
-    
-    # Get the width and height of the frame
-    frame_height, frame_width, _ =  frame.shape
-    
-    # Resize the frame while keeping the aspect ratio.
-    frame = cv2.resize(frame, (int(frame_width * (640 / frame_height)), 640))
-    
-    # Perform Pose landmark detection.
-    frame, _ = detectPose(frame, pose_video, display=False)
-    
-    # Set the time for this frame to the current time.
-    time2 = time()
-    
-    # Check if the difference between the previous and this frame time > 0 to avoid division by zero.
-    if (time2 - time1) > 0:
-    
-        # Calculate the number of frames per second.
-        frames_per_second = 1.0 / (time2 - time1)
-        
-        # Write the calculated number of frames per second on the frame. 
-        cv2.putText(frame, 'FPS: {}'.format(int(frames_per_second)), (10, 30),cv2.FONT_HERSHEY_PLAIN, 2, (0, 255, 0), 3)
-    
-    # Update the previous frame time to this frame time.
-    # As this frame will become previous frame in next iteration.
-    time1 = time2
-    
-    # Display the frame.
-    cv2.imshow('Pose Detection', frame)
-    
-    # Wait until a key is pressed.
-    # Retreive the ASCII code of the key pressed
-    k = cv2.waitKey(1) & 0xFF
-    
-    # Check if 'ESC' is pressed.
-    if(k == 27):
-        
-        # Break the loop.
-        break
+        # Read a frame.
+        ok, frame = video.read()
+
+        # Check if frame is not read properly.
+        if not ok:
+
+            # Break the loop.
+            break
+
+        # Flip the frame horizontally for natural (selfie-view) visualization.
+        frame = cv2.flip(frame, 1)
+
+        # Get the width and height of the frame
+        frame_height, frame_width, _ =  frame.shape
+
+        # Resize the frame while keeping the aspect ratio.
+        frame = cv2.resize(frame, (int(frame_width * (640 / frame_height)), 640))
+
+        # Perform Pose landmark detection.
+        frame, _ = detectPose(frame, pose_video, display=False)
 
-# Release the VideoCapture object.
-video.release()
+        # Set the time for this frame to the current time.
+        time2 = time()
 
-# Close the windows.
-cv2.destroyAllWindows()
+        # Check if the difference between the previous and this frame time > 0 to avoid division by zero.
+        if (time2 - time1) > 0:
+
+            # Calculate the number of frames per second.
+            frames_per_second = 1.0 / (time2 - time1)
+
+            # Write the calculated number of frames per second on the frame.
+            cv2.putText(frame, 'FPS: {}'.format(int(frames_per_second)), (10, 30),cv2.FONT_HERSHEY_PLAIN, 2, (0, 255, 0), 3)
+
+        # Update the previous frame time to this frame time.
+        # As this frame will become previous frame in next iteration.
+        time1 = time2
+
+        # Display the frame.
+        cv2.imshow('Pose Detection', frame)
+
+        # Wait until a key is pressed.
+        # Retreive the ASCII code of the key pressed
+        k = cv2.waitKey(1) & 0xFF
+
+        # Check if 'ESC' is pressed.
+        if(k == 27):
+
+            # Break the loop.
+            break
+
+    # Release the VideoCapture object.
+    video.release()
+
+    # Close the windows.
+    cv2.destroyAllWindows()
 
 
 # Cool! so it works great on the videos too. The model is pretty fast and accurate.
@@ -408,11 +568,16 @@ def calculateAngle(landmark1, landmark2, landmark3):
 # In[14]:
 
 
-# Calculate the angle between the three landmarks.
-angle = calculateAngle((558, 326, 0), (642, 333, 0), (718, 321, 0))
+def showDummyAngle():
+    '''
+    This function calculates and displays the angle between three dummy landmarks.
+    '''
+
+    # Calculate the angle between the three landmarks.
+    angle = calculateAngle((558, 326, 0), (642, 333, 0), (718, 321, 0))
 
-# Display the calculated angle.
-print(f'The calculated angle is {angle}')
+    # Display the calculated angle.
+    print(f'The calculated angle is {angle}')
 
 
 # ### **<font style="color:rgb(134,19,348)">Create a Function to Perform Pose Classification</font>**
@@ -431,7 +596,7 @@ def classifyPose(landmarks, output_image, display=False):
     This function classifies yoga poses depending upon the angles of various body joints.
     Args:
         landmarks: A list of detected landmarks of the person whose pose needs to be classified.
-        output_image: A image of the person with the detected pose landmarks drawn.
+        output_image: A image of the person with the detected pose landmarks drawn, or None to only classify the pose.
         display: A boolean value that is if set to true the function displays the resultant image with the pose label 
         written on it and returns nothing.
     Returns:
@@ -450,35 +615,35 @@ def classifyPose(landmarks, output_image, display=False):
     #----------------------------------------------------------------------------------------------------------------
     
     # Get the angle between the left shoulder, elbow and wrist points. 
-    left_elbow_angle = calculateAngle(landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value],
-                                      landmarks[mp_pose.PoseLandmark.LEFT_ELBOW.value],
-                                      landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value])
+    left_elbow_angle = calculateAngle(landmarks[LEFT_SHOULDER],
+                                      landmarks[LEFT_ELBOW],
+                                      landmarks[LEFT_WRIST])
     
     # Get the angle between the right shoulder, elbow and wrist points. 
-    right_elbow_angle = calculateAngle(landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER.value],
-                                       landmarks[mp_pose.PoseLandmark.RIGHT_ELBOW.value],
-                                       landmarks[mp_pose.PoseLandmark.RIGHT_WRIST.value])   
+    right_elbow_angle = calculateAngle(landmarks[RIGHT_SHOULDER],
+                                       landmarks[RIGHT_ELBOW],
+                                       landmarks[RIGHT_WRIST])   
     
     # Get the angle between the left elbow, shoulder and hip points. 
-    left_shoulder_angle = calculateAngle(landmarks[mp_pose.PoseLandmark.LEFT_ELBOW.value],
-                                         landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value],
-                                         landmarks[mp_pose.PoseLandmark.LEFT_HIP.value])
+    left_shoulder_angle = calculateAngle(landmarks[LEFT_ELBOW],
+                                         landmarks[LEFT_SHOULDER],
+                                         landmarks[LEFT_HIP])
 
     # Get the angle between the right hip, shoulder and elbow points. 
-    right_shoulder_angle = calculateAngle(landmarks[mp_pose.PoseLandmark.RIGHT_HIP.value],
-                                          landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER.value],
-                                          landmarks[mp_pose.PoseLandmark.RIGHT_ELBOW.value])
+    right_shoulder_angle = calculateAngle(landmarks[RIGHT_HIP],
+                                          landmarks[RIGHT_SHOULDER],
+                                          landmarks[RIGHT_ELBOW])
     
 
     # Get the angle between the left hip, knee and ankle points. 
-    left_knee_angle = calculateAngle(landmarks[mp_pose.PoseLandmark.LEFT_HIP.value],
-                                     landmarks[mp_pose.PoseLandmark.LEFT_KNEE.value],
-                                     landmarks[mp_pose.PoseLandmark.LEFT_ANKLE.value])
+    left_knee_angle = calculateAngle(landmarks[LEFT_HIP],
+                                     landmarks[LEFT_KNEE],
+                                     landmarks[LEFT_ANKLE])
 
     # Get the angle between the right hip, knee and ankle points 
-    right_knee_angle = calculateAngle(landmarks[mp_pose.PoseLandmark.RIGHT_HIP.value],
-                                      landmarks[mp_pose.PoseLandmark.RIGHT_KNEE.value],
-                                      landmarks[mp_pose.PoseLandmark.RIGHT_ANKLE.value])
+    right_knee_angle = calculateAngle(landmarks[RIGHT_HIP],
+                                      landmarks[RIGHT_KNEE],
+                                      landmarks[RIGHT_ANKLE])
     
     #----------------------------------------------------------------------------------------------------------------
     
@@ -538,10 +703,14 @@ def classifyPose(landmarks, output_image, display=False):
         color = (0, 255, 0)  
     
     # Write the label on the output image. 
-    cv2.putText(output_image, label, (10, 30),cv2.FONT_HERSHEY_PLAIN, 2, color, 2)
+    if output_image is not None:
+        cv2.putText(output_image, label, (10, 30),cv2.FONT_HERSHEY_PLAIN, 2, color, 2)
     
     # Check if the resultant image is specified to be displayed.
     if display:
+
+        # Load matplotlib only when something has to be displayed.
+        import matplotlib.pyplot as plt
     
         # Display the resultant image.
         plt.figure(figsize=[10,10])
@@ -568,22 +737,24 @@ def classifyPose(landmarks, output_image, display=False):
 # In[16]:
 
 
-# Read a sample image and perform pose classification on it.
-image = cv2.imread('media/warriorIIpose.jpg')
-output_image, landmarks = detectPose(image, pose, display=False)
-if landmarks:
-    classifyPose(landmarks, output_image, display=True)
-        
-
-
-# In[17]:
-
+def classifyImage(image_path, pose=None, landmarks=None):
+    '''
+    This function performs pose detection and classification on an image and displays the result.
+    Args:
+        image_path: The path of the image.
+        pose: The pose setup function required to perform the pose detection, the image Pose function by default.
+        landmarks: An array of shape (33, 4) of the landmarks of the image in pixel coordinates with their
+                   visibility, such as stored by PoseLibrary, to classify them without running the detection.
+    '''
 
-# Read another sample image and perform pose classification on it.
-image = cv2.imread('media/warriorIIpose1.jpg')
-output_image, landmarks = detectPose(image, pose, display=False)
-if landmarks:
-    classifyPose(landmarks, output_image, display=True)
+    # Read a sample image and perform pose classification on it.
+    image = cv2.imread(image_path)
+    if landmarks is None:
+        output_image, landmarks = detectPose(image, pose or getImagePose(), display=False)
+    else:
+        output_image, landmarks = _SKELETON.draw(image, landmarks), [tuple(landmark[:3]) for landmark in landmarks]
+    if landmarks:
+        classifyPose(landmarks, output_image, display=True)
 
 
 # ## **<font style="color:rgb(134,19,348)">Tree Pose</font>**
@@ -597,38 +768,6 @@ if landmarks:
 # 
 # We will perform pose classification on a few images of people in the tree yoga pose and display the results using the same function we had created above.
 
-# In[18]:
-
-
-# Read a sample image and perform pose classification on it.
-image = cv2.imread('media/treepose.jpg')
-output_image, landmarks = detectPose(image, mp_pose.Pose(static_image_mode=True,
-                                         min_detection_confidence=0.5, model_complexity=0), display=False)
-if landmarks:
-    classifyPose(landmarks, output_image, display=True)
-
-
-# In[19]:
-
-
-# Read another sample image and perform pose classification on it.
-image = cv2.imread('media/treepose1.jpg')
-output_image, landmarks = detectPose(image, mp_pose.Pose(static_image_mode=True, 
-                                                         min_detection_confidence=0.5, model_complexity=0), display=False)
-if landmarks:
-    classifyPose(landmarks, output_image, display=True)
-
-
-# In[20]:
-
-
-# Read another sample image and perform pose classification on it.
-image = cv2.imread('media/treepose2.jpg')
-output_image, landmarks = detectPose(image, pose, display=False)
-if landmarks:
-    classifyPose(landmarks, output_image, display=True)
-
-
 # ## **<font style="color:rgb(134,19,348)">T Pose</font>**
 # 
 # T Pose (also known as a bind pose or reference pose) is the last pose we are dealing with in this lesson. To make this pose, one has to stand up like a tree with both hands wide open as branches. The following body part angles are required to make this one:
@@ -641,36 +780,47 @@ if landmarks:
 # 
 # Now, let's test the pose classification function on a few images of the T pose.
 
-# In[21]:
-
-
-# Read another sample image and perform pose classification on it.
-image = cv2.imread('media/Tpose.jpg')
-output_image, landmarks = detectPose(image, pose, display=False)
-if landmarks:
-    classifyPose(landmarks, output_image, display=True)
+# So the function is working pretty well on all the known poses on images lets try it on an unknown pose called cobra pose (also known as Bhujangasana).
 
+# In[23]:
 
-# In[22]:
 
+def runClassificationDemo(library_path=None):
+    '''
+    This function performs pose classification on the Warrior II, Tree, T and cobra pose images and displays the
+    results. The landmarks come from the pose library when it was built (see PoseLibrary), the detection only runs
+    on the images the library does not hold.
+    Args:
+        library_path: The path of the pose library, LIBRARY_PATH of PoseLibrary by default.
+    '''
 
-# Read another sample image and perform pose classification on it.
-image = cv2.imread('media/Tpose1.jpg')
-output_image, landmarks = detectPose(image, pose, display=False)
-if landmarks:
-    classifyPose(landmarks, output_image, display=True)
+    import matplotlib.pyplot as plt
+    from PoseLibrary import LIBRARY_PATH, LIGHT_MODEL_IMAGES, LIGHT_POSE_OPTIONS, loadPoseLibrary
 
+    # Calculate the angle between three dummy landmarks.
+    showDummyAngle()
 
-# So the function is working pretty well on all the known poses on images lets try it on an unknown pose called cobra pose (also known as Bhujangasana).
+    # The landmarks of the reference images the library found a person in.
+    library = loadPoseLibrary(library_path or LIBRARY_PATH)
+    stored = {} if library is None else {
+        os.path.normpath(path): landmarks for path, landmarks in zip(library['paths'], library['landmarks'])
+        if not np.isnan(landmarks).any()}
 
-# In[23]:
+    # The lighter model finds the landmarks of the first two tree pose images better, set up on first use.
+    light_pose = None
 
+    # Read the sample images and perform pose classification on them.
+    for image_path in ['media/warriorIIpose.jpg', 'media/warriorIIpose1.jpg', 'media/treepose.jpg',
+                       'media/treepose1.jpg', 'media/treepose2.jpg', 'media/Tpose.jpg', 'media/Tpose1.jpg',
+                       'media/cobrapose1.jpg']:
+        landmarks = stored.get(os.path.normpath(image_path))
+        if landmarks is None and os.path.basename(image_path) in LIGHT_MODEL_IMAGES:
+            light_pose = light_pose or createPose(LIGHT_POSE_OPTIONS)
+            classifyImage(image_path, light_pose)
+        else:
+            classifyImage(image_path, landmarks=landmarks)
 
-# Read another sample image and perform pose classification on it.
-image = cv2.imread('media/cobrapose1.jpg')
-#output_image, landmarks = detectPose(image, pose, display=False)
-if landmarks:
-    classifyPose(landmarks, output_image, display=True)
+    plt.show()
 
 
 # Now if you want you can extend the pose classification function to make it capable of identifying more yoga poses like the one in the image above. The following combination of body part angles can help classify this one:
@@ -685,63 +835,159 @@ if landmarks:
 # In[25]:
 
 
-# Setup Pose function for video.
-pose_video = mp_pose.Pose(static_image_mode=False, min_detection_confidence=0.5, model_complexity=1)
-
-# Initialize the VideoCapture object to read from the webcam.
-camera_video = cv2.VideoCapture(0)
-camera_video.set(3,1280)
-camera_video.set(4,960)
-
-# Initialize a resizable window.
-cv2.namedWindow('Pose Classification', cv2.WINDOW_NORMAL)
+def runPoseClassification(source=0, target_fps=15, capture_process=False, headless=False, feedback=None,
+                          record=None):
+    '''
+    This function performs pose classification on a real-time webcam feed or a video and displays the results.
+    Args:
+        source: The index of the webcam, or the path of a video stored in the disk such as 'media/exercising.mp4'.
+        target_fps: The frame rate to keep by lowering the frame height, switching to the lighter model and
+                    skipping frames when the detection falls behind (see QualityOfService), 0 to always use the
+                    full setting.
+        capture_process: Whether a separate process reads the frames and passes them through shared memory (see
+                         FrameRing).
+        headless: Whether to skip drawing and displaying the frames and print the label whenever it changes.
+        feedback: A FeedbackScheduler the poses, hold times and flows are reported to, or None.
+        record: The path of a video file the annotated frames are written to at target_fps (30 without it), also
+                in headless mode, or None.
+    '''
 
-# Iterate until the webcam is accessed successfully.
-while camera_video.isOpened():
-    
-    # Read a frame.
-    ok, frame = camera_video.read()
-    
-    # Check if frame is not read properly.
-    if not ok:
-        
-        # Continue to the next iteration to read the next frame and ignore the empty camera frame.
-        continue
-    
-    # Flip the frame horizontally for natural (selfie-view) visualization.
-    frame = cv2.flip(frame, 1)
-    
-    # Get the width and height of the frame
-    frame_height, frame_width, _ =  frame.shape
-    
-    # Resize the frame while keeping the aspect ratio.
-    frame = cv2.resize(frame, (int(frame_width * (640 / frame_height)), 640))
-    
-    # Perform Pose landmark detection.
-    frame, landmarks = detectPose(frame, pose_video, display=False)
-    
-    # Check if the landmarks are detected.
-    if landmarks:
-        
-        # Perform the Pose Classification.
-        frame, _ = classifyPose(landmarks, frame, display=False)
-    
-    # Display the frame.
-    cv2.imshow('Pose Classification', frame)
-    
-    # Wait until a key is pressed.
-    # Retreive the ASCII code of the key pressed
-    k = cv2.waitKey(1) & 0xFF
-    
-    # Check if 'ESC' is pressed.
-    if(k == 27):
-        
-        # Break the loop.
-        break
+    from PoseSequence import FlowRecognizer, formatEvent
+    from QualityOfService import QOS_LEVELS, QoSController
+    from VideoExport import AnnotatedVideoWriter
 
-# Release the VideoCapture object and close the windows.
-camera_video.release()
-cv2.destroyAllWindows()
+    # Setup Pose function for video, one per model_complexity the quality of service uses, created on first use.
+    mp_pose, _ = loadMediapipe()
+    pose_videos = {}
+    qos = QoSController(target_fps) if target_fps else None
+    level = qos.level if qos else QOS_LEVELS[0]
+    landmarks = []
+    skeleton = None
+    label = None
+
+    # The frames are drawn when they are displayed or recorded, the recorder is opened with the first frame.
+    draw = not headless or record is not None
+    recorder = None
+
+    # Recognize the pose holds, transitions and flows over the labels of the frames (see PoseSequence).
+    flows = FlowRecognizer()
+    start_time = time()
+
+    # Read the frames of the webcam, or of a video stored in the disk, here or in a capture process. Empty camera
+    # frames are skipped and the frames end with the video.
+    camera_video = CapturedFrames(source, separate_process=capture_process, width=1280, height=960)
+
+    # Initialize a resizable window.
+    if not headless:
+        cv2.namedWindow('Pose Classification', cv2.WINDOW_NORMAL)
+
+    # Iterate over the frames.
+    for frame in camera_video:
+
+        time1 = time()
+
+        # Flip the frame horizontally for natural (selfie-view) visualization.
+        frame = cv2.flip(frame, 1)
+
+        # Skip the frame if the capture process overwrote it while it was flipped.
+        if not camera_video.intact():
+            continue
+
+        # Get the width and height of the frame
+        frame_height, frame_width, _ =  frame.shape
+
+        # Resize the frame while keeping the aspect ratio.
+        frame = cv2.resize(frame, (int(frame_width * (level.height / frame_height)), level.height))
+
+        # Perform Pose landmark detection, or reuse the landmarks of the last detection on a skipped frame.
+        detect = qos.shouldDetect() if qos else True
+        warmup = detect and level.model_complexity not in pose_videos
+        if warmup:
+            try:
+                pose_videos[level.model_complexity] = mp_pose.Pose(
+                    **dict(VIDEO_POSE_OPTIONS, model_complexity=level.model_complexity))
+            except Exception as e:
+                # mediapipe downloads the lite and heavy models on first use, which fails without network access.
+                if not qos:
+                    raise
+                qos.exclude(level.model_complexity, e)
+                level = qos.level
+                continue
+        if detect:
+            frame, landmarks, skeleton = detectPose(frame, pose_videos[level.model_complexity], display=False,
+                                                    draw=draw, return_skeleton=True)
+
+        # Draw the reused skeleton on a skipped frame, it was found at the same frame height and keeps the
+        # visibility, so the same landmarks are drawn as on the detected frames.
+        elif skeleton is not None and draw:
+            _SKELETON.draw(frame, skeleton)
+
+        # Check if the landmarks are detected.
+        if landmarks:
+
+            # Perform the Pose Classification, without writing the label when nothing is drawn.
+            if not draw:
+                _, new_label = classifyPose(landmarks, None, display=False)
+            else:
+                frame, new_label = classifyPose(landmarks, frame, display=False)
+
+            # Print the label when it changes in headless mode.
+            if headless and new_label != label:
+                print(new_label)
+            label = new_label
+
+        # Print the holds, transitions and flows the recognizer committed.
+        for _, event in flows.update([label if landmarks else 'Unknown Pose'], time() - start_time):
+            print(formatEvent(event))
+            if feedback and event['event'] == 'flow':
+                feedback.emit('flow', event['flow'], f'{event["flow"]} completed')
+
+        # Report the pose to the feedback, which delivers its events on its own threads.
+        if feedback:
+            feedback.updatePose(label if landmarks else None)
+
+        # Let the quality of service pick the setting of the next frame from the time this one took. The first
+        # frame of a new Pose function includes its setup, so it is left out.
+        if detect and not warmup and qos and qos.update(time() - time1):
+            level = qos.level
+
+        # Record the frame, the writer encodes it on its own thread. The frames of a lower quality of service
+        # level are scaled to the size of the first frame.
+        if record is not None:
+            if recorder is None:
+                recorder = AnnotatedVideoWriter(record, target_fps or 30, (frame.shape[1], frame.shape[0]))
+            recorder.write(frame)
+
+        # Skip the display in headless mode.
+        if headless:
+            continue
+
+        # Display the frame.
+        cv2.imshow('Pose Classification', frame)
+
+        # Wait until a key is pressed.
+        # Retreive the ASCII code of the key pressed
+        k = cv2.waitKey(1) & 0xFF
+
+        # Check if 'ESC' is pressed.
+        if(k == 27):
+
+            # Break the loop.
+            break
+
+    # Print the events of the last frames.
+    for _, event in flows.finish():
+        print(formatEvent(event))
+
+    # Release the Pose functions and finish the recording.
+    for pose_video in pose_videos.values():
+        pose_video.close()
+    if recorder is not None:
+        recorder.close()
+
+    # Close the windows.
+    if not headless:
+        cv2.destroyAllWindows()
 
 
 # As expected, the results were amazing, if you were having difficulty in making the poses you can expand the range of angles used in the classification function, but that may open up the possibility of false positives.
@@ -760,8 +1006,58 @@ cv2.destroyAllWindows()
 #     
 # 
 
+# ### **<font style="color:rgb(134,19,348)">Command Line</font>**
+# 
+# Run `python RealTimePoseDetection.py` for the real-time pose classification, or pick another part of the lesson with
+# `--mode`. The `--source` is a webcam index or the path of a video stored in the disk.
+
 # In[ ]:
 
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Real-time pose detection and classification with Mediapipe.')
+    parser.add_argument('--mode', choices=['classify', 'detect', 'images', 'classify-images'], default='classify',
+                        help='the real-time classification (default), the real-time detection, or the image demos')
+    parser.add_argument('--source', default=None,
+                        help='webcam index or video path, 0 for classification and 1 for detection by default')
+    parser.add_argument('--target-fps', type=float, default=15,
+                        help='frame rate the classification keeps by degrading its quality, 0 to disable')
+    parser.add_argument('--capture-process', action='store_true',
+                        help='read the frames in a separate process and pass them through shared memory')
+    parser.add_argument('--headless', action='store_true',
+                        help='classify without drawing or displaying the frames and print the labels')
+    parser.add_argument('--feedback', nargs='+', choices=['console', 'speech', 'push'], default=[],
+                        help='sinks the poses, hold times and flows are announced to')
+    parser.add_argument('--push-url', help='URL the push feedback sink posts the events to')
+    parser.add_argument('--record', help='path of a video file the annotated classification is recorded to')
+    args = parser.parse_args(argv)
+
+    # Show the decisions of the quality of service.
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s: %(message)s')
+
+    # Use a webcam index when the source is a number and a video path otherwise.
+    source = args.source
+    if source is not None and source.isdigit():
+        source = int(source)
+
+    if args.mode == 'classify':
+        feedback = None
+        if args.feedback:
+            from FeedbackScheduler import FeedbackScheduler, makeSinks
+            feedback = FeedbackScheduler(makeSinks(args.feedback, args.push_url))
+        try:
+            runPoseClassification(0 if source is None else source, args.target_fps, args.capture_process,
+                                  args.headless, feedback, args.record)
+        finally:
+            if feedback:
+                feedback.close()
+    elif args.mode == 'detect':
+        runPoseDetection(1 if source is None else source)
+    elif args.mode == 'images':
+        runImageDemo()
+    else:
+        runClassificationDemo()
 
 
+if __name__ == '__main__':
+    main()
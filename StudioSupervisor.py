@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Multi-Camera Studio Supervisor
+#
+# The live loops read a single camera into a single window. A studio has one camera per mat row, so the
+# StudioSupervisor runs one worker process per configured source (a webcam index or a video path) instead:
+#
+# * every worker captures its frames, runs the pose detection, classifyPose and the curl counter, and sends one
+#   small (frame, time, label, reps) message per frame back through its own pipe,
+# * every worker is pinned to its own core when the platform allows it, so one camera cannot slow down another,
+# * a worker that crashes is restarted after a growing delay, a video file resumes at the frame after the last one
+#   it reported and the rep count of the camera carries on from where it was,
+# * the messages of all the workers are merged into one stream of events with the label and reps of the camera
+#   and the total reps of the studio.
+#
+# Every worker has its own pipe rather than one shared queue, so a worker killed in the middle of sending cannot
+# leave a lock held or a half written message behind for the others.
+#
+# Usage:
+#     python StudioSupervisor.py media/exercising.mp4 media/exercising.mp4 media/exercising.mp4 --kill-after 5
+
+import argparse
+import logging
+import multiprocessing
+import os
+from multiprocessing.connection import wait
+from time import time
+
+import cv2
+import numpy as np
+
+from FrameRing import CapturedFrames
+from MediaPipeSetCounter import curl_counter_step
+from PoseScoring import JOINT_NAMES, calculateAngles
+from RealTimePoseDetection import VIDEO_POSE_OPTIONS, classifyPose, loadMediapipe
+
+logger = logging.getLogger(__name__)
+
+# Index of the left elbow angle in the output of calculateAngles, used by the curl counter.
+_LEFT_ELBOW = JOINT_NAMES.index('left_elbow')
+
+
+def cameraWorker(connection, source, core=None, start_frame=0, height=640):
+    '''
+    This function captures the frames of a source, runs the pose detection, classification and curl counter on
+    them and sends the results of every frame through a pipe. It runs in the worker process of a camera.
+    Args:
+        connection: The sending end of the pipe to the supervisor.
+        source: The index of the webcam, or the path of a video stored in the disk.
+        core: The core to pin the process to, None to leave it to the operating system.
+        start_frame: The first frame of a video to process, the frames before it are only decoded.
+        height: The height the frames are resized to before the detection, like the live loops do.
+    '''
+
+    if core is not None and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, {core})
+
+    mp_pose, _ = loadMediapipe()
+    counter, stage = 0, None
+    with mp_pose.Pose(**VIDEO_POSE_OPTIONS) as pose:
+        for frame_index, frame in enumerate(CapturedFrames(source, separate_process=False)):
+            if frame_index < start_frame:
+                continue
+
+            # Resize the frame while keeping the aspect ratio.
+            frame_height, frame_width, _ = frame.shape
+            frame = cv2.resize(frame, (int(frame_width * (height / frame_height)), height))
+
+            # Perform Pose landmark detection.
+            results = pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+            label = 'Unknown Pose'
+            if results.pose_landmarks:
+                # Scale the landmarks to pixel coordinates like detectPose does.
+                width = frame.shape[1]
+                landmarks = np.array([(landmark.x * width, landmark.y * height, landmark.z * width,
+                                       landmark.visibility) for landmark in results.pose_landmarks.landmark],
+                                     dtype=np.float32)
+
+                # Perform the Pose Classification.
+                _, label = classifyPose(landmarks[:, :3], frame, display=False)
+
+                # Run the curl counter on the left elbow angle, folded into [0, 180].
+                angle = calculateAngles(landmarks[np.newaxis])[0, _LEFT_ELBOW]
+                if not np.isnan(angle):
+                    counter, stage = curl_counter_step(min(angle, 360 - angle), counter, stage)
+
+            connection.send((frame_index, time(), label, counter))
+
+    connection.close()
+
+
+class Camera:
+    '''
+    The state of one source of the studio as seen by the supervisor.
+    Args:
+        index: The index of the camera in the studio.
+        source: The index of the webcam, or the path of a video stored in the disk.
+        core: The core its worker is pinned to, None if workers are not pinned.
+    '''
+
+    def __init__(self, index, source, core):
+        self.index = index
+        self.source = source
+        self.core = core
+        self.process = None
+        self.connection = None
+        self.started_at = None
+        self.restart_at = None
+        self.failures = 0
+        self.restarts = 0
+        self.finished = False
+        self.frame = -1
+        self.label = 'Unknown Pose'
+        self.reps = 0
+        # The reps counted by the workers that ended, the counter of a restarted worker starts at 0.
+        self.reps_offset = 0
+        self._worker_reps = 0
+
+    @property
+    def active(self):
+        return not self.finished
+
+
+class StudioSupervisor:
+    '''
+    Runs and restarts one worker process per camera and merges their results into one stream.
+    Args:
+        sources: A list of webcam indexes and video paths.
+        pin_cores: Whether to pin every worker to its own core, the cores are reused when there are more cameras.
+        max_failures: The number of crashes in a row after which a camera is given up.
+        backoff: The delay before the first restart in seconds, it doubles after every crash in a row.
+        max_backoff: The longest delay before a restart in seconds.
+        stable_seconds: The time a worker must run before its crashes in a row are forgotten.
+        height: The height the frames are resized to before the detection.
+    '''
+
+    def __init__(self, sources, pin_cores=True, max_failures=5, backoff=1.0, max_backoff=30.0, stable_seconds=60.0,
+                 height=640):
+        cores = sorted(os.sched_getaffinity(0)) if pin_cores and hasattr(os, 'sched_getaffinity') else None
+        self.cameras = [Camera(index, source, cores[index % len(cores)] if cores else None)
+                        for index, source in enumerate(sources)]
+        self.max_failures = max_failures
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stable_seconds = stable_seconds
+        self.height = height
+        self._context = multiprocessing.get_context('spawn')
+
+    @property
+    def total_reps(self):
+        return sum(camera.reps for camera in self.cameras)
+
+    def _startWorker(self, camera):
+        receiver, sender = self._context.Pipe(duplex=False)
+        # A video resumes after the last frame its previous worker reported, a webcam simply continues.
+        start_frame = camera.frame + 1 if isinstance(camera.source, str) else 0
+        camera.process = self._context.Process(target=cameraWorker, daemon=True,
+                                               args=(sender, camera.source, camera.core, start_frame, self.height))
+        camera.process.start()
+        # Close this end of the pipe here, so the receiver gets an EOF when the worker ends.
+        sender.close()
+        camera.connection = receiver
+        camera.started_at = time()
+        camera.restart_at = None
+        camera.reps_offset += camera._worker_reps
+        camera._worker_reps = 0
+        logger.info('Camera %d (%s) started on core %s, pid %d', camera.index, camera.source, camera.core,
+                    camera.process.pid)
+
+    def _workerEnded(self, camera):
+        camera.connection.close()
+        camera.connection = None
+        camera.process.join()
+        exitcode = camera.process.exitcode
+        camera.process = None
+        if exitcode == 0:
+            camera.finished = True
+            logger.info('Camera %d (%s) finished after frame %d, %d reps', camera.index, camera.source,
+                        camera.frame, camera.reps)
+            return
+
+        if time() - camera.started_at >= self.stable_seconds:
+            camera.failures = 0
+        camera.failures += 1
+        if camera.failures > self.max_failures:
+            camera.finished = True
+            logger.error('Camera %d (%s) crashed %d times in a row with exit code %s, giving up', camera.index,
+                         camera.source, camera.failures, exitcode)
+            return
+
+        delay = min(self.backoff * 2 ** (camera.failures - 1), self.max_backoff)
+        camera.restart_at = time() + delay
+        camera.restarts += 1
+        logger.warning('Camera %d (%s) crashed with exit code %s, restarting in %.1fs', camera.index, camera.source,
+                       exitcode, delay)
+
+    def kill(self, index):
+        '''
+        This function kills the worker of a camera, like a crash would, to check that it is restarted.
+        Args:
+            index: The index of the camera.
+        '''
+
+        camera = self.cameras[index]
+        if camera.process is not None:
+            camera.process.kill()
+
+    def events(self):
+        '''
+        This function starts the workers and yields the results of all the cameras as they arrive, until every
+        camera finished or was given up.
+        Yields:
+            event: A dictionary with the 'camera' index, its 'source', the 'frame' index and capture 'time', the
+                   'label' and 'reps' of the camera and the 'total_reps' of the studio.
+        '''
+
+        for camera in self.cameras:
+            self._startWorker(camera)
+
+        try:
+            while any(camera.active for camera in self.cameras):
+                # Restart the crashed workers whose delay is over.
+                now = time()
+                for camera in self.cameras:
+                    if camera.active and camera.process is None and camera.restart_at <= now:
+                        self._startWorker(camera)
+
+                by_connection = {camera.connection: camera for camera in self.cameras
+                                 if camera.connection is not None}
+                for connection in wait(list(by_connection), timeout=0.1):
+                    camera = by_connection[connection]
+                    try:
+                        frame, timestamp, label, reps = connection.recv()
+                    except EOFError:
+                        self._workerEnded(camera)
+                        continue
+
+                    camera.frame, camera.label, camera._worker_reps = frame, label, reps
+                    camera.reps = camera.reps_offset + reps
+                    yield {'camera': camera.index, 'source': camera.source, 'frame': frame, 'time': timestamp,
+                           'label': label, 'reps': camera.reps, 'total_reps': self.total_reps}
+        finally:
+            self.stop()
+
+    def stop(self):
+        '''This function stops the workers that are still running.'''
+        for camera in self.cameras:
+            if camera.process is not None:
+                camera.process.terminate()
+                camera.process.join()
+                camera.process = None
+            if camera.connection is not None:
+                camera.connection.close()
+                camera.connection = None
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Run the pose classification and curl counter on several cameras.')
+    parser.add_argument('sources', nargs='+', help='webcam indexes and video paths, one per camera')
+    parser.add_argument('--no-pinning', action='store_true', help='let the operating system place the workers')
+    parser.add_argument('--kill-after', type=float, default=None,
+                        help='kill the worker of the first camera once after this many seconds to test the restart')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s: %(message)s')
+
+    # Use a webcam index when the source is a number and a video path otherwise.
+    sources = [int(source) if source.isdigit() else source for source in args.sources]
+    supervisor = StudioSupervisor(sources, pin_cores=not args.no_pinning)
+
+    # Print the stream whenever the label or the reps of a camera change.
+    time1, killed, last = time(), False, {}
+    for event in supervisor.events():
+        if args.kill_after is not None and not killed and time() - time1 >= args.kill_after:
+            supervisor.kill(0)
+            killed = True
+        if last.get(event['camera']) != (event['label'], event['reps']):
+            last[event['camera']] = (event['label'], event['reps'])
+            print(f'camera {event["camera"]} frame {event["frame"]:>5}: {event["label"]:<16} '
+                  f'{event["reps"]:>3} reps, studio {event["total_reps"]:>3} reps')
+
+    for camera in supervisor.cameras:
+        print(f'Camera {camera.index} ({camera.source}): {camera.frame + 1} frames, {camera.reps} reps, '
+              f'{camera.restarts} restarts')
+    print(f'{time() - time1:.1f}s, {supervisor.total_reps} reps in total')
@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Annotated Video Export
+#
+# The live loops can only show their results in an OpenCV window. This module writes the same annotations (the
+# skeleton, the pose label, the rep count and the FPS) into an MP4 file instead, without any display:
+#
+# * **AnnotatedVideoWriter** - the drawing and the encoding run on a separate writer thread fed through a bounded
+#   queue, so the inference loop only pays for handing over a frame. The live loops record what they show with
+#   it (--record), and the skeleton is drawn by the same SkeletonRenderer as their overlay.
+# * **renderRecording** - re-renders a video from the landmarks saved by VideoProcessing.py, without running the
+#   pose detection again.
+#
+# Usage:
+#     python VideoExport.py exercising.npz exercising_annotated.mp4 --video media/exercising.mp4
+#     python RealTimePoseDetection.py --source media/exercising.mp4 --headless --record exercising_live.mp4
+
+import argparse
+import queue
+import threading
+
+import cv2
+import numpy as np
+
+from OverlayRenderer import SkeletonRenderer
+
+# The skeleton of the exported videos, in the colors of the curl counter.
+_SKELETON = SkeletonRenderer(connection_color=(245, 66, 230), landmark_color=(245, 117, 66), radius=2)
+
+
+def drawAnnotations(frame, landmarks=None, label=None, reps=None, fps=None, min_visibility=0.5):
+    '''
+    This function draws the skeleton, the pose label, the rep count and the FPS on a frame.
+    Args:
+        frame: The BGR frame to draw on.
+        landmarks: An array of shape (33, 4) of landmarks in pixel coordinates, or None (or NaN) if no person
+                   was detected.
+        label: The pose label, written like classifyPose does.
+        reps: The number of reps, written in a status box like the curl counter does.
+        fps: The number of frames per second.
+        min_visibility: The minimum visibility for a landmark to be drawn.
+    Returns:
+        frame: The frame with the annotations drawn.
+    '''
+
+    # Draw the visible connections and landmarks, nothing if no person was detected.
+    if landmarks is not None:
+        skeleton = _SKELETON
+        if min_visibility != skeleton.min_visibility:
+            skeleton = SkeletonRenderer(skeleton.connection_color, skeleton.landmark_color, radius=2,
+                                        min_visibility=min_visibility)
+        skeleton.draw(frame, landmarks)
+
+    # Write the pose label, in green if it is a known pose and in red otherwise.
+    if label is not None:
+        color = (0, 0, 255) if label == 'Unknown Pose' else (0, 255, 0)
+        cv2.putText(frame, str(label), (10, 30), cv2.FONT_HERSHEY_PLAIN, 2, color, 2)
+
+    # Write the rep count in a status box below the label.
+    if reps is not None:
+        cv2.rectangle(frame, (0, 40), (110, 105), (245, 117, 16), -1)
+        cv2.putText(frame, 'REPS', (15, 55), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1, cv2.LINE_AA)
+        cv2.putText(frame, str(int(reps)), (10, 95), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (255, 255, 255), 2,
+                    cv2.LINE_AA)
+
+    # Write the number of frames per second at the bottom of the frame.
+    if fps is not None:
+        cv2.putText(frame, 'FPS: {}'.format(int(fps)), (10, frame.shape[0] - 15), cv2.FONT_HERSHEY_PLAIN, 2,
+                    (0, 255, 0), 3)
+
+    return frame
+
+
+class AnnotatedVideoWriter:
+    '''
+    Writes annotated frames to a video file on a separate thread.
+    Args:
+        path: The path of the output video file.
+        fps: The frame rate of the output video.
+        frame_size: The (width, height) of the video, frames of another size are scaled to it.
+        queue_size: The maximum number of frames waiting to be written. write blocks when the queue is full, so
+                    a slow disk slows the producer down instead of growing memory without bounds.
+        fourcc: The four character code of the codec.
+    '''
+
+    def __init__(self, path, fps, frame_size, queue_size=64, fourcc='mp4v'):
+        self.frame_size = tuple(frame_size)
+        self._writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, self.frame_size)
+        if not self._writer.isOpened():
+            raise IOError(f'Could not open the video writer for {path}')
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, frame, landmarks=None, label=None, reps=None, fps=None):
+        '''
+        This function queues a frame and its annotations to be drawn and written.
+        Args:
+            frame: The BGR frame. It must not be modified by the caller afterwards.
+            landmarks, label, reps, fps: The annotations, as accepted by drawAnnotations.
+        '''
+
+        # Surface a failure of the writer thread in the producer instead of silently dropping frames.
+        if self._error is not None:
+            raise self._error
+
+        self._queue.put((frame, landmarks, label, reps, fps))
+
+    def _run(self):
+        '''
+        This function draws and writes the queued frames until close is called.
+        '''
+
+        while True:
+            item = self._queue.get()
+
+            # Check if the writer is being closed.
+            if item is None:
+                break
+
+            # Keep draining the queue after a failure so the producer never blocks on a full queue.
+            if self._error is not None:
+                continue
+
+            try:
+                frame, landmarks, label, reps, fps = item
+                frame = drawAnnotations(frame, landmarks, label, reps, fps)
+
+                # The live loops change the frame height with the quality of service.
+                if (frame.shape[1], frame.shape[0]) != self.frame_size:
+                    frame = cv2.resize(frame, self.frame_size)
+                self._writer.write(frame)
+            except Exception as e:
+                self._error = e
+
+        self._writer.release()
+
+    def close(self):
+        '''
+        This function writes the remaining frames and closes the video file.
+        '''
+
+        self._queue.put(None)
+        self._thread.join()
+
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def renderRecording(results_path, output_path, video_path=None, height=640, frame_size=None):
+    '''
+    This function renders an annotated video from the results saved by VideoProcessing.py, without inference.
+    Args:
+        results_path: The path of the .npz file with the per-frame 'landmarks', 'labels', 'reps' and 'fps'.
+        output_path: The path of the output video file.
+        video_path: The path of the original video. If None, the skeleton is drawn on a black background.
+        height: The height the original frames were resized to when the landmarks were computed.
+        frame_size: The (width, height) of the black background when there is no video, derived from the
+                    landmarks by default.
+    '''
+
+    # Load the saved results.
+    results = np.load(results_path)
+    landmarks, labels, reps, fps = results['landmarks'], results['labels'], results['reps'], float(results['fps'])
+
+    # Find the size of the frames.
+    video = cv2.VideoCapture(video_path) if video_path else None
+    if video is not None:
+        width = int(video.get(cv2.CAP_PROP_FRAME_WIDTH) * height / video.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        frame_size = (width, height)
+    elif frame_size is None:
+        frame_size = (int(np.nanmax(landmarks[..., 0], initial=0)) + 1, height)
+
+    with AnnotatedVideoWriter(output_path, fps, frame_size) as writer:
+        for frame_index in range(len(landmarks)):
+
+            # Read and resize the original frame, or start from a black background.
+            if video is not None:
+                ok, frame = video.read()
+                if not ok:
+                    break
+                frame = cv2.resize(frame, frame_size)
+            else:
+                frame = np.zeros((frame_size[1], frame_size[0], 3), dtype=np.uint8)
+
+            writer.write(frame, landmarks[frame_index], labels[frame_index], reps[frame_index], fps)
+
+    if video is not None:
+        video.release()
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Render an annotated video from saved pose landmarks.')
+    parser.add_argument('results', help='path of the .npz file saved by VideoProcessing.py')
+    parser.add_argument('output', help='path of the annotated .mp4 file to write')
+    parser.add_argument('--video', help='path of the original video, a black background is used otherwise')
+    args = parser.parse_args()
+
+    renderRecording(args.results, args.output, video_path=args.video)
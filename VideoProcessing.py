@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Headless Video File Processing
+#
+# The live loops only read from a camera. This module processes recorded videos such as media/exercising.mp4
+# without any window, and uses every core of the machine to do it:
+#
+# * The video is split into segments whose boundaries fall on keyframes (found with ffprobe when it is
+#   installed), so every worker can seek to its segment without decoding the frames before it.
+# * Each segment is decoded and run through pose detection in its own process. A worker starts a few frames
+#   before its segment (the warm-up overlap) so MediaPipe's tracker has locked on by the first frame it keeps.
+# * The per-frame landmarks and labels of all segments are merged back in order and the curl counter is run
+#   over the merged elbow angles, so the rep counts are the same as with a single sequential pass.
+#
+# Usage:
+#     python VideoProcessing.py media/exercising.mp4 --output exercising.npz
+
+import argparse
+import json
+import os
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from time import time
+
+import cv2
+import numpy as np
+
+from MediaPipeSetCounter import curl_counter_step
+from PoseScoring import JOINT_NAMES, calculateAngles
+from RealTimePoseDetection import VIDEO_POSE_OPTIONS, classifyPose, loadMediapipe
+
+
+# Index of the left elbow angle in the output of calculateAngles, used by the curl counter.
+_LEFT_ELBOW = JOINT_NAMES.index('left_elbow')
+
+
+def probeVideo(path):
+    '''
+    This function reads the number of frames and the frame rate of a video.
+    Args:
+        path: The path of the video file.
+    Returns:
+        frame_count: The number of frames in the video.
+        fps: The number of frames per second of the video.
+    '''
+
+    # Open the video and read its properties.
+    video = cv2.VideoCapture(path)
+    if not video.isOpened():
+        raise IOError(f'Could not open the video {path}')
+    frame_count = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = video.get(cv2.CAP_PROP_FPS) or 30.0
+    video.release()
+
+    return frame_count, fps
+
+
+def findKeyframes(path, fps):
+    '''
+    This function lists the frame indexes of the keyframes of a video with ffprobe.
+    Args:
+        path: The path of the video file.
+        fps: The number of frames per second of the video.
+    Returns:
+        keyframes: A sorted list of keyframe indexes, or None if ffprobe is not available.
+    '''
+
+    # Ask ffprobe for the timestamps of the keyframes only.
+    try:
+        output = subprocess.run(['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-skip_frame', 'nokey',
+                                 '-show_entries', 'frame=pts_time', '-of', 'json', path],
+                                capture_output=True, check=True, text=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    # Convert the timestamps into frame indexes.
+    frames = json.loads(output).get('frames', [])
+    return sorted({int(round(float(frame['pts_time']) * fps)) for frame in frames if 'pts_time' in frame})
+
+
+def planSegments(frame_count, segment_frames, warmup_frames, keyframes=None):
+    '''
+    This function splits a video into segments aligned on keyframes.
+    Args:
+        frame_count: The number of frames in the video.
+        segment_frames: The desired number of frames per segment.
+        warmup_frames: The number of frames decoded before each segment to warm up the tracker.
+        keyframes: The sorted keyframe indexes, or None to split at any frame.
+    Returns:
+        segments: A list of (decode_start, start, end) tuples. Frames from decode_start to start are only used
+                  to warm up the tracker, frames from start to end are kept. Empty when there are no frames.
+    '''
+
+    # A video without frames, or whose container does not report them, has no segments.
+    if frame_count <= 0:
+        return []
+
+    # Without keyframe information every frame is a possible boundary.
+    keyframes = np.asarray(keyframes if keyframes else range(frame_count))
+
+    # Move every ideal boundary to the next keyframe.
+    boundaries = [0]
+    for ideal in range(segment_frames, frame_count, segment_frames):
+        index = np.searchsorted(keyframes, ideal)
+        if index < len(keyframes) and boundaries[-1] < keyframes[index] < frame_count:
+            boundaries.append(int(keyframes[index]))
+    boundaries.append(frame_count)
+
+    # Start decoding each segment at the last keyframe before its warm-up frames.
+    segments = []
+    for start, end in zip(boundaries[:-1], boundaries[1:]):
+        index = np.searchsorted(keyframes, max(start - warmup_frames, 0), side='right') - 1
+        segments.append((int(keyframes[max(index, 0)]), start, end))
+
+    return segments
+
+
+def processSegment(path, decode_start, start, end, height=640, classify=True, pose_options=None):
+    '''
+    This function runs pose detection and classification on a segment of a video.
+    Args:
+        path: The path of the video file.
+        decode_start: The first frame to decode, the frames before start only warm up the tracker.
+        start: The first frame of the segment.
+        end: The frame after the last frame of the segment.
+        height: The height the frames are resized to before the detection, like the live loops do.
+        classify: A boolean value that is if set to true the frames are also classified with classifyPose.
+        pose_options: The keyword arguments of mp_pose.Pose, VIDEO_POSE_OPTIONS by default.
+    Returns:
+        start: The first frame of the segment, to order the results.
+        landmarks: An array of shape (end - start, 33, 4) of landmarks in pixel coordinates, NaN where no
+                   person was detected.
+        labels: A list of the pose labels of the frames.
+    '''
+
+    mp_pose, _ = loadMediapipe()
+
+    # Initialize the outputs of the segment.
+    landmarks = np.full((end - start, 33, 4), np.nan, dtype=np.float32)
+    labels = ['Unknown Pose'] * (end - start)
+
+    # Open the video and seek to the first frame to decode.
+    video = cv2.VideoCapture(path)
+    video.set(cv2.CAP_PROP_POS_FRAMES, decode_start)
+
+    # Setup Pose function for video.
+    with mp_pose.Pose(**(pose_options or VIDEO_POSE_OPTIONS)) as pose:
+        for frame_index in range(decode_start, end):
+
+            # Read a frame.
+            ok, frame = video.read()
+            if not ok:
+                break
+
+            # Resize the frame while keeping the aspect ratio.
+            frame_height, frame_width, _ = frame.shape
+            frame = cv2.resize(frame, (int(frame_width * (height / frame_height)), height))
+
+            # Perform Pose landmark detection, also on the warm-up frames so the tracker follows the person.
+            results = pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+            # Skip the warm-up frames and the frames without a person.
+            if frame_index < start or not results.pose_landmarks:
+                continue
+
+            # Store the landmarks in pixel coordinates, the z coordinate scaled like detectPose does.
+            width = frame.shape[1]
+            frame_landmarks = landmarks[frame_index - start]
+            frame_landmarks[:] = [(landmark.x * width, landmark.y * height, landmark.z * width, landmark.visibility)
+                                  for landmark in results.pose_landmarks.landmark]
+
+            # Perform the Pose Classification.
+            if classify:
+                _, labels[frame_index - start] = classifyPose(frame_landmarks[:, :3], frame, display=False)
+
+    video.release()
+
+    return start, landmarks, labels
+
+
+def countReps(landmarks):
+    '''
+    This function runs the curl counter over the left elbow angles of a sequence of frames.
+    Args:
+        landmarks: An array of shape (N, 33, 4) of landmarks, NaN where no person was detected.
+    Returns:
+        reps: An array of shape (N,) with the number of reps counted up to every frame.
+    '''
+
+    # Calculate the left elbow angle of every frame at once, folded into [0, 180].
+    angles = calculateAngles(landmarks)[:, _LEFT_ELBOW]
+    angles = np.minimum(angles, 360 - angles)
+
+    # Run the counter over the frames where a person was detected.
+    reps = np.zeros(len(angles), dtype=np.int32)
+    counter, stage = 0, None
+    for frame_index, angle in enumerate(angles):
+        if not np.isnan(angle):
+            counter, stage = curl_counter_step(angle, counter, stage)
+        reps[frame_index] = counter
+
+    return reps
+
+
+def processVideo(path, workers=None, segment_seconds=60, warmup_frames=30, height=640, classify=True):
+    '''
+    This function processes a whole video file in parallel segments.
+    Args:
+        path: The path of the video file.
+        workers: The number of worker processes, the number of CPUs by default.
+        segment_seconds: The desired length of a segment in seconds.
+        warmup_frames: The number of frames decoded before each segment to warm up the tracker.
+        height: The height the frames are resized to before the detection.
+        classify: A boolean value that is if set to true the frames are also classified with classifyPose.
+    Returns:
+        result: A dictionary with the per-frame 'landmarks', 'labels' and 'reps' arrays and the video 'fps'.
+    '''
+
+    # Plan the segments of the video.
+    frame_count, fps = probeVideo(path)
+    segments = planSegments(frame_count, max(int(segment_seconds * fps), 1), warmup_frames,
+                            findKeyframes(path, fps))
+    if not segments:
+        raise ValueError(f'The video {path} reports no frames')
+
+    # Process the segments in parallel processes.
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = [executor.submit(processSegment, path, decode_start, start, end, height, classify)
+                   for decode_start, start, end in segments]
+        parts = sorted(future.result() for future in futures)
+
+    # Merge the segments back in order.
+    landmarks = np.concatenate([part_landmarks for _, part_landmarks, _ in parts])
+    labels = np.array([label for _, _, part_labels in parts for label in part_labels])
+
+    return {'landmarks': landmarks, 'labels': labels, 'reps': countReps(landmarks), 'fps': fps}
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Run pose detection on a recorded video without a display.')
+    parser.add_argument('video', help='path of the video file, e.g. media/exercising.mp4')
+    parser.add_argument('--output', help='path of the .npz file to save the per-frame results to')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--segment-seconds', type=float, default=60, help='length of a segment in seconds')
+    parser.add_argument('--no-classify', action='store_true', help='only detect the landmarks')
+    args = parser.parse_args()
+
+    time1 = time()
+    result = processVideo(args.video, workers=args.workers, segment_seconds=args.segment_seconds,
+                          classify=not args.no_classify)
+    elapsed = time() - time1
+
+    duration = len(result['landmarks']) / result['fps']
+    print(f'Processed {duration:.1f}s of video in {elapsed:.1f}s ({duration / elapsed:.1f}x real time), '
+          f'{int(result["reps"][-1]) if len(result["reps"]) else 0} reps')
+
+    if args.output:
+        np.savez_compressed(args.output, **result)
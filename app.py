@@ -1,6 +1,5 @@
 # app.py
 from flask import Flask, render_template, request, redirect, url_for, flash, session
-import pymysql
 from werkzeug.security import generate_password_hash, check_password_hash
 import re
 from datetime import datetime
@@ -8,59 +7,88 @@ import subprocess
 from flask import jsonify
 import sys
 import os
+import time
+from telemetry import TelemetryStore, DEFAULT_LABELS, month_start
+from sessionizer import RepositorySessionStore, Sessionizer
+from repository import create_repository, month_range
+import mastery
+from schedule import ScheduleIndex
+from booking import BookingEngine, BookingError, ClassNotFound
+import webcache
+from mediaserver import MediaServer
 #import base64
 #from flask_cors import CORS
 #import mediapipe as mp
 
-app = Flask(__name__)
+# The templates live next to this file
+app = Flask(__name__, template_folder='.')
 app.secret_key = 'Admin123'
 
-# Database connection function
-def get_db_connection():
-    return pymysql.connect(
-        host='localhost',
-        user='root',
-        password='shivsql123',
-        database='yoga_ai',
-        cursorclass=pymysql.cursors.DictCursor
-    )
+# The public pages are rendered once and served with ETag/Last-Modified, static URLs carry a content hash
+pages = webcache.init_app(app)
+
+# Tutorial videos and pose images, with Range requests and downscaled variants cached on disk
+media_server = MediaServer(os.path.join(os.path.dirname(__file__), 'media'),
+                           os.path.join(os.path.dirname(__file__), 'media_cache'))
+
+# Per-second pose telemetry, the dashboard only reads its rollups
+telemetry_store = TelemetryStore(os.path.join(os.path.dirname(__file__), 'telemetry'))
+
+# Only the labels classifyPose emits are stored, every new label would take one of the 256 label codes for good
+KNOWN_LABELS = frozenset(DEFAULT_LABELS)
+
+# All queries go through the repository, MySQL by default or the backend of DATABASE_URL
+repository = create_repository()
+
+# The telemetry store is compacted every hour, which merges the rollup rows of every append and drops the raw
+# and minute data past their retention. The mastery job evaluates the new raw samples right before.
+telemetry_store.start_compaction(before_compact=lambda: mastery.run_job(telemetry_store, repository))
+
+# The upcoming classes are served from memory, class writes go through the index to keep it current
+schedule = ScheduleIndex(repository)
+
+# Class bookings, capacity is enforced by the database with conditional updates
+bookings = BookingEngine(repository)
+
+# Write one practice_sessions row when the pose stream of a user goes idle
+def save_practice_session(summary):
+    repository.add_practice_session(summary['user_id'], summary['duration_minutes'],
+                                    datetime.fromtimestamp(summary['start']))
+
+# The open sessions are kept in the database, so a user's telemetry can reach any worker process, and every
+# worker closes the sessions of users who stopped on a timer
+sessionizer = Sessionizer(save_practice_session, RepositorySessionStore(repository))
+sessionizer.start_expiry()
 
 @app.route('/')
 def home():
     if 'loggedin' not in session:
         return redirect(url_for('login'))
     
-    conn = get_db_connection()
-    with conn.cursor() as cursor:
-        # Get user info
-        cursor.execute('SELECT * FROM users WHERE id = %s', (session['id'],))
-        user = cursor.fetchone()
-        
-        # Get practice statistics
-        cursor.execute('''
-            SELECT COUNT(*) as total_sessions, 
-            SUM(duration_minutes) as total_minutes 
-            FROM practice_sessions 
-            WHERE user_id = %s AND 
-            MONTH(session_date) = MONTH(CURRENT_DATE())
-        ''', (session['id'],))
-        stats = cursor.fetchone()
-        
-        # Get upcoming classes
-        cursor.execute('''
-            SELECT * FROM yoga_classes 
-            WHERE start_time > NOW() 
-            ORDER BY start_time 
-            LIMIT 3
-        ''')
-        classes = cursor.fetchall()
-        
-    conn.close()
+    # Get user info
+    user = repository.get_user(session['id'])
+    
+    # Get practice statistics of this month
+    stats = repository.practice_stats(session['id'], *month_range())
+
+    # Number of poses mastered, as found by the mastery job
+    poses_mastered = repository.count_mastered_poses(session['id'])
+    
+    # Get upcoming classes
+    classes = schedule.next_classes(3)
+
+    # Minutes spent in each pose this month, from the telemetry rollups
+    pose_minutes = {
+        label: telemetry_store.pose_seconds(session['id'], label, month_start(), time.time()) // 60
+        for label in DEFAULT_LABELS[1:]
+    }
     
     return render_template('index.html', 
                          user=user, 
                          stats=stats, 
-                         classes=classes)
+                         classes=classes,
+                         poses_mastered=poses_mastered,
+                         pose_minutes=pose_minutes)
     
 
 @app.route('/login', methods=['GET', 'POST'])
@@ -69,11 +97,7 @@ def login():
         email = request.form['email']
         passwd = request.form['password']
         
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute('SELECT * FROM users WHERE email = %s', (email))
-            user = cursor.fetchone()
-        conn.close()
+        user = repository.get_user_by_email(email)
         
         if user and check_password_hash(user['password'], passwd):
             session['loggedin'] = True
@@ -101,23 +125,14 @@ def signup():
             flash('Please fill out all fields!', 'error')
             return render_template('auth.html', mode='signup')
         
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            # Check if email exists
-            cursor.execute('SELECT id FROM users WHERE email = %s', (email,))
-            if cursor.fetchone():
-                flash('Account already exists with this email!', 'error')
-                return render_template('auth.html', mode='signup')
-            
-            # Insert new user
-            hashed_password = generate_password_hash(password)
-            cursor.execute('''
-                INSERT INTO users (full_name, email, password, created_at) 
-                VALUES (%s, %s, %s, %s)
-            ''', (full_name, email, hashed_password, datetime.now()))
-            conn.commit()
-            
-        conn.close()
+        # Check if email exists
+        if repository.get_user_by_email(email):
+            flash('Account already exists with this email!', 'error')
+            return render_template('auth.html', mode='signup')
+        
+        # Insert new user
+        repository.create_user(full_name, email, generate_password_hash(password))
+        
         flash('Registration successful! Please login.', 'success')
         return redirect(url_for('login'))
     
@@ -139,37 +154,84 @@ def track_practice():
         flash('Please enter valid duration', 'error')
         return redirect(url_for('home'))
         
-    conn = get_db_connection()
-    with conn.cursor() as cursor:
-        cursor.execute('''
-            INSERT INTO practice_sessions (user_id, duration_minutes, session_date) 
-            VALUES (%s, %s, NOW())
-        ''', (session['id'], duration))
-        conn.commit()
-    conn.close()
+    repository.add_practice_session(session['id'], duration)
     
     flash('Practice session recorded!', 'success')
     return redirect(url_for('home'))
+
+@app.route('/telemetry', methods=['POST'])
+def record_telemetry():
+    if 'loggedin' not in session:
+        return jsonify({'status': 'error', 'message': 'Not logged in'}), 401
+
+    # Samples are [timestamp, label, score, reps] rows, one per second
+    samples = (request.get_json(silent=True) or {}).get('samples') or []
+    try:
+        timestamps, labels, scores, reps = zip(*samples)
+        if not KNOWN_LABELS.issuperset(labels):
+            return jsonify({'status': 'error', 'message': 'Unknown pose label'}), 400
+        telemetry_store.append(session['id'], timestamps, labels,
+                               [float('nan') if score is None else score for score in scores], reps)
+    except (TypeError, ValueError):
+        return jsonify({'status': 'error', 'message': 'Invalid samples'}), 400
+
+    # Track the practice session of this user, idle sessions are closed by the expiry timer
+    sessionizer.observe_many(session['id'], timestamps, labels)
+
+    return jsonify({'status': 'success', 'recorded': len(samples)})
+
+@app.route('/classes/<int:class_id>/book', methods=['POST'])
+def book_class(class_id):
+    if 'loggedin' not in session:
+        return jsonify({'status': 'error', 'message': 'Not logged in'}), 401
+
+    try:
+        booking_status = bookings.book(class_id, session['id'])
+    except ClassNotFound as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 404
+    except BookingError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 409
+
+    return jsonify({'status': 'success', 'booking': booking_status})
+
+@app.route('/classes/<int:class_id>/cancel', methods=['POST'])
+def cancel_class(class_id):
+    if 'loggedin' not in session:
+        return jsonify({'status': 'error', 'message': 'Not logged in'}), 401
+
+    try:
+        bookings.cancel(class_id, session['id'])
+    except ClassNotFound as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 404
+    except BookingError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 409
+
+    return jsonify({'status': 'success'})
+
 @app.route('/try_now')
 def try_now():
-    return render_template('CameraButton.html')
+    return pages.response('CameraButton.html')
 
 
 
 @app.route('/About')
 def About():
-    return render_template('About.html')
+    return pages.response('About.html')
 
 
 
 
 @app.route('/watch')
 def Watch():
-    return render_template('Video.html')
+    return pages.response('Video.html')
+
+@app.route('/media/<path:filename>')
+def media(filename):
+    return media_server.response(filename)
 
 @app.route('/Camera')
 def StartCamera():
-    return render_template('CameraButton.html')  # Ensure this matches your HTML filename
+    return pages.response('CameraButton.html')  # Ensure this matches your HTML filename
 
 # Route to start the camera and execute the Python script
 @app.route('/start_camera', methods=['POST'])
@@ -230,47 +292,10 @@ def execute_program(program):
 
 
 
-# MySQL setup queries
-SETUP_QUERIES = [
-  #  """
-   # CREATE TABLE IF NOT EXISTS users (
-    #    id INT AUTO_INCREMENT PRIMARY KEY,
-     #   full_name VARCHAR(100) NOT NULL,
-      #  email VARCHAR(100) UNIQUE NOT NULL,
-       # password VARCHAR(255) NOT NULL,
-        #created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-    #)
-    #""",
-    """
-    CREATE TABLE IF NOT EXISTS practice_sessions (
-        id INT AUTO_INCREMENT PRIMARY KEY,
-        user_id INT NOT NULL,
-        duration_minutes INT NOT NULL,
-        session_date DATETIME DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (user_id) REFERENCES users(id)
-    )
-    """,
-    """
-    CREATE TABLE IF NOT EXISTS yoga_classes (
-        id INT AUTO_INCREMENT PRIMARY KEY,
-        name VARCHAR(100) NOT NULL,
-        instructor VARCHAR(100) NOT NULL,
-        start_time DATETIME NOT NULL,
-        duration_minutes INT NOT NULL,
-        class_type VARCHAR(50) NOT NULL
-    )
-    """
-]
-
+# Create the tables of the repository's schema
 def init_db():
-    conn = get_db_connection()
-    with conn.cursor() as cursor:
-        for query in SETUP_QUERIES:
-            cursor.execute(query)
-    conn.commit()
-    conn.close()
-    app.run(debug=True)
-    
+    repository.init_schema()
+
 #def setCamera():
 if __name__ == '__main__':
     init_db()  # Initialize database tables
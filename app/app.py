@@ -1,11 +1,14 @@
 
-from Flask import Flask, render_template, request, redirect, url_for, flash
-import sqlite3
+from flask import Flask, render_template, request, redirect, url_for, flash
 from werkzeug.security import generate_password_hash
 import re
 import logging
-from datetime import datetime
 import os
+import sys
+
+# The repository module lives next to the main app.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from repository import DatabaseError, create_repository
 
 # Configure logging
 logging.basicConfig(
@@ -17,33 +20,15 @@ logging.basicConfig(
 app = Flask(__name__)
 app.secret_key = 'your_secret_key_here'
 
-# Database path
+# Database path, the local SQLite backend of the shared repository unless DATABASE_URL is set
 DB_PATH = 'users.db'
 
-class DatabaseError(Exception):
-    pass
-
-def get_db_connection():
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
-        return conn
-    except sqlite3.Error as e:
-        logging.error(f"Database connection error: {str(e)}")
-        raise DatabaseError("Could not connect to database")
+repository = create_repository(os.environ.get('DATABASE_URL') or f'sqlite:///{DB_PATH}')
 
 def init_db():
     try:
-        with get_db_connection() as conn:
-            c = conn.cursor()
-            c.execute('''CREATE TABLE IF NOT EXISTS users
-                        (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                         fullname TEXT NOT NULL,
-                         email TEXT UNIQUE NOT NULL,
-                         password TEXT NOT NULL,
-                         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-            conn.commit()
-            logging.info("Database initialized successfully")
+        repository.init_schema()
+        logging.info("Database initialized successfully")
     except Exception as e:
         logging.error(f"Database initialization error: {str(e)}")
         raise
@@ -103,28 +88,19 @@ def signup():
         
         # Try to create user
         try:
-            with get_db_connection() as conn:
-                c = conn.cursor()
-                
-                # Check for existing email
-                c.execute('SELECT email FROM users WHERE email = ?', (email,))
-                if c.fetchone():
-                    flash('Email already registered', 'error')
-                    logging.warning(f"Duplicate email attempt: {email}")
-                    return redirect(url_for('index'))
-                
-                # Hash password and save user
-                hashed_password = generate_password_hash(password)
-                c.execute('''
-                    INSERT INTO users (fullname, email, password, created_at) 
-                    VALUES (?, ?, ?, ?)
-                ''', (fullname, email, hashed_password, datetime.now()))
-                conn.commit()
-                
-                logging.info(f"New user created successfully: {email}")
-                flash('Account created successfully! Please check your email for verification.', 'success')
+            # Check for existing email
+            if repository.get_user_by_email(email):
+                flash('Email already registered', 'error')
+                logging.warning(f"Duplicate email attempt: {email}")
+                return redirect(url_for('index'))
+            
+            # Hash password and save user
+            repository.create_user(fullname, email, generate_password_hash(password))
+            
+            logging.info(f"New user created successfully: {email}")
+            flash('Account created successfully! Please check your email for verification.', 'success')
                 
-        except sqlite3.Error as e:
+        except DatabaseError as e:
             logging.error(f"Database error during user creation: {str(e)}")
             flash('An error occurred while creating your account. Please try again.', 'error')
             return redirect(url_for('index'))
@@ -141,11 +117,8 @@ def debug_users():
         return "Debug mode is not enabled", 403
         
     try:
-        with get_db_connection() as conn:
-            c = conn.cursor()
-            c.execute('SELECT id, fullname, email, created_at FROM users')
-            users = c.fetchall()
-            return render_template('debug.html', users=users)
+        users = repository.list_users()
+        return render_template('debug.html', users=users)
     except Exception as e:
         logging.error(f"Error in debug view: {str(e)}")
         return str(e), 500
@@ -0,0 +1,47 @@
+# asgi.py
+#
+# ASGI entry point of the web tier, started by serve.py.
+#
+# The Flask routes (/, /login, /track_practice and the rest) are served through a2wsgi's WSGIMiddleware. The
+# event loop of the ASGI server owns the sockets, so idle keep-alive connections and slow clients no longer hold
+# a worker thread, and each request runs on a bounded thread pool where the blocking repository calls are made.
+# Keep WEB_THREADS close to the connection pool of the repository, more threads only queue on the database.
+#
+# Native async handlers, e.g. streaming endpoints that should not occupy a thread for their whole lifetime, can
+# be added to ROUTES, they are matched on the path before the request is handed to Flask.
+
+import os
+
+from a2wsgi import WSGIMiddleware
+
+from app import app, repository, sessionizer, telemetry_store
+
+THREADS = int(os.environ.get('WEB_THREADS', 8))
+
+# path -> async def handler(scope, receive, send)
+ROUTES = {}
+
+flask_application = WSGIMiddleware(app, workers=THREADS)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            # The open practice sessions stay in the database, the other workers or the next start close them
+            sessionizer.stop_expiry()
+            telemetry_store.stop_compaction()
+            repository.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    handler = ROUTES.get(scope.get('path'))
+    if handler is not None:
+        return await handler(scope, receive, send)
+    return await flask_application(scope, receive, send)
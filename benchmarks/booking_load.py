@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Booking Load Test
+#
+# Lets many threads book and cancel the seats of a few popular classes at the same time, against the SQLite
+# backend of the repository, and checks afterwards that no class was oversold: the booked rows of every class
+# match its seat counter, never exceed its capacity, and nobody is left on the waitlist of a class with free seats.
+#
+# Usage:
+#     python benchmarks/booking_load.py --users 5000 --classes 4 --capacity 500 --threads 32
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from time import perf_counter
+
+# The repository root, where the modules live.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from booking import BOOKED, WAITLISTED, BookingEngine
+from repository import create_repository
+
+
+def setupDatabase(path, users, classes, capacity):
+    '''
+    This function creates a database with users and classes open for booking.
+    Args:
+        path: The path of the SQLite database file.
+        users: The number of users.
+        classes: The number of classes.
+        capacity: The capacity of every class.
+    Returns:
+        repository: The repository of the database.
+        class_ids: The ids of the classes.
+    '''
+
+    repository = create_repository(f'sqlite:///{path}', pool_size=64)
+    repository.init_schema()
+    repository.backend.execute_many('insert_user', [(f'User {user}', f'user{user}@example.com', '-', datetime.now())
+                                                    for user in range(users)])
+    engine = BookingEngine(repository)
+    class_ids = []
+    for index in range(classes):
+        class_id = repository.create_class(f'Class {index}', 'Instructor', datetime.now() + timedelta(days=1), 60,
+                                           'Hatha')
+        engine.open_class(class_id, capacity)
+        class_ids.append(class_id)
+
+    return repository, class_ids
+
+
+def runConcurrently(threads, function, items):
+    '''
+    This function calls a function with every item from a pool of threads.
+    Args:
+        threads: The number of threads.
+        function: The function to call.
+        items: The argument tuples of the calls.
+    Returns:
+        results: The results of the calls, in the order of the items.
+        elapsed: The wall-clock time of all the calls in seconds.
+    '''
+
+    time1 = perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(lambda item: function(*item), items))
+    return results, perf_counter() - time1
+
+
+def checkClasses(repository, engine, class_ids):
+    '''
+    This function checks that no class is oversold.
+    Args:
+        repository: The repository of the database.
+        engine: The BookingEngine.
+        class_ids: The ids of the classes.
+    Returns:
+        problems: A list of descriptions of the inconsistencies found, empty if there are none.
+    '''
+
+    problems = []
+    for class_id in class_ids:
+        seats = engine.availability(class_id)
+        booked = repository.backend.fetch_one('count_bookings', (class_id, BOOKED))['bookings']
+        if booked != seats['booked']:
+            problems.append(f'class {class_id}: {booked} booked rows but a seat counter of {seats["booked"]}')
+        if booked > seats['capacity']:
+            problems.append(f'class {class_id}: {booked} booked seats for a capacity of {seats["capacity"]}')
+        if seats['waitlisted'] and booked < seats['capacity']:
+            problems.append(f'class {class_id}: {seats["waitlisted"]} waiting while {booked} of '
+                            f'{seats["capacity"]} seats are booked')
+    return problems
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Load test the class booking engine.')
+    parser.add_argument('--users', type=int, default=5000, help='number of users booking')
+    parser.add_argument('--classes', type=int, default=4, help='number of classes')
+    parser.add_argument('--capacity', type=int, default=500, help='capacity of every class')
+    parser.add_argument('--threads', type=int, default=32, help='number of concurrent clients')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        repository, class_ids = setupDatabase(os.path.join(directory, 'booking.db'), args.users, args.classes,
+                                              args.capacity)
+        engine = BookingEngine(repository)
+
+        # Every user tries to book every class, in random order.
+        requests = [(class_id, user + 1) for class_id in class_ids for user in range(args.users)]
+        random.shuffle(requests)
+        statuses, elapsed = runConcurrently(args.threads, engine.book, requests)
+        print(f'{len(requests)} bookings in {elapsed:.2f}s ({len(requests) / elapsed:.0f}/s), '
+              f'{statuses.count(BOOKED)} booked, {statuses.count(WAITLISTED)} waitlisted')
+
+        # Half of the booked users cancel at once, their seats go to the waitlist.
+        cancels = random.sample([request for request, status in zip(requests, statuses) if status == BOOKED],
+                                statuses.count(BOOKED) // 2)
+        promoted, elapsed = runConcurrently(args.threads, engine.cancel, cancels)
+        print(f'{len(cancels)} cancellations in {elapsed:.2f}s ({len(cancels) / elapsed:.0f}/s), '
+              f'{sum(user is not None for user in promoted)} users promoted from the waitlist')
+
+        problems = checkClasses(repository, engine, class_ids)
+        repository.close()
+
+    for problem in problems:
+        print(problem)
+    print('No class was oversold.' if not problems else 'Overselling detected!')
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Feedback Scheduler Benchmark
+#
+# Runs a loop that stands in for the vision loop: every frame does a fixed amount of numpy work calibrated to the time
+# of an inference, then reports a pose label and a rep count, with a new pose every few seconds and a rep every
+# second. The loop runs three times: without feedback, with the sinks called in the loop, and with the
+# FeedbackScheduler. The sinks are a console sink, the speech stub, a web push that takes half a second and one that
+# hangs for ten seconds. The runs without feedback and with the scheduler alternate over short rounds, which of the
+# two goes first alternating too, and every scheduler round is compared with the round without feedback next to it, so
+# that a change of the machine speed during the benchmark does not count as overhead. The benchmark prints the frame
+# times of every run and exits with 1 when the scheduler raised the median over the rounds of the p50 or p99 frame
+# time by more than the tolerance, when a frame stalled while the hanging sink was busy, or when the events did not
+# reach the sinks.
+#
+# Usage:
+#     python benchmarks/feedback.py --frames 600 --work-ms 30
+
+import argparse
+import io
+import os
+import sys
+from time import perf_counter, sleep
+
+import numpy as np
+
+# The repository root, where the modules live.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from FeedbackScheduler import ConsoleSink, FeedbackEvent, FeedbackScheduler, SpeechSink
+
+# The time of an event of the slow web push sink.
+SLOW_PUSH_SECONDS = 0.5
+
+POSES = ('T Pose', 'Unknown Pose', 'Warrior II Pose', 'Unknown Pose', 'Tree Pose', 'Unknown Pose')
+
+
+class SlowSink:
+    '''
+    A sink that takes a fixed time per event, like a web push over a slow network, and records when it started
+    the first one.
+    Args:
+        seconds: The time an event takes.
+    '''
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.min_interval = 0.0
+        self.started = None
+
+    def send(self, event):
+        if self.started is None:
+            self.started = perf_counter()
+        sleep(self.seconds)
+
+
+def calibrateWork(work_ms):
+    '''
+    This function finds the number of matrix products that take work_ms milliseconds.
+    Args:
+        work_ms: The time of the work of a frame in milliseconds.
+    Returns:
+        matrix: The matrix to multiply.
+        count: The number of products.
+    '''
+
+    matrix = np.random.default_rng(0).random((192, 192))
+    time1 = perf_counter()
+    for _ in range(50):
+        matrix @ matrix
+    return matrix, max(int(work_ms / 1000 / ((perf_counter() - time1) / 50)), 1)
+
+
+def runLoop(frames, fps, work, mode, sinks):
+    '''
+    This function runs the stand-in vision loop.
+    Args:
+        frames: The number of frames.
+        fps: The frame rate the labels and reps are generated for.
+        work: The (matrix, count) of the work of a frame.
+        mode: 'none' without feedback, 'inline' to call the sinks in the loop, 'scheduler' for the
+              FeedbackScheduler.
+        sinks: The sinks.
+    Returns:
+        durations: The time of every frame in seconds.
+        ends: The perf_counter time every frame ended at.
+        stats: The stats of the scheduler, None for the other modes.
+    '''
+
+    matrix, count = work
+    scheduler = FeedbackScheduler(sinks) if mode == 'scheduler' else None
+    last_label, last_reps = None, 0
+    durations, ends = [], []
+    for frame_index in range(frames):
+        time1 = perf_counter()
+
+        # The inference.
+        for _ in range(count):
+            matrix @ matrix
+
+        # A new pose every 2 seconds and a rep every second.
+        label = POSES[frame_index // (2 * fps) % len(POSES)]
+        reps = frame_index // fps
+        if mode == 'scheduler':
+            scheduler.updatePose(label)
+            scheduler.updateReps(reps, 'left_curl')
+        elif mode == 'inline':
+            events = []
+            if label != last_label and label != 'Unknown Pose':
+                events.append(FeedbackEvent('pose', label, f'{label} achieved', 0))
+            if reps > last_reps:
+                events.append(FeedbackEvent('rep', 'left_curl', f'left curl rep {reps}', 0))
+            for event in events:
+                for sink in sinks:
+                    sink.send(event)
+        last_label, last_reps = label, reps
+
+        ends.append(perf_counter())
+        durations.append(ends[-1] - time1)
+
+    stats = None
+    if scheduler:
+        scheduler.close(timeout=1.0)
+        stats = scheduler.stats
+    return np.array(durations), np.array(ends), stats
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Check that slow feedback sinks do not slow the vision loop down.')
+    parser.add_argument('--frames', type=int, default=600, help='number of frames of the runs without feedback and '
+                                                                 'with the scheduler')
+    parser.add_argument('--rounds', type=int, default=10, help='number of rounds the frames are split into')
+    parser.add_argument('--work-ms', type=float, default=30, help='time of the inference of a frame')
+    parser.add_argument('--inline-frames', type=int, default=90,
+                        help='number of frames of the run with the sinks called in the loop, which is slow')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='share the scheduler may raise the p50 and p99 frame times by')
+    args = parser.parse_args()
+
+    fps = 30
+    work = calibrateWork(args.work_ms)
+
+    # The inline run, where the hanging sink would stall the loop for minutes, so it is left out.
+    inline = runLoop(args.inline_frames, fps, work, 'inline',
+                     [ConsoleSink(io.StringIO()), SpeechSink(), SlowSink(SLOW_PUSH_SECONDS)])
+
+    # The runs without feedback and with the scheduler, alternating.
+    runs, stalls, problems = {'none': [], 'scheduler': []}, [], []
+    for round_index in range(args.rounds):
+        hanging = SlowSink(10)
+        sinks = {'none': [], 'scheduler': [ConsoleSink(io.StringIO()), SpeechSink(), SlowSink(SLOW_PUSH_SECONDS),
+                                           hanging]}
+        for mode in ('none', 'scheduler') if round_index % 2 == 0 else ('scheduler', 'none'):
+            runs[mode].append(runLoop(args.frames // args.rounds, fps, work, mode, sinks[mode]))
+
+        # The frames that ended while the hanging sink was busy.
+        durations, ends, _ = runs['scheduler'][-1]
+        if hanging.started is None:
+            problems.append('The hanging sink got no event')
+        else:
+            stalls.append(durations[ends > hanging.started])
+
+    durations = {'none': np.concatenate([run[0] for run in runs['none']]),
+                 'inline': inline[0],
+                 'scheduler': np.concatenate([run[0] for run in runs['scheduler']])}
+    print(f'{"feedback":>10} {"frames":>7} {"p50 ms":>8} {"p99 ms":>8} {"max ms":>8}')
+    for mode, frame_durations in durations.items():
+        frame_durations = frame_durations * 1000
+        print(f'{mode:>10} {len(frame_durations):>7} {np.percentile(frame_durations, 50):>8.2f} '
+              f'{np.percentile(frame_durations, 99):>8.2f} {frame_durations.max():>8.2f}')
+
+    # The sends of every sink over all the rounds.
+    totals = {}
+    for _, _, stats in runs['scheduler']:
+        for index, counts in enumerate(stats['sinks']):
+            total = totals.setdefault(index, dict(counts, sent=0, dropped=0, failed=0))
+            for key in ('sent', 'dropped', 'failed'):
+                total[key] += counts[key]
+    for counts in totals.values():
+        print(f'{counts["sink"]:>12}: {counts["sent"]} sent, {counts["dropped"]} dropped, {counts["failed"]} failed')
+
+    # The scheduler must leave the frame times as they are without feedback, round by round.
+    for percentile in (50, 99):
+        baselines = np.array([np.percentile(run[0], percentile) for run in runs['none']])
+        overheads = np.array([np.percentile(run[0], percentile) for run in runs['scheduler']]) - baselines
+        overhead, share = np.median(overheads), np.median(overheads / baselines)
+        print(f'Scheduler p{percentile} overhead {overhead * 1000:+.2f} ms per frame ({share:+.1%}), median of '
+              f'{args.rounds} rounds')
+        if share > args.tolerance:
+            problems.append(f'The scheduler raised the p{percentile} frame time by {share:.1%}, over '
+                            f'{args.tolerance:.0%}')
+
+    # The hanging sink must not hold up a frame, not even for half the time of the slow push.
+    if stalls:
+        longest = np.concatenate(stalls).max()
+        print(f'{sum(map(len, stalls))} frames while the hanging sink was busy, the longest {longest * 1000:.2f} ms')
+        if longest > SLOW_PUSH_SECONDS / 2:
+            problems.append(f'A frame took {longest * 1000:.0f} ms while the hanging sink was busy')
+
+    # The events must still reach the sinks that keep up.
+    for counts in list(totals.values())[:3]:
+        if not counts['sent']:
+            problems.append(f'{counts["sink"]} got no event')
+
+    for problem in problems:
+        print(problem)
+    print('The scheduler left the loop unaffected.' if not problems else 'The loop was AFFECTED!')
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Frame Ring Benchmark
+#
+# Sends 1280x960 frames from a producer process to the benchmark process, once through a multiprocessing queue
+# (every frame is pickled, copied through a pipe and unpickled) and once through a FrameRing (the producer writes
+# into a shared memory slot and the consumer gets a view of it). The consumer reads every frame and sums one row
+# of it, and the benchmark prints the frame rate, the latency from publishing to reading and whether the frames
+# the consumer saw share memory with the ring, that is whether they crossed the process boundary without a copy.
+#
+# Usage:
+#     python benchmarks/frame_ring.py --frames 500
+
+import argparse
+import multiprocessing
+import os
+import sys
+from time import perf_counter, sleep, time
+
+import numpy as np
+
+# The repository root, where the modules live.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from FrameRing import FrameRing
+
+FRAME_SHAPE = (960, 1280, 3)
+
+
+def makeFrames(count):
+    '''
+    This function creates a few different frames to send in turn, so the producer does not measure the camera.
+    Args:
+        count: The number of frames.
+    Returns:
+        frames: A list of uint8 arrays of FRAME_SHAPE.
+    '''
+
+    generator = np.random.default_rng(0)
+    return [generator.integers(0, 256, FRAME_SHAPE, dtype=np.uint8) for _ in range(count)]
+
+
+def produceQueue(queue, frames):
+    '''
+    This function sends the frames with their sending time through a multiprocessing queue.
+    Args:
+        queue: The queue to send through.
+        frames: The number of frames to send.
+    '''
+
+    images = makeFrames(4)
+    for index in range(frames):
+        queue.put((time(), images[index % len(images)]))
+    queue.put(None)
+
+
+def produceRing(name, frames):
+    '''
+    This function writes the frames into the slots of a FrameRing, waiting for the consumer to read them.
+    Args:
+        name: The name of the ring.
+        frames: The number of frames to write.
+    '''
+
+    images = makeFrames(4)
+    ring = FrameRing(name)
+    for index in range(frames):
+        ring.write(images[index % len(images)])
+    ring.close()
+    ring.release()
+
+
+def consumeQueue(frames):
+    '''
+    This function reads every frame of a producer process through a multiprocessing queue.
+    Args:
+        frames: The number of frames to send.
+    Returns:
+        fps: The number of frames read per second.
+        latencies: The seconds from sending to reading of every frame.
+    '''
+
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue(maxsize=8)
+    process = context.Process(target=produceQueue, args=(queue, frames))
+    process.start()
+
+    latencies = []
+    time1 = perf_counter()
+    while True:
+        message = queue.get()
+        if message is None:
+            break
+        sent, frame = message
+        frame[480].sum()
+        latencies.append(time() - sent)
+    fps = len(latencies) / (perf_counter() - time1)
+    process.join()
+    return fps, latencies
+
+
+def consumeRing(frames, slots):
+    '''
+    This function reads every frame of a producer process through a FrameRing.
+    Args:
+        frames: The number of frames to write.
+        slots: The number of slots of the ring.
+    Returns:
+        fps: The number of frames read per second.
+        latencies: The seconds from publishing to reading of every frame.
+        zero_copy: Whether every frame read was a view of the shared memory of the ring.
+    '''
+
+    ring = FrameRing(slots=slots, frame_shape=FRAME_SHAPE)
+    ring.attachConsumer(0)
+    context = multiprocessing.get_context('spawn')
+    process = context.Process(target=produceRing, args=(ring.name, frames))
+    process.start()
+
+    latencies, zero_copy = [], True
+    sequence = 0
+    time1 = None
+    while sequence < frames:
+        if ring.head <= sequence:
+            sleep(0.0001)
+            continue
+        if time1 is None:
+            time1 = perf_counter()
+        frame, published = ring.read(sequence)
+        frame[480].sum()
+        latencies.append(time() - published)
+        zero_copy &= np.shares_memory(frame, ring._data) and ring.intact(sequence)
+        ring.advance(0, sequence)
+        sequence += 1
+    fps = (len(latencies) - 1) / (perf_counter() - time1)
+    process.join()
+    ring.release()
+    return fps, latencies, zero_copy
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Compare a multiprocessing queue with the shared memory FrameRing.')
+    parser.add_argument('--frames', type=int, default=500, help='number of frames to send')
+    parser.add_argument('--slots', type=int, default=8, help='number of slots of the ring')
+    args = parser.parse_args()
+
+    frame_mb = np.prod(FRAME_SHAPE) / 1e6
+    queue_fps, queue_latencies = consumeQueue(args.frames)
+    ring_fps, ring_latencies, zero_copy = consumeRing(args.frames, args.slots)
+
+    print(f'{args.frames} frames of {FRAME_SHAPE[1]}x{FRAME_SHAPE[0]} ({frame_mb:.1f} MB)')
+    print(f'{"transport":>10} {"fps":>8} {"MB/s":>8} {"p50 ms":>8} {"p99 ms":>8}')
+    for name, fps, latencies in (('queue', queue_fps, queue_latencies), ('ring', ring_fps, ring_latencies)):
+        latencies = np.array(latencies) * 1000
+        print(f'{name:>10} {fps:>8.0f} {fps * frame_mb:>8.0f} {np.percentile(latencies, 50):>8.2f} '
+              f'{np.percentile(latencies, 99):>8.2f}')
+    print(f'The ring is {ring_fps / queue_fps:.1f}x faster, '
+          f'frames read {"without a copy" if zero_copy else "WITH A COPY"}')
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Overlay Benchmark
+#
+# Runs the pose detection on the frames of a video and times, on every frame with a person, the overlay of the curl
+# counter drawn the old way (mp_drawing.draw_landmarks with new DrawingSpecs, the full precision angles and the
+# status box drawn label by label) and with the OverlayRenderer (the prebuilt SkeletonRenderer and StatusPanel),
+# next to the time of pose.process itself.
+#
+# Usage:
+#     python benchmarks/overlay.py media/exercising.mp4 --frames 200
+
+import argparse
+import os
+import sys
+from time import perf_counter
+
+import cv2
+import numpy as np
+
+# The repository root, where the modules live.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from MediaPipeSetCounter import JointCounter
+from OverlayRenderer import SkeletonRenderer, StatusPanel, formatAngle
+from RealTimePoseDetection import loadMediapipe
+
+
+def drawOld(image, results, counter, angles, mp_pose, mp_drawing):
+    '''
+    This function draws the overlay of the curl counter the way the loop drew it before the OverlayRenderer.
+    Args:
+        image: The BGR frame to draw on.
+        results: The output of pose.process.
+        counter: The JointCounter of the frame.
+        angles: The angles of the joints of the counter.
+        mp_pose: The mediapipe pose module.
+        mp_drawing: The mediapipe drawing utils module.
+    '''
+
+    size = np.array([image.shape[1], image.shape[0]])
+    points = np.array([(landmark.x, landmark.y) for landmark in results.pose_landmarks.landmark])
+    for angle, mid in zip(angles, counter.mid):
+        cv2.putText(image, str(angle), tuple(np.multiply(points[mid], size).astype(int)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2, cv2.LINE_AA)
+
+    cv2.rectangle(image, (0, 0), (300, 20 + 30 * len(counter.names)), (245, 117, 16), -1)
+    cv2.putText(image, 'REPS   STAGE', (120, 14), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1, cv2.LINE_AA)
+    for row, (name, reps, stage) in enumerate(zip(counter.names, counter.counters, counter.stages)):
+        y = 42 + 30 * row
+        cv2.putText(image, name, (10, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1, cv2.LINE_AA)
+        cv2.putText(image, f'{reps:>3} {stage or ""}', (120, y), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2,
+                    cv2.LINE_AA)
+
+    mp_drawing.draw_landmarks(image, results.pose_landmarks, mp_pose.POSE_CONNECTIONS,
+                              mp_drawing.DrawingSpec(color=(245, 117, 66), thickness=2, circle_radius=2),
+                              mp_drawing.DrawingSpec(color=(245, 66, 230), thickness=2, circle_radius=2))
+
+
+def drawNew(image, results, counter, angles, skeleton, panel):
+    '''
+    This function draws the overlay of the curl counter the way the loop draws it with the OverlayRenderer.
+    Args:
+        image: The BGR frame to draw on.
+        results: The output of pose.process.
+        counter: The JointCounter of the frame.
+        angles: The angles of the joints of the counter.
+        skeleton: The SkeletonRenderer of the loop.
+        panel: The StatusPanel of the loop.
+    '''
+
+    landmarks = np.array([(landmark.x, landmark.y, landmark.z, landmark.visibility)
+                          for landmark in results.pose_landmarks.landmark])
+    landmarks[:, :2] *= (image.shape[1], image.shape[0])
+    skeleton.draw(image, landmarks)
+    for angle, mid in zip(angles, counter.mid):
+        cv2.putText(image, formatAngle(angle), tuple(landmarks[mid, :2].astype(int)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2, cv2.LINE_AA)
+    panel.draw(image, [f'{reps:>3} {stage or ""}' for reps, stage in zip(counter.counters, counter.stages)])
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Time the curl counter overlay against the pose detection.')
+    parser.add_argument('video', nargs='?', default=os.path.join(ROOT, 'media', 'exercising.mp4'),
+                        help='path of the video to run on')
+    parser.add_argument('--frames', type=int, default=200, help='largest number of frames to run on')
+    args = parser.parse_args()
+
+    mp_pose, mp_drawing = loadMediapipe()
+    counter = JointCounter()
+    skeleton = SkeletonRenderer(connection_color=(245, 66, 230), landmark_color=(245, 117, 66))
+    panel = StatusPanel(counter.names, header='REPS   STAGE')
+
+    timings = {'pose.process': [], 'old overlay': [], 'new overlay': []}
+    video = cv2.VideoCapture(args.video)
+    with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
+        while len(timings['pose.process']) < args.frames:
+            ok, frame = video.read()
+            if not ok:
+                break
+
+            time1 = perf_counter()
+            results = pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            time2 = perf_counter()
+            if not results.pose_landmarks:
+                continue
+            timings['pose.process'].append(time2 - time1)
+
+            points = np.array([(landmark.x, landmark.y) for landmark in results.pose_landmarks.landmark])
+            angles, _ = counter.update(points)
+
+            for name, draw, extra in (('old overlay', drawOld, (mp_pose, mp_drawing)),
+                                      ('new overlay', drawNew, (skeleton, panel))):
+                image = frame.copy()
+                time1 = perf_counter()
+                draw(image, results, counter, angles, *extra)
+                timings[name].append(perf_counter() - time1)
+    video.release()
+
+    inference = np.median(timings['pose.process'])
+    print(f'{len(timings["pose.process"])} frames with a person of {args.video}')
+    print(f'{"":>14} {"p50 ms":>8} {"p99 ms":>8} {"of inference":>13}')
+    for name, durations in timings.items():
+        durations = np.array(durations) * 1000
+        print(f'{name:>14} {np.percentile(durations, 50):>8.2f} {np.percentile(durations, 99):>8.2f} '
+              f'{np.median(durations) / 1000 / inference:>12.1%}')
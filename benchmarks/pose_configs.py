@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Pose Model Configuration Evaluation
+#
+# The scripts use model_complexity=2 with min_detection_confidence=0.3 for images, 1 and 0.5 for video and 0 and
+# 0.5 for some tree pose images, without knowing what each setting costs or buys. This harness runs every
+# combination of model_complexity and min_detection_confidence over
+#
+# * the labelled reference images of media/ (the label comes from the file name, see PoseLibrary), measuring
+#   how many are detected and how many classifyPose labels correctly (cobra poses must come out as Unknown Pose),
+# * a recorded video such as media/exercising.mp4 at the 640px height of the live loops, measuring the detection
+#   rate, the landmark jitter and the latency and throughput of pose.process,
+#
+# and prints one row per configuration. Rows marked * are on the Pareto front: no other configuration is both at
+# least as accurate and at least as fast. Pick the cheapest configuration on the front that meets the accuracy
+# bar of a deployment tier.
+#
+# Usage:
+#     python benchmarks/pose_configs.py --video media/exercising.mp4 --max-frames 300
+
+import argparse
+import itertools
+import os
+import sys
+from time import perf_counter
+
+import cv2
+import numpy as np
+
+# The repository root, where the modules live.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PoseLibrary import findReferenceImages
+from RealTimePoseDetection import classifyPose, loadMediapipe
+
+# The labels classifyPose knows, every other reference pose is expected to be classified as Unknown Pose.
+KNOWN_LABELS = ('Warrior II Pose', 'T Pose', 'Tree Pose')
+
+
+def toPixelLandmarks(results, width, height):
+    '''
+    This function converts the landmarks of a pose.process result into an array in pixel coordinates.
+    Args:
+        results: The output of pose.process.
+        width: The width of the image.
+        height: The height of the image.
+    Returns:
+        landmarks: An array of shape (33, 4), NaN if no person was detected.
+    '''
+
+    if not results.pose_landmarks:
+        return np.full((33, 4), np.nan, dtype=np.float32)
+    return np.array([(landmark.x * width, landmark.y * height, landmark.z * width, landmark.visibility)
+                     for landmark in results.pose_landmarks.landmark], dtype=np.float32)
+
+
+def evaluateImages(mp_pose, images, model_complexity, min_detection_confidence):
+    '''
+    This function measures the detection rate and the classification accuracy on the labelled images.
+    Args:
+        mp_pose: The mediapipe pose solution.
+        images: A list of (path, label) tuples.
+        model_complexity: The model_complexity of the configuration.
+        min_detection_confidence: The min_detection_confidence of the configuration.
+    Returns:
+        result: A dictionary with the image 'detected' rate, the classification 'accuracy' and the mean
+                'image_ms' latency.
+    '''
+
+    detected, correct, latencies = 0, 0, []
+    with mp_pose.Pose(static_image_mode=True, model_complexity=model_complexity,
+                      min_detection_confidence=min_detection_confidence) as pose:
+        for path, label in images:
+            image = cv2.imread(path)
+            rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            time1 = perf_counter()
+            results = pose.process(rgb)
+            latencies.append(perf_counter() - time1)
+
+            landmarks = toPixelLandmarks(results, image.shape[1], image.shape[0])
+            predicted = 'Unknown Pose'
+            if not np.isnan(landmarks[0, 0]):
+                detected += 1
+                _, predicted = classifyPose(landmarks[:, :3], image.copy(), display=False)
+            correct += predicted == (label if label in KNOWN_LABELS else 'Unknown Pose')
+
+    return {'detected': detected / len(images), 'accuracy': correct / len(images),
+            'image_ms': float(np.mean(latencies)) * 1000}
+
+
+def evaluateVideo(mp_pose, path, model_complexity, min_detection_confidence, height=640, max_frames=None):
+    '''
+    This function measures the latency, throughput, detection rate and landmark jitter on a video.
+    Args:
+        mp_pose: The mediapipe pose solution.
+        path: The path of the video.
+        model_complexity: The model_complexity of the configuration.
+        min_detection_confidence: The min_detection_confidence of the configuration.
+        height: The height the frames are resized to, like the live loops do.
+        max_frames: The number of frames to process, all frames by default.
+    Returns:
+        result: A dictionary with the frame latency 'p50_ms' and 'p95_ms', the throughput 'fps', the
+                'video_detected' rate and the 'jitter'.
+    '''
+
+    video = cv2.VideoCapture(path)
+    latencies, landmarks = [], []
+    with mp_pose.Pose(static_image_mode=False, model_complexity=model_complexity,
+                      min_detection_confidence=min_detection_confidence) as pose:
+        while max_frames is None or len(latencies) < max_frames:
+            ok, frame = video.read()
+            if not ok:
+                break
+            frame_height, frame_width, _ = frame.shape
+            frame = cv2.resize(frame, (int(frame_width * (height / frame_height)), height))
+            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+            time1 = perf_counter()
+            results = pose.process(rgb)
+            latencies.append(perf_counter() - time1)
+            landmarks.append(toPixelLandmarks(results, frame.shape[1], height))
+    video.release()
+
+    # The jitter is the median second difference of the visible landmark positions between consecutive frames,
+    # in percent of the frame height. Real motion is smooth, so this mostly measures frame-to-frame noise.
+    landmarks = np.array(landmarks)
+    second_difference = landmarks[2:, :, :2] - 2 * landmarks[1:-1, :, :2] + landmarks[:-2, :, :2]
+    visible = (landmarks[2:, :, 3] > 0.5) & (landmarks[1:-1, :, 3] > 0.5) & (landmarks[:-2, :, 3] > 0.5)
+    distances = np.linalg.norm(second_difference, axis=-1)[visible]
+    latencies = np.array(latencies) * 1000
+
+    return {
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'fps': 1000 / float(np.mean(latencies)),
+        'video_detected': float(np.mean(~np.isnan(landmarks[:, 0, 0]))),
+        'jitter': float(np.median(distances)) / height * 100 if len(distances) else float('nan'),
+    }
+
+
+def paretoFront(rows):
+    '''
+    This function marks the configurations that no other configuration beats on both accuracy and latency.
+    Args:
+        rows: A list of result dictionaries with 'accuracy' and 'p50_ms'.
+    Returns:
+        front: A list of booleans, true for the rows on the Pareto front.
+    '''
+
+    return [not any(other['accuracy'] >= row['accuracy'] and other['p50_ms'] <= row['p50_ms']
+                    and (other['accuracy'] > row['accuracy'] or other['p50_ms'] < row['p50_ms'])
+                    for other in rows)
+            for row in rows]
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Compare the accuracy and speed of the pose model configurations.')
+    parser.add_argument('--images', default=os.path.join(ROOT, 'media'), help='folder of the labelled images')
+    parser.add_argument('--video', default=os.path.join(ROOT, 'media', 'exercising.mp4'), help='recorded video')
+    parser.add_argument('--complexities', type=int, nargs='+', default=[0, 1, 2])
+    parser.add_argument('--confidences', type=float, nargs='+', default=[0.3, 0.5, 0.7])
+    parser.add_argument('--max-frames', type=int, default=None, help='number of video frames per configuration')
+    args = parser.parse_args()
+
+    mp_pose, _ = loadMediapipe()
+    images = findReferenceImages(args.images)
+
+    rows = []
+    for model_complexity, min_detection_confidence in itertools.product(args.complexities, args.confidences):
+        try:
+            row = {'complexity': model_complexity, 'confidence': min_detection_confidence}
+            row.update(evaluateImages(mp_pose, images, model_complexity, min_detection_confidence))
+            row.update(evaluateVideo(mp_pose, args.video, model_complexity, min_detection_confidence,
+                                     max_frames=args.max_frames))
+            rows.append(row)
+        except Exception as e:
+            # mediapipe downloads the lite and heavy models on first use, which fails without network access.
+            print(f'Skipping model_complexity={model_complexity}: {e}')
+
+    print(f'\n  {"model":>5} {"conf":>5} {"accuracy":>8} {"img det":>7} {"img ms":>7} {"vid det":>7} '
+          f'{"p50 ms":>7} {"p95 ms":>7} {"fps":>6} {"jitter %":>8}')
+    for row, on_front in sorted(zip(rows, paretoFront(rows)), key=lambda item: item[0]['p50_ms']):
+        print(f'{"*" if on_front else " "} {row["complexity"]:>5} {row["confidence"]:>5.2f} {row["accuracy"]:>8.0%} '
+              f'{row["detected"]:>7.0%} {row["image_ms"]:>7.1f} {row["video_detected"]:>7.0%} '
+              f'{row["p50_ms"]:>7.1f} {row["p95_ms"]:>7.1f} {row["fps"]:>6.1f} {row["jitter"]:>8.3f}')
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Pose Sequence Benchmark
+#
+# Generates the label streams of many users going through the flows of PoseSequence at 30 fps: every pose is held
+# for 2 to 6 seconds and the moves between them take 0.5 to 1.5 seconds of 'Unknown Pose', and the classifier
+# gives a wrong label on a share of the frames. All the users are decoded together by one FlowRecognizer, and the
+# benchmark prints the time of a frame for all of them, how many frames have the wrong pose before and after the
+# decoding, how many of the flows were recognized and how far the transition timings are from the true ones.
+#
+# Usage:
+#     python benchmarks/pose_sequence.py --users 1000 --seconds 60
+
+import argparse
+import os
+import sys
+from time import perf_counter
+
+import numpy as np
+
+# The repository root, where the modules live.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PoseSequence import FLOWS, POSE_LABELS, FlowRecognizer
+
+
+def makeStream(frames, fps, generator, noise):
+    '''
+    This function generates the labels of one user doing flows one after the other.
+    Args:
+        frames: The number of frames.
+        fps: The frame rate.
+        generator: The random generator.
+        noise: The share of frames given a random label.
+    Returns:
+        truth: An array of shape (frames,) of the true label indexes.
+        observed: An array of shape (frames,) of the label indexes the classifier gives.
+        transitions: A list of the (from, to, start, end) frame indexes of the true transitions.
+        holds: The list of the poses held, in order.
+    '''
+
+    truth = np.zeros(frames, dtype=np.intp)
+    transitions, holds, frame, previous = [], [], 0, None
+    while True:
+        poses = FLOWS[list(FLOWS)[generator.integers(len(FLOWS))]]
+        # Flows follow each other on their shared first and last pose.
+        for pose in poses[1:] if previous == poses[0] else poses:
+            if previous is not None:
+                move = int(generator.uniform(0.5, 1.5) * fps)
+                transitions.append((previous, pose, frame, frame + move))
+                frame += move
+            hold = int(generator.uniform(2, 6) * fps)
+            truth[frame:frame + hold] = POSE_LABELS.index(pose)
+            frame += hold
+            previous = pose
+            holds.append(pose)
+            if frame >= frames:
+                return truth, _observe(truth, generator, noise), [t for t in transitions if t[3] < frames], holds
+
+
+def _observe(truth, generator, noise):
+    # Replace a share of the labels with random ones.
+    observed = truth.copy()
+    wrong = generator.random(len(truth)) < noise
+    observed[wrong] = generator.integers(len(POSE_LABELS), size=wrong.sum())
+    return observed
+
+
+def countFlows(holds):
+    '''
+    This function counts the flows completed in a sequence of poses held, like FlowTracker finds them.
+    Args:
+        holds: The list of the poses held, in order.
+    Returns:
+        flows: The number of flows completed.
+    '''
+
+    return sum(tuple(holds[end - len(poses):end]) == poses
+               for end in range(1, len(holds) + 1) for poses in FLOWS.values())
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Time and check the flow recognition of many users at once.')
+    parser.add_argument('--users', type=int, default=1000, help='number of users decoded together')
+    parser.add_argument('--seconds', type=float, default=60, help='length of the streams in seconds')
+    parser.add_argument('--noise', type=float, default=0.2, help='share of frames with a random label')
+    parser.add_argument('--lookback', type=int, default=15, help='number of frames a state is committed after')
+    args = parser.parse_args()
+
+    fps = 30
+    frames = int(args.seconds * fps)
+    generator = np.random.default_rng(0)
+    streams = [makeStream(frames, fps, generator, args.noise) for _ in range(args.users)]
+    truth = np.array([stream[0] for stream in streams])
+    observed = np.array([stream[1] for stream in streams])
+    labels = [[POSE_LABELS[label] for label in column] for column in observed.T]
+
+    recognizer = FlowRecognizer(args.users, args.lookback)
+    events, durations = [], []
+    for frame_index in range(frames):
+        time1 = perf_counter()
+        events.extend(recognizer.update(labels[frame_index], frame_index / fps))
+        durations.append(perf_counter() - time1)
+    events.extend(recognizer.finish())
+
+    # The decoded pose of every frame, from the holds.
+    decoded = np.zeros_like(truth)
+    for user, event in events:
+        if event['event'] == 'pose':
+            start, end = round(event['start'] * fps), round(event['end'] * fps)
+            decoded[user, start:end + 1] = POSE_LABELS.index(event['pose'])
+
+    # Pair every true transition with the decoded transition between the same poses closest to it.
+    decoded_transitions = {}
+    for user, event in events:
+        if event['event'] == 'transition':
+            decoded_transitions.setdefault(user, []).append(event)
+    errors, found = [], 0
+    for user, stream in enumerate(streams):
+        for previous, pose, start, end in stream[2]:
+            candidates = [event for event in decoded_transitions.get(user, [])
+                          if (event['from'], event['to']) == (previous, pose)
+                          and abs(event['end'] * fps - end) < fps]
+            if candidates:
+                found += 1
+                event = min(candidates, key=lambda event: abs(event['end'] * fps - end))
+                errors.append(abs(event['end'] - event['start'] - (end - start) / fps))
+
+    true_flows = sum(countFlows(stream[3]) for stream in streams)
+    recognized = sum(event['event'] == 'flow' for _, event in events)
+    true_transitions = sum(len(stream[2]) for stream in streams)
+    durations = np.array(durations[args.lookback:]) * 1000
+    print(f'{args.users} users, {frames} frames at {fps} fps, {args.noise:.0%} of the labels random')
+    print(f'Frame of all users: p50 {np.percentile(durations, 50):.2f} ms, p99 {np.percentile(durations, 99):.2f} ms, '
+          f'{np.median(durations) * 1000 / args.users:.1f} us per user')
+    print(f'Frames with the wrong pose: {np.mean(observed != truth):.1%} labelled, {np.mean(decoded != truth):.1%} '
+          f'decoded')
+    print(f'Transitions found: {found}/{true_transitions}, timing error p50 {np.median(errors):.2f}s, '
+          f'p90 {np.percentile(errors, 90):.2f}s')
+    print(f'Flows recognized: {recognized}, {true_flows} completed')
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Rep Analytics Benchmark
+#
+# Generates hours of elbow angles at 30 fps, curls with a varying tempo and range of motion, tracker noise and
+# frames without a person, and compares analyzeReps with running curl_counter_step over every frame: both must
+# count the same reps, and the analytics, which also measure every rep, should take milliseconds.
+#
+# Usage:
+#     python benchmarks/rep_analytics.py --hours 1
+
+import argparse
+import os
+import sys
+from time import perf_counter
+
+import numpy as np
+
+# The repository root, where the modules live.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from MediaPipeSetCounter import curl_counter_step
+from RepAnalytics import analyzeReps, summarizeSet
+
+
+def makeAngles(hours, fps=30, seed=0):
+    '''
+    This function generates the elbow angles of curls, each rep taking 2 to 5 seconds.
+    Args:
+        hours: The length of the series in hours.
+        fps: The frame rate of the series.
+        seed: The seed of the random generator.
+    Returns:
+        angles: An array of angles in [0, 180], NaN on about 1% of the frames.
+    '''
+
+    generator = np.random.default_rng(seed)
+    frames = int(hours * 3600 * fps)
+    # The phase advances by one rep every 2 to 5 seconds, with a new tempo every rep.
+    reps = frames // (2 * fps) + 1
+    tempo = np.repeat(1 / (generator.uniform(2, 5, reps) * fps), 2 * fps)[:frames]
+    phase = np.cumsum(tempo)
+    depth = generator.uniform(5, 25, reps)[phase.astype(int)]
+    angles = 175 - (175 - depth) * (1 - np.cos(2 * np.pi * phase)) / 2 + generator.normal(0, 2, frames)
+    angles[generator.random(frames) < 0.01] = np.nan
+    return np.clip(angles, 0, 180)
+
+
+def countWithStateMachine(angles):
+    '''
+    This function counts the reps with curl_counter_step, one frame at a time.
+    Args:
+        angles: An array of angles, NaN where no person was detected.
+    Returns:
+        reps: The number of reps.
+    '''
+
+    counter, stage = 0, None
+    for angle in angles.tolist():
+        if angle == angle:
+            counter, stage = curl_counter_step(angle, counter, stage)
+    return counter
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Time the vectorized rep analytics on hours of angles.')
+    parser.add_argument('--hours', type=float, default=1.0, help='length of the angle series in hours')
+    parser.add_argument('--repeat', type=int, default=5, help='number of runs to take the fastest of')
+    args = parser.parse_args()
+
+    fps = 30
+    angles = makeAngles(args.hours, fps)
+
+    durations = []
+    for _ in range(args.repeat):
+        time1 = perf_counter()
+        reps = analyzeReps(angles, fps)
+        durations.append(perf_counter() - time1)
+
+    time1 = perf_counter()
+    counted = countWithStateMachine(angles)
+    loop_seconds = perf_counter() - time1
+
+    summary = summarizeSet(reps)
+    print(f'{len(angles)} frames ({args.hours:g} h at {fps} fps)')
+    print(f'analyzeReps:       {min(durations) * 1000:8.1f} ms, {summary["reps"]} reps, mean ROM {summary["rom"]:.0f}, '
+          f'concentric {summary["concentric"]:.2f}s, eccentric {summary["eccentric"]:.2f}s')
+    print(f'curl_counter_step: {loop_seconds * 1000:8.1f} ms, {counted} reps')
+    # The state machine also counts a last rep that never returned to a peak.
+    print('Same rep count' if counted - summary['reps'] in (0, 1) else 'DIFFERENT REP COUNTS')
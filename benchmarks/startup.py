@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Startup Benchmark
+#
+# Measures how long importing each entry module takes in a fresh interpreter, so no import is served from the
+# module cache of a previous run. Importing the pose modules must stay under 200 ms: mediapipe and matplotlib are
+# only loaded when a model is set up or a result is displayed.
+#
+# Usage:
+#     python benchmarks/startup.py --repeat 5
+
+import argparse
+import os
+import subprocess
+import sys
+
+
+# The repository root, where the modules live.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The modules to measure, with the import time budget in milliseconds, None when there is no budget.
+MODULES = {
+    'RealTimePoseDetection': 200,
+    'MediaPipeSetCounter': 200,
+    'PoseScoring': 200,
+    'app': None,
+}
+
+# The code run in the fresh interpreter, printing the import time in milliseconds.
+_TIMER = 'import time; t = time.perf_counter(); import {module}; print((time.perf_counter() - t) * 1000)'
+
+
+def measureImport(module):
+    '''
+    This function measures the import time of a module in a fresh interpreter.
+    Args:
+        module: The name of the module.
+    Returns:
+        milliseconds: The import time in milliseconds.
+    '''
+
+    output = subprocess.run([sys.executable, '-c', _TIMER.format(module=module)], cwd=ROOT,
+                            capture_output=True, check=True, text=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Measure the import time of the entry modules.')
+    parser.add_argument('--repeat', type=int, default=5, help='number of fresh interpreters per module')
+    args = parser.parse_args()
+
+    failed = False
+    for module, budget in MODULES.items():
+
+        # Keep the best run, the others include noise from the rest of the machine.
+        best = min(measureImport(module) for _ in range(args.repeat))
+        status = '' if budget is None else ('ok' if best <= budget else f'OVER {budget} ms')
+        failed = failed or (budget is not None and best > budget)
+        print(f'{module:<24} {best:8.1f} ms  {status}')
+
+    sys.exit(1 if failed else 0)
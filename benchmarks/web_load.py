@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Web Load Test
+#
+# Starts the web tier against a local SQLite stand-in, once with the development server app.py runs today and
+# once with the ASGI launcher serve.py, and sends the same request mix to both from many concurrent keep-alive
+# clients: the logged-in home page, the login page and /track_practice. Prints the requests per second and the
+# p50 and p99 latency of every server.
+#
+# Usage:
+#     python benchmarks/web_load.py --clients 32 --seconds 10 --workers 2
+
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+from time import perf_counter, sleep
+
+import numpy as np
+
+# The repository root, where the modules live.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from repository import create_repository
+
+# The account the clients log in with.
+EMAIL = 'load@example.com'
+PASSWORD = 'load-test'
+
+# The commands starting each server on a port.
+SERVERS = {
+    'flask-dev': lambda port, workers: [sys.executable, '-c', f'import app; app.app.run(port={port})'],
+    'asgi': lambda port, workers: [sys.executable, 'serve.py', '--port', str(port), '--workers', str(workers)],
+}
+
+
+def seedDatabase(path):
+    '''
+    This function creates the SQLite stand-in database with the load test account.
+    Args:
+        path: The path of the SQLite database file.
+    '''
+
+    from werkzeug.security import generate_password_hash
+
+    repository = create_repository(f'sqlite:///{path}')
+    repository.init_schema()
+    repository.create_user('Load Test', EMAIL, generate_password_hash(PASSWORD))
+    repository.close()
+
+
+def freePort():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def waitForServer(port, timeout=30):
+    deadline = perf_counter() + timeout
+    while perf_counter() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            sleep(0.1)
+    raise RuntimeError(f'The server on port {port} did not start')
+
+
+def login(port):
+    '''
+    This function logs the load test account in.
+    Args:
+        port: The port of the server.
+    Returns:
+        cookie: The session cookie to send with the requests.
+    '''
+
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    conn.request('POST', '/login', body=f'email={EMAIL}&password={PASSWORD}',
+                 headers={'Content-Type': 'application/x-www-form-urlencoded'})
+    response = conn.getresponse()
+    response.read()
+    conn.close()
+    return response.getheader('Set-Cookie').split(';')[0]
+
+
+def runClient(port, cookie, deadline, latencies, errors):
+    '''
+    This function sends the request mix over one keep-alive connection until the deadline.
+    Args:
+        port: The port of the server.
+        cookie: The session cookie.
+        deadline: The perf_counter value to stop at.
+        latencies: The list the latencies in seconds are appended to.
+        errors: The list the failed requests are appended to.
+    '''
+
+    requests = [
+        ('GET', '/', None, {'Cookie': cookie}),
+        ('GET', '/login', None, {}),
+        ('POST', '/track_practice', 'duration=10',
+         {'Cookie': cookie, 'Content-Type': 'application/x-www-form-urlencoded'}),
+    ]
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    index = 0
+    while perf_counter() < deadline:
+        method, path, body, headers = requests[index % len(requests)]
+        index += 1
+        time1 = perf_counter()
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 400:
+                errors.append(f'{method} {path}: {response.status}')
+            if response.getheader('Connection', '').lower() == 'close' or response.version == 10:
+                conn.close()
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(f'{method} {path}: {e}')
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            continue
+        latencies.append(perf_counter() - time1)
+    conn.close()
+
+
+def loadTest(server, database_path, clients, seconds, workers):
+    '''
+    This function starts a server and measures it under load.
+    Args:
+        server: The name of the server in SERVERS.
+        database_path: The path of the SQLite stand-in database.
+        clients: The number of concurrent clients.
+        seconds: The duration of the test.
+        workers: The number of worker processes of the ASGI server.
+    Returns:
+        result: A dictionary with the 'requests', 'errors', 'rps', 'p50' and 'p99' of the test.
+    '''
+
+    port = freePort()
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{database_path}')
+    process = subprocess.Popen(SERVERS[server](port, workers), cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        waitForServer(port)
+        cookie = login(port)
+
+        latencies, errors = [], []
+        deadline = perf_counter() + seconds
+        threads = [threading.Thread(target=runClient, args=(port, cookie, deadline, latencies, errors))
+                   for _ in range(clients)]
+        time1 = perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = perf_counter() - time1
+    finally:
+        process.terminate()
+        process.wait()
+
+    latencies = np.array(latencies) * 1000
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': len(latencies) / elapsed,
+        'p50': float(np.percentile(latencies, 50)) if len(latencies) else float('nan'),
+        'p99': float(np.percentile(latencies, 99)) if len(latencies) else float('nan'),
+    }
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Compare the development server with the ASGI server.')
+    parser.add_argument('--clients', type=int, default=32, help='number of concurrent keep-alive clients')
+    parser.add_argument('--seconds', type=float, default=10, help='duration of every test')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='ASGI worker processes')
+    parser.add_argument('--servers', nargs='+', choices=list(SERVERS), default=list(SERVERS))
+    args = parser.parse_args()
+
+    print(f'{"server":<12} {"requests":>9} {"errors":>7} {"req/s":>8} {"p50 ms":>8} {"p99 ms":>8}')
+    for server in args.servers:
+        with tempfile.TemporaryDirectory() as directory:
+            database_path = os.path.join(directory, 'yoga_ai.db')
+            seedDatabase(database_path)
+            result = loadTest(server, database_path, args.clients, args.seconds, args.workers)
+        print(f'{server:<12} {result["requests"]:>9} {result["errors"]:>7} {result["rps"]:>8.0f} '
+              f'{result["p50"]:>8.1f} {result["p99"]:>8.1f}')
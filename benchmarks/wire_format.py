@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Landmark Wire Format Benchmark
+#
+# Runs the pose detection over a recorded video, like the live loops do, and sends the landmarks of every frame
+# through the binary wire format and through JSON of the tuple lists detectPose returns. Prints the bytes per
+# frame, the share of delta frames, the largest decoding error and the encoding and decoding throughput of both.
+#
+# Usage:
+#     python benchmarks/wire_format.py --video media/exercising.mp4 --max-frames 300
+
+import argparse
+import json
+import os
+import sys
+from time import perf_counter
+
+import cv2
+import numpy as np
+
+# The repository root, where the modules live.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from RealTimePoseDetection import VIDEO_POSE_OPTIONS, loadMediapipe
+from wireformat import DELTA, HEADER, LandmarkDecoder, LandmarkEncoder, split_frames
+
+
+def recordLandmarks(path, height=640, max_frames=None):
+    '''
+    This function detects the landmarks of every frame of a video.
+    Args:
+        path: The path of the video.
+        height: The height the frames are resized to, like the live loops do.
+        max_frames: The number of frames to process, all frames by default.
+    Returns:
+        frames: A list with an array of shape (33, 4) of the pixel landmarks and visibility of every frame, None
+                for the frames without a person.
+    '''
+
+    mp_pose, _ = loadMediapipe()
+    video = cv2.VideoCapture(path)
+    frames = []
+    with mp_pose.Pose(**VIDEO_POSE_OPTIONS) as pose:
+        while max_frames is None or len(frames) < max_frames:
+            ok, frame = video.read()
+            if not ok:
+                break
+            frame_height, frame_width, _ = frame.shape
+            frame = cv2.resize(frame, (int(frame_width * (height / frame_height)), height))
+            results = pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            if not results.pose_landmarks:
+                frames.append(None)
+                continue
+            frames.append(np.array([(landmark.x * frame.shape[1], landmark.y * height, landmark.z * frame.shape[1],
+                                     landmark.visibility) for landmark in results.pose_landmarks.landmark],
+                                   dtype=np.float32))
+    video.release()
+    return frames
+
+
+def timeIt(function, repeat):
+    '''
+    This function measures the fastest of several runs of a function.
+    Args:
+        function: The function to run.
+        repeat: The number of runs.
+    Returns:
+        seconds: The duration of the fastest run.
+    '''
+
+    durations = []
+    for _ in range(repeat):
+        time1 = perf_counter()
+        function()
+        durations.append(perf_counter() - time1)
+    return min(durations)
+
+
+def benchmarkBinary(frames, repeat):
+    '''
+    This function encodes the frames into one stream buffer and decodes them again.
+    Args:
+        frames: The landmarks of every frame as returned by recordLandmarks.
+        repeat: The number of runs to take the fastest of.
+    Returns:
+        result: A dictionary with the stream 'bytes', the share of 'delta' frames, the largest decoding 'error' in
+                pixels and the encoding and decoding throughput in frames per second.
+    '''
+
+    buffer = bytearray(sum(HEADER.size + 33 * 7 for _ in frames))
+    sizes = []
+
+    def encode():
+        encoder, offset = LandmarkEncoder(), 0
+        sizes.clear()
+        for landmarks in frames:
+            size = encoder.encode_into(buffer, offset, landmarks)
+            sizes.append(size)
+            offset += size
+        return offset
+
+    decoded = []
+    out = np.empty((33, 4), dtype=np.float32)
+
+    def decode():
+        decoder = LandmarkDecoder()
+        decoded.clear()
+        for frame in split_frames(memoryview(buffer)[:sum(sizes)]):
+            landmarks = decoder.decode(frame, out)
+            decoded.append(None if landmarks is None else landmarks[:, :3].copy())
+
+    encode_seconds = timeIt(encode, repeat)
+    decode_seconds = timeIt(decode, repeat)
+
+    errors = [np.abs(original[:, :3] - landmarks).max()
+              for original, landmarks in zip(frames, decoded) if original is not None]
+    stream = memoryview(buffer)[:sum(sizes)]
+    deltas = sum(frame[3] & DELTA for frame in split_frames(stream))
+    return {'bytes': sum(sizes), 'delta': deltas / len(frames), 'error': max(errors, default=0.0),
+            'encode_fps': len(frames) / encode_seconds, 'decode_fps': len(frames) / decode_seconds}
+
+
+def benchmarkJson(frames, repeat):
+    '''
+    This function encodes the frames as JSON of the (x, y, z) tuple lists detectPose returns and decodes them.
+    Args:
+        frames: The landmarks of every frame as returned by recordLandmarks.
+        repeat: The number of runs to take the fastest of.
+    Returns:
+        result: A dictionary with the stream 'bytes' and the encoding and decoding throughput in frames per second.
+    '''
+
+    landmark_lists = [[] if landmarks is None else [tuple(row) for row in landmarks[:, :3].tolist()]
+                      for landmarks in frames]
+    messages = []
+
+    def encode():
+        messages[:] = [json.dumps(landmarks).encode() for landmarks in landmark_lists]
+
+    def decode():
+        for message in messages:
+            json.loads(message)
+
+    encode_seconds = timeIt(encode, repeat)
+    decode_seconds = timeIt(decode, repeat)
+    return {'bytes': sum(len(message) for message in messages),
+            'encode_fps': len(frames) / encode_seconds, 'decode_fps': len(frames) / decode_seconds}
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Compare the binary landmark frames with JSON.')
+    parser.add_argument('--video', default=os.path.join(ROOT, 'media', 'exercising.mp4'), help='recorded video')
+    parser.add_argument('--max-frames', type=int, default=300, help='number of video frames to detect')
+    parser.add_argument('--repeat', type=int, default=5, help='number of runs to take the fastest of')
+    args = parser.parse_args()
+
+    frames = recordLandmarks(args.video, max_frames=args.max_frames)
+    binary = benchmarkBinary(frames, args.repeat)
+    text = benchmarkJson(frames, args.repeat)
+
+    print(f'{len(frames)} frames, {sum(landmarks is not None for landmarks in frames)} with a person')
+    print(f'{"format":>8} {"B/frame":>8} {"encode fps":>11} {"decode fps":>11}')
+    for name, result in (('binary', binary), ('json', text)):
+        print(f'{name:>8} {result["bytes"] / len(frames):>8.1f} {result["encode_fps"]:>11.0f} '
+              f'{result["decode_fps"]:>11.0f}')
+    print(f'Binary is {text["bytes"] / binary["bytes"]:.1f}x smaller, {binary["delta"]:.0%} delta frames, '
+          f'largest error {binary["error"]:.3f} px')
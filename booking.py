@@ -0,0 +1,107 @@
+# booking.py
+#
+# Class bookings with capacity limits and waitlists.
+#
+# A class is opened for booking with a capacity, kept in class_seats next to the number of booked seats. A seat
+# is taken with one conditional update (booked = booked + 1 WHERE booked < capacity), so the database decides
+# atomically which of any number of concurrent requests get the last seats, across threads and worker processes.
+# A request that finds the class full is put on the waitlist instead. Cancelling a booked seat hands it to the
+# first user on the waitlist in the same transaction, or releases it when nobody is waiting, and raising the
+# capacity of a class hands the new seats to the waitlist the same way.
+#
+# Every booking is one short transaction, there is no SELECT-then-INSERT window in which a class can be oversold.
+# See benchmarks/booking_load.py for a load test against the SQLite backend.
+
+from datetime import datetime
+
+from repository import IntegrityError
+
+BOOKED = 'booked'
+WAITLISTED = 'waitlisted'
+
+
+class BookingError(Exception):
+    """A booking that conflicts with the state of the class, e.g. a class not open for booking."""
+
+
+class ClassNotFound(BookingError):
+    pass
+
+
+class BookingEngine:
+    """Books users into the classes of a repository."""
+
+    def __init__(self, repository):
+        self.repository = repository
+
+    def open_class(self, class_id, capacity):
+        """Open a class for booking, or change the capacity of an open class, return the users promoted."""
+        with self.repository.transaction() as transaction:
+            if not transaction.execute('set_capacity', (capacity, class_id)):
+                transaction.insert('open_class', (class_id, capacity))
+                return []
+
+            # Hand every new seat to the next user on the waitlist.
+            promoted = []
+            while transaction.execute('take_seat', (class_id,)):
+                user_id = self._promote_next(transaction, class_id)
+                if user_id is None:
+                    break
+                promoted.append(user_id)
+            return promoted
+
+    def book(self, class_id, user_id):
+        """Book a seat for a user, return BOOKED or WAITLISTED."""
+        try:
+            with self.repository.transaction() as transaction:
+                status = BOOKED if transaction.execute('take_seat', (class_id,)) else WAITLISTED
+                if status == WAITLISTED and transaction.fetch_one('class_seats', (class_id,)) is None:
+                    self._check_class(transaction, class_id)
+                    raise BookingError(f'Class {class_id} is not open for booking')
+                # The unique (class_id, user_id) key rolls the seat back if the user already has a booking.
+                transaction.insert('insert_booking', (class_id, user_id, status, datetime.now()))
+                return status
+        except IntegrityError:
+            booking = self.booking(class_id, user_id)
+            if booking is None:
+                raise
+            return booking['status']
+
+    def cancel(self, class_id, user_id):
+        """Cancel the booking of a user, return the user promoted from the waitlist or None."""
+        with self.repository.transaction() as transaction:
+            if transaction.execute('delete_booking', (class_id, user_id, WAITLISTED)):
+                return None
+            if not transaction.execute('delete_booking', (class_id, user_id, BOOKED)):
+                self._check_class(transaction, class_id)
+                raise BookingError(f'User {user_id} has no booking for class {class_id}')
+
+            return self._promote_next(transaction, class_id)
+
+    @staticmethod
+    def _promote_next(transaction, class_id):
+        """Hand a taken seat to the first user on the waitlist and return them, or release it and return None."""
+        # The conditional update skips a user who was promoted or cancelled by a concurrent transaction.
+        while True:
+            waiting = transaction.fetch_one('first_waitlisted', (class_id,))
+            if waiting is None:
+                transaction.execute('release_seat', (class_id,))
+                return None
+            if transaction.execute('promote_booking', (waiting['id'],)):
+                return waiting['user_id']
+
+    @staticmethod
+    def _check_class(transaction, class_id):
+        if transaction.fetch_one('class_by_id', (class_id,)) is None:
+            raise ClassNotFound(f'Class {class_id} does not exist')
+
+    def booking(self, class_id, user_id):
+        return self.repository.backend.fetch_one('booking', (class_id, user_id))
+
+    def availability(self, class_id):
+        """The capacity, booked seats and waitlist length of a class, None if it is not open for booking."""
+        seats = self.repository.backend.fetch_one('class_seats', (class_id,))
+        if seats is None:
+            return None
+        waitlisted = self.repository.backend.fetch_one('count_bookings', (class_id, WAITLISTED))['bookings']
+        return {'capacity': seats['capacity'], 'booked': seats['booked'], 'waitlisted': waitlisted}
@@ -0,0 +1,155 @@
+# mastery.py
+#
+# Batch job that decides which poses each user has mastered from the recorded telemetry.
+#
+# A hold is an unbroken run of per-second samples of one pose that all score at least min_score and lasts at
+# least hold_seconds, and it belongs to the UTC day it ends in. A pose is mastered after required_holds holds.
+#
+# The raw telemetry is partitioned by day and only ever appended to, late and out-of-order samples included, so
+# the job keeps the row count of every raw partition it has evaluated. A run recounts the holds of the days whose
+# partition grew, and of their neighbours since a hold can cross midnight, and reuses the hold counts of all the
+# other days, including the days compact() has dropped the raw samples of. The state also keeps the poses already
+# mastered, and new masteries are upserted into the mastered_pose table through the repository in one batch.
+#
+# The web app runs the job right before every compaction of the telemetry store, and under the same lock, so no
+# raw samples are dropped before they were evaluated and two worker processes never run it at once. It can also be
+# run by hand:
+#     python mastery.py
+
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+def _find_runs(ts, qualifies, labels, max_gap):
+    """Return the (first, last) sample indexes of the runs of consecutive qualifying samples of one label."""
+    same_run = qualifies[1:] & qualifies[:-1] & (labels[1:] == labels[:-1]) & (np.diff(ts) <= max_gap)
+    breaks = np.flatnonzero(~same_run) + 1
+    starts = np.concatenate([[0], breaks])
+    ends = np.concatenate([breaks - 1, [len(ts) - 1]])
+    keep = qualifies[starts]
+    return starts[keep], ends[keep]
+
+
+def _day_start(day):
+    """Epoch seconds of the start of a YYYY-MM-DD raw partition."""
+    return int(np.datetime64(day, 's').astype(np.int64))
+
+
+def _neighbours(day):
+    date = datetime.strptime(day, '%Y-%m-%d')
+    return [(date + timedelta(days=delta)).strftime('%Y-%m-%d') for delta in (-1, 1)]
+
+
+class MasteryEvaluator:
+    """
+    Incrementally evaluates pose mastery over a TelemetryStore.
+
+    store: the TelemetryStore holding the raw samples.
+    state_path: the JSON file the per-day row counts and holds of every user are kept in.
+    min_score: the similarity score every sample of a hold must reach.
+    hold_seconds: the minimum length of a hold.
+    required_holds: the number of holds needed to master a pose.
+    max_gap: the longest gap in seconds between two samples of the same hold.
+    """
+
+    def __init__(self, store, state_path=None, min_score=80.0, hold_seconds=30, required_holds=5, max_gap=2):
+        self.store = store
+        self.state_path = state_path or os.path.join(store.root, 'mastery_state.json')
+        self.min_score = min_score
+        self.hold_seconds = hold_seconds
+        self.required_holds = required_holds
+        self.max_gap = max_gap
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                self.state = json.load(f)
+        else:
+            self.state = {}
+
+    def save_state(self):
+        # Write the new state next to the old one and swap it in, so a crash never leaves half a file.
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _users(self):
+        return sorted(name for name in os.listdir(self.store.root)
+                      if os.path.isdir(os.path.join(self.store.root, name)))
+
+    def _day_holds(self, user_id, day):
+        """Return {label: [end ts of every hold]} of the holds of a user ending in a day."""
+        # Read back far enough to see the length of a hold that started the day before, and on past midnight to
+        # see if the last run goes on the next day.
+        start = _day_start(day)
+        samples = self.store.read(user_id, 'raw', start - self.hold_seconds - self.max_gap,
+                                  start + 86400 + self.max_gap + 1)
+        order = np.argsort(samples['ts'], kind='stable')
+        ts, codes, scores = samples['ts'][order], samples['label'][order], samples['score'][order]
+        if not len(ts):
+            return {}
+
+        # Unknown Pose (code 0) and unscored samples never count towards a hold.
+        qualifies = (codes != 0) & (scores >= self.min_score)
+
+        holds = {}
+        for first, last in zip(*_find_runs(ts, qualifies, codes, self.max_gap)):
+            if start <= ts[last] < start + 86400 and ts[last] - ts[first] + 1 >= self.hold_seconds:
+                holds.setdefault(self.store.label_name(codes[first]), []).append(int(ts[last]))
+        return holds
+
+    def evaluate_user(self, user_id):
+        """Recount the holds of the days of a user whose raw samples changed, return the newly mastered poses."""
+        # A state saved with a watermark is recounted from the raw partitions still there.
+        state = self.state.get(str(user_id)) or {'mastered': []}
+        if 'days' not in state:
+            state = self.state[str(user_id)] = {'days': {}, 'mastered': state['mastered']}
+        days = state['days']
+        rows = self.store.partition_rows(user_id, 'raw')
+
+        # A day whose partition grew since the last run, or that is new, and the days next to it.
+        changed = {day for day, count in rows.items() if days.get(day, {}).get('rows') != count}
+        affected = changed | {neighbour for day in changed for neighbour in _neighbours(day) if neighbour in rows}
+        for day in affected:
+            days[day] = {'rows': rows[day], 'holds': self._day_holds(user_id, day)}
+
+        # The days without a partition any more keep the holds they were evaluated with.
+        ends = {}
+        for day in days.values():
+            for label, hold_ends in day['holds'].items():
+                ends.setdefault(label, []).extend(hold_ends)
+
+        mastered = []
+        for label, hold_ends in sorted(ends.items()):
+            if len(hold_ends) >= self.required_holds and label not in state['mastered']:
+                state['mastered'].append(label)
+                mastered.append((user_id, label, sorted(hold_ends)[self.required_holds - 1]))
+        return mastered
+
+    def evaluate(self):
+        """Process the new samples of every user, return (user_id, pose_name, mastered_ts) rows."""
+        rows = []
+        for user_id in self._users():
+            rows += self.evaluate_user(user_id)
+        return rows
+
+
+def run_job(store, repository, **options):
+    """Evaluate the new telemetry, upsert the masteries and only then save the evaluated row counts."""
+    evaluator = MasteryEvaluator(store, **options)
+    rows = evaluator.evaluate()
+    repository.upsert_mastered_poses([(int(user_id), pose_name, datetime.fromtimestamp(ts))
+                                      for user_id, pose_name, ts in rows])
+    evaluator.save_state()
+    return rows
+
+
+if __name__ == '__main__':
+    from app import repository, telemetry_store
+
+    started = time.time()
+    with telemetry_store.compaction_lock():
+        rows = run_job(telemetry_store, repository)
+    print(f'{len(rows)} poses newly mastered in {time.time() - started:.2f}s')
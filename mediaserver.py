@@ -0,0 +1,100 @@
+# mediaserver.py
+#
+# Serves the files of media/ (tutorial videos and pose images) and downscaled variants of them.
+#
+# * Files are sent with send_file(conditional=True): Range requests get a 206 with only the requested bytes, so
+#   seeking in a video does not download it again, and ETag/Last-Modified allow 304s. The body is a file
+#   wrapper, which production servers hand to sendfile() instead of copying the file through Python.
+# * ?w=<width> returns a JPEG downscaled to one of VARIANT_WIDTHS, for images and for the first frame of a video
+#   (a poster). Variants are generated once and cached on disk under a key of (path, size, mtime), so editing or
+#   replacing a file makes new variants, and every later request is a plain file response again.
+#
+# Usage: GET /media/treepose3.jpg, GET /media/treepose3.jpg?w=320, GET /media/exercising.mp4?w=640
+
+import hashlib
+import os
+import threading
+
+from flask import abort, request, send_file
+from werkzeug.utils import safe_join
+
+# Only these widths are generated, so requests cannot fill the cache with arbitrary sizes.
+VARIANT_WIDTHS = (160, 320, 640, 1280)
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.webm')
+
+MAX_AGE = 24 * 3600
+
+
+class MediaServer:
+    """Files of a media folder with Range support and cached downscaled variants."""
+
+    def __init__(self, root, cache_dir, max_age=MAX_AGE, jpeg_quality=85):
+        self.root = root
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        self.jpeg_quality = jpeg_quality
+        # One lock per variant being generated, so concurrent requests for it decode the source only once
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def _variant_path(self, path, stat, width):
+        key = hashlib.sha1(f'{os.path.relpath(path, self.root)}:{stat.st_size}:{stat.st_mtime_ns}'.encode())
+        return os.path.join(self.cache_dir, f'{key.hexdigest()}_{width}.jpg')
+
+    def _read_image(self, path):
+        import cv2
+
+        if path.lower().endswith(VIDEO_EXTENSIONS):
+            video = cv2.VideoCapture(path)
+            ok, image = video.read()
+            video.release()
+            return image if ok else None
+        return cv2.imread(path)
+
+    def _make_variant(self, path, variant_path, width):
+        import cv2
+
+        image = self._read_image(path)
+        if image is None:
+            abort(415)
+
+        # Never upscale, a small source is only re-encoded.
+        height, source_width = image.shape[:2]
+        if source_width > width:
+            image = cv2.resize(image, (width, max(int(height * width / source_width), 1)),
+                               interpolation=cv2.INTER_AREA)
+
+        # Write next to the final path and rename, so a reader never sees half a file.
+        os.makedirs(self.cache_dir, exist_ok=True)
+        ok, data = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        tmp_path = f'{variant_path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data.tobytes())
+        os.replace(tmp_path, variant_path)
+
+    def variant(self, path, width):
+        """The path of the cached variant of a file, generated on the first request."""
+        variant_path = self._variant_path(path, os.stat(path), width)
+        if not os.path.exists(variant_path):
+            with self._locks_lock:
+                lock = self._locks.setdefault(variant_path, threading.Lock())
+            with lock:
+                if not os.path.exists(variant_path):
+                    self._make_variant(path, variant_path, width)
+            with self._locks_lock:
+                self._locks.pop(variant_path, None)
+        return variant_path
+
+    def response(self, filename):
+        """The response of GET /media/<filename>, honoring Range, conditional headers and ?w=<width>."""
+        path = safe_join(self.root, filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+
+        width = request.args.get('w', type=int)
+        if width is None:
+            return send_file(path, conditional=True, max_age=self.max_age)
+        if width not in VARIANT_WIDTHS:
+            abort(400)
+        return send_file(self.variant(path, width), mimetype='image/jpeg', conditional=True, max_age=self.max_age)
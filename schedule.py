@@ -0,0 +1,89 @@
+# schedule.py
+#
+# In-memory index of the upcoming yoga classes.
+#
+# The home page shows the next classes on every load, but the schedule rarely changes. The index loads the
+# upcoming classes once into an array sorted by start_time and answers "next N classes" with a bisect, without
+# touching the database. Every class write of the repository bumps a generation row in the same transaction. The
+# index reads that row at most every check_interval seconds, one primary key lookup, and reloads when it changed,
+# so a write from another worker process shows within check_interval seconds, a write through this index at once.
+# Classes that have started are dropped from the front of the array as time passes, and the array is reloaded
+# after max_age seconds whatever the generation.
+
+import bisect
+import threading
+import time
+from datetime import datetime
+
+
+def _start_time(row):
+    # SQLite returns DATETIME columns as ISO text, MySQL as datetime
+    start_time = row['start_time']
+    return datetime.fromisoformat(start_time) if isinstance(start_time, str) else start_time
+
+
+class ScheduleIndex:
+    """The upcoming classes of a repository sorted by start_time."""
+
+    def __init__(self, repository, max_age=600, check_interval=2.0):
+        self.repository = repository
+        self.max_age = max_age
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._keys = []        # (start_time, class_id), sorted
+        self._classes = {}     # class_id -> row
+        self._loaded_at = None
+        self._generation = None
+        self._checked_at = None
+
+    def invalidate(self):
+        """Drop the index, the next read reloads it from the database."""
+        with self._lock:
+            self._loaded_at = None
+
+    def _load(self, now, generation):
+        # The generation is read before the rows, a write in between only causes another reload
+        self._generation = generation
+        rows = self.repository.upcoming_classes(now=now)
+        self._classes = {row['id']: dict(row, start_time=_start_time(row)) for row in rows}
+        self._keys = sorted((row['start_time'], class_id) for class_id, row in self._classes.items())
+        self._loaded_at = self._checked_at = time.monotonic()
+
+    def _expire(self, now):
+        # Classes that have started are always a prefix of the sorted keys
+        index = bisect.bisect_right(self._keys, (now, float('inf')))
+        if index:
+            for _, class_id in self._keys[:index]:
+                del self._classes[class_id]
+            del self._keys[:index]
+
+    def next_classes(self, limit=3, now=None):
+        """The next limit classes starting after now, earliest first."""
+        now = now or datetime.now()
+        with self._lock:
+            current = time.monotonic()
+            if self._loaded_at is None or current - self._loaded_at > self.max_age:
+                self._load(now, self.repository.class_generation())
+            elif current - self._checked_at >= self.check_interval:
+                self._checked_at = current
+                generation = self.repository.class_generation()
+                if generation != self._generation:
+                    self._load(now, generation)
+            self._expire(now)
+            return [self._classes[class_id] for _, class_id in self._keys[:limit]]
+
+    # Writes: applied to the database, which bumps the generation for the other processes, and the index of this
+    # process is dropped right away
+
+    def create_class(self, name, instructor, start_time, duration_minutes, class_type):
+        class_id = self.repository.create_class(name, instructor, start_time, duration_minutes, class_type)
+        self.invalidate()
+        return class_id
+
+    def update_class(self, class_id, name, instructor, start_time, duration_minutes, class_type):
+        self.repository.update_class(class_id, name, instructor, start_time, duration_minutes, class_type)
+        self.invalidate()
+
+    def delete_class(self, class_id):
+        self.repository.delete_class(class_id)
+        self.invalidate()
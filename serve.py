@@ -0,0 +1,47 @@
+# serve.py
+#
+# Production launcher of the web tier: runs asgi.py in uvicorn.
+#
+# Runs one worker process per CPU by default, each with a pool of request threads for the blocking database
+# calls. The workers share all their state: the open practice sessions and the class schedule through the
+# database, the telemetry store through its lock files. The threads of one worker share its GIL, so the workers
+# are what lets the request rate grow with the number of cores.
+#
+# Usage:
+#     python serve.py --threads 8 --keep-alive 5 --port 8000
+#     DATABASE_URL=sqlite:///yoga_ai.db python serve.py     (local SQLite stand-in)
+#
+# app.py's `python app.py` still starts the single-process development server.
+
+import argparse
+import os
+
+import uvicorn
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve the Yoga AI web app with uvicorn.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_WORKERS', os.cpu_count() or 1)),
+                        help='worker processes, one per CPU by default')
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('WEB_THREADS', 8)),
+                        help='request threads per worker for the blocking database calls')
+    parser.add_argument('--keep-alive', type=int, default=5,
+                        help='seconds an idle keep-alive connection is kept open')
+    parser.add_argument('--init-db', action='store_true', help='create the tables before serving')
+    args = parser.parse_args(argv)
+
+    # Read by asgi.py in every worker process
+    os.environ['WEB_THREADS'] = str(args.threads)
+
+    if args.init_db:
+        from app import init_db
+        init_db()
+
+    uvicorn.run('asgi:application', host=args.host, port=args.port, workers=args.workers,
+                timeout_keep_alive=args.keep_alive, lifespan='on', access_log=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+# sessionizer.py
+#
+# Turns the stream of classifyPose labels of each user into practice sessions.
+#
+# A session starts with the first recognized pose and ends when no pose has been recognized for idle_gap
+# seconds. While it is open only a fixed set of counters is kept per user (start, last activity, the previous
+# label and the seconds per label), so memory stays constant per active user however long the session runs.
+# Closed sessions are handed to a callback as one summary, e.g. to insert a single practice_sessions row.
+#
+# The open sessions live in a store keyed by user. MemorySessionStore keeps them in this process, for a single
+# worker and tests. RepositorySessionStore keeps them in the database, so the telemetry of one user can reach any
+# worker process: every write carries the version it read, a writer that lost the race reloads and replays its
+# batch, and only the worker whose write closed a session emits it. Users who stop sending telemetry are closed
+# by expire(), run every few seconds by start_expiry() in each worker.
+#
+# The sample timestamps come from the client's clock, which may be off or in another unit, so they are only
+# compared with each other. expire() compares the server time instead: every session records when its last
+# recognized pose arrived at the server.
+
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class PracticeSession:
+    __slots__ = ('user_id', 'start', 'last_active', 'last_seen', 'active_at', 'last_label', 'pose_seconds')
+
+    def __init__(self, user_id, timestamp, label, now):
+        self.user_id = user_id
+        self.start = timestamp
+        # The last frame with a recognized pose, and the last frame of any kind
+        self.last_active = timestamp
+        self.last_seen = timestamp
+        # The server time the last frame with a recognized pose arrived
+        self.active_at = now
+        self.last_label = label
+        self.pose_seconds = {}
+
+    @property
+    def duration_seconds(self):
+        return self.last_active - self.start
+
+    def summary(self):
+        return {
+            'user_id': self.user_id,
+            'start': self.start,
+            'end': self.last_active,
+            'duration_minutes': max(1, int(round(self.duration_seconds / 60.0))),
+            'pose_seconds': dict(self.pose_seconds),
+        }
+
+    def to_row(self):
+        return {
+            'user_id': self.user_id,
+            'started_at': self.start,
+            'last_active': self.last_active,
+            'last_seen': self.last_seen,
+            'active_at': self.active_at,
+            'last_label': self.last_label,
+            'pose_seconds': json.dumps(self.pose_seconds),
+        }
+
+    @classmethod
+    def from_row(cls, row):
+        session = cls(row['user_id'], row['started_at'], row['last_label'], row['active_at'])
+        session.last_active = row['last_active']
+        session.last_seen = row['last_seen']
+        session.pose_seconds = json.loads(row['pose_seconds'])
+        return session
+
+
+class MemorySessionStore:
+    """The open sessions of this process, as rows with a version like the database keeps them."""
+
+    def __init__(self):
+        self._rows = {}      # user_id -> (row, version)
+        self._lock = threading.Lock()
+
+    def load(self, user_id):
+        with self._lock:
+            row, version = self._rows.get(user_id, (None, None))
+        return (PracticeSession.from_row(row) if row else None), version
+
+    def idle(self, before):
+        with self._lock:
+            rows = [(row, version) for row, version in self._rows.values() if row['active_at'] < before]
+        return [(PracticeSession.from_row(row), version) for row, version in rows]
+
+    def save(self, session, version):
+        with self._lock:
+            if self._rows.get(session.user_id, (None, None))[1] != version:
+                return False
+            self._rows[session.user_id] = (session.to_row(), (version or 0) + 1)
+            return True
+
+    def delete(self, user_id, version):
+        with self._lock:
+            if self._rows.get(user_id, (None, None))[1] != version:
+                return False
+            del self._rows[user_id]
+            return True
+
+
+class RepositorySessionStore:
+    """The open sessions in the open_practice_sessions table of a repository, shared by all processes."""
+
+    def __init__(self, repository):
+        self.repository = repository
+
+    def load(self, user_id):
+        row = self.repository.get_open_session(user_id)
+        return (PracticeSession.from_row(row), row['version']) if row else (None, None)
+
+    def idle(self, before):
+        return [(PracticeSession.from_row(row), row['version'])
+                for row in self.repository.idle_open_sessions(before)]
+
+    def save(self, session, version):
+        return self.repository.save_open_session(session.to_row(), version)
+
+    def delete(self, user_id, version):
+        return self.repository.delete_open_session(user_id, version)
+
+
+class Sessionizer:
+    """
+    Segments per-user pose label streams into practice sessions.
+
+    on_session: called with the summary dict of every closed session.
+    store: where the open sessions are kept, a MemorySessionStore by default.
+    idle_gap: seconds without a recognized pose after which a session is closed.
+    min_duration: sessions shorter than this many seconds are dropped.
+    max_frame_gap: the longest time between two frames credited to the previous label, so a stalled stream
+        does not count as time in a pose.
+    idle_labels: labels that do not count as practice.
+    """
+
+    def __init__(self, on_session, store=None, idle_gap=120, min_duration=60, max_frame_gap=2.0,
+                 idle_labels=('Unknown Pose',)):
+        self.on_session = on_session
+        self.store = store or MemorySessionStore()
+        self.idle_gap = idle_gap
+        self.min_duration = min_duration
+        self.max_frame_gap = max_frame_gap
+        self.idle_labels = frozenset(idle_labels)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def observe(self, user_id, timestamp, label, now=None):
+        """Feed one classified frame of a user."""
+        self.observe_many(user_id, [timestamp], [label], now)
+
+    def observe_many(self, user_id, timestamps, labels, now=None):
+        """Feed a batch of classified frames of a user, in time order, that arrived at server time now."""
+        now = time.time() if now is None else now
+        frames = list(zip(timestamps, labels))
+        while True:
+            session, version = self.store.load(user_id)
+            closed = []
+            for timestamp, label in frames:
+                session = self._observe(user_id, session, timestamp, label, now, closed)
+            if self._write(user_id, session, version):
+                break
+            # Another worker wrote this user's session since it was loaded, replay the batch on its version
+        self._emit(closed)
+
+    def _write(self, user_id, session, version):
+        if session is not None:
+            return self.store.save(session, version)
+        return version is None or self.store.delete(user_id, version)
+
+    def _observe(self, user_id, session, timestamp, label, now, closed):
+        # Close the previous session if the user has been idle for too long
+        if session is not None and timestamp - session.last_active > self.idle_gap:
+            closed.append(session)
+            session = None
+
+        if label in self.idle_labels:
+            # Idle frames end the current pose but do not extend the session
+            if session is not None:
+                self._credit(session, timestamp)
+                session.last_label = None
+            return session
+
+        if session is None:
+            return PracticeSession(user_id, timestamp, label, now)
+
+        self._credit(session, timestamp)
+        session.last_label = label
+        session.last_active = max(session.last_active, timestamp)
+        session.active_at = max(session.active_at, now)
+        return session
+
+    def _credit(self, session, timestamp):
+        # Credit the time since the previous frame to the label that was held during it
+        if session.last_label is not None:
+            elapsed = min(max(timestamp - session.last_seen, 0), self.max_frame_gap)
+            session.pose_seconds[session.last_label] = session.pose_seconds.get(session.last_label, 0) + elapsed
+        session.last_seen = max(session.last_seen, timestamp)
+
+    def expire(self, now):
+        """Close the sessions of all users idle for more than idle_gap at server time now."""
+        self._close(now - self.idle_gap)
+
+    def flush(self):
+        """Close every open session, e.g. when the last worker shuts down."""
+        self._close(float('inf'))
+
+    def _close(self, before):
+        # A session also written or closed by another worker in the meantime is left to that worker
+        closed = [session for session, version in self.store.idle(before)
+                  if self.store.delete(session.user_id, version)]
+        self._emit(closed)
+
+    def start_expiry(self, interval=30):
+        """Run expire() every interval seconds on a background thread, until stop_expiry()."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._expire_loop, args=(interval,), daemon=True,
+                                            name='sessionizer-expiry')
+            self._thread.start()
+
+    def stop_expiry(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _expire_loop(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.expire(time.time())
+            except Exception:
+                logger.exception('Expiring practice sessions failed')
+
+    def _emit(self, closed):
+        # Called after the store write, so a slow database write never holds up other users
+        for session in closed:
+            if session.duration_seconds >= self.min_duration:
+                self.on_session(session.summary())
@@ -0,0 +1,443 @@
+# telemetry.py
+#
+# Append-only, columnar store for per-second pose telemetry (label, similarity score, reps) per user.
+#
+# Every partition is a directory holding one flat binary file per column, so appending is a plain write at the
+# end of each file and reading a column is a single np.fromfile. Next to the raw samples the store keeps
+# rollups at minute, day and month resolution. Rollup rows are additive: each append adds one row per
+# (bucket, label) it touched, and compact() merges rows with the same key. Dashboard queries only read the
+# rollups, and compact() also drops raw and minute partitions past their retention so storage stays bounded.
+# The web app runs compact() every hour on a background thread, see start_compaction(), right after the jobs that
+# need the raw samples, like the mastery job.
+#
+# Every partition records the number of rows its columns hold in a _rows file, written after the columns, and
+# readers only read that many rows. Opening a store cuts off the rows a crash left half appended, and finishes or
+# rolls back the merges of compact() a crash interrupted.
+#
+# Several processes can share a store, like the workers of serve.py. The appends, compaction and recovery of a
+# user hold the lock file of the user, a new label gets its code under labels.lock after labels.json is read
+# again, and the compaction loops of the processes take turns on compaction.lock. Readers take no lock, they only
+# read the committed rows.
+#
+# Layout:
+#     <root>/labels.json                        label names, the index is the stored label code
+#     <root>/<user_id>.lock, labels.lock, compaction.lock
+#     <root>/<user_id>/raw/<YYYY-MM-DD>/         ts, label, score, reps
+#     <root>/<user_id>/minute/<YYYY-MM-DD>/      bucket, label, seconds, reps, score_sum, score_count
+#     <root>/<user_id>/day/<YYYY-MM>/            same columns as minute
+#     <root>/<user_id>/month/<YYYY>/             same columns as minute
+
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+RAW_COLUMNS = {
+    'ts': np.int64,
+    'label': np.uint8,
+    'score': np.float32,
+    'reps': np.uint16,
+}
+
+ROLLUP_COLUMNS = {
+    'bucket': np.int64,
+    'label': np.uint8,
+    'seconds': np.int32,
+    'reps': np.int32,
+    'score_sum': np.float64,
+    'score_count': np.int32,
+}
+
+ROLLUP_RESOLUTIONS = ('minute', 'day', 'month')
+
+# The file of a partition holding the number of rows committed to its columns.
+ROWS_FILE = '_rows'
+
+# The labels classifyPose can emit, so they keep stable codes across stores.
+DEFAULT_LABELS = ['Unknown Pose', 'Warrior II Pose', 'T Pose', 'Tree Pose']
+
+
+@contextmanager
+def _file_lock(path):
+    """Hold the exclusive lock of a lock file, which excludes every other thread and process taking it."""
+    with open(path, 'a+b') as f:
+        if fcntl is not None:
+            # Released when the file is closed
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    # Gives up after retrying for 10 seconds
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass
+        try:
+            yield
+        finally:
+            if fcntl is None:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _to_datetime64(ts):
+    return np.asarray(ts, dtype=np.int64).astype('datetime64[s]')
+
+
+def bucket_start(ts, resolution):
+    """Return the UTC start (epoch seconds) of the minute, day or month of every timestamp."""
+    ts = np.asarray(ts, dtype=np.int64)
+    if resolution == 'minute':
+        return ts - ts % 60
+    if resolution == 'day':
+        return ts - ts % 86400
+    if resolution == 'month':
+        return _to_datetime64(ts).astype('datetime64[M]').astype('datetime64[s]').astype(np.int64)
+    raise ValueError(f'Unknown resolution: {resolution}')
+
+
+def _partition_names(ts, level):
+    # raw and minute data is partitioned by day, day rollups by month and month rollups by year.
+    unit, width = {'raw': ('D', 10), 'minute': ('D', 10), 'day': ('M', 7), 'month': ('Y', 4)}[level]
+    return np.datetime_as_string(_to_datetime64(ts).astype(f'datetime64[{unit}]'), unit=unit).astype(f'U{width}')
+
+
+def _committed_rows(path, schema):
+    """The number of rows every column of a partition completely holds."""
+    try:
+        with open(os.path.join(path, ROWS_FILE)) as f:
+            return int(f.read())
+    except FileNotFoundError:
+        # A partition written before the row count was recorded: the rows that reached every column.
+        return min((os.path.getsize(os.path.join(path, name)) // np.dtype(dtype).itemsize
+                    if os.path.exists(os.path.join(path, name)) else 0) for name, dtype in schema.items())
+
+
+def _commit_rows(path, rows):
+    tmp_path = os.path.join(path, ROWS_FILE + '.tmp')
+    with open(tmp_path, 'w') as f:
+        f.write(str(rows))
+    os.replace(tmp_path, os.path.join(path, ROWS_FILE))
+
+
+def _truncate_columns(path, schema, rows):
+    for name, dtype in schema.items():
+        column_path = os.path.join(path, name)
+        if os.path.exists(column_path) and os.path.getsize(column_path) > rows * np.dtype(dtype).itemsize:
+            with open(column_path, 'r+b') as f:
+                f.truncate(rows * np.dtype(dtype).itemsize)
+
+
+def _append_columns(path, columns, schema):
+    os.makedirs(path, exist_ok=True)
+    rows = _committed_rows(path, schema)
+    # Write after the committed rows, over anything a failed append left behind.
+    _truncate_columns(path, schema, rows)
+    for name, dtype in schema.items():
+        with open(os.path.join(path, name), 'ab') as f:
+            f.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+    _commit_rows(path, rows + len(columns[next(iter(schema))]))
+
+
+def _read_columns(path, schema, names=None):
+    names = names or list(schema)
+    if not os.path.isdir(path):
+        return {name: np.zeros(0, dtype=schema[name]) for name in names}
+    rows = _committed_rows(path, schema)
+    return {name: np.fromfile(os.path.join(path, name), dtype=schema[name], count=rows) for name in names}
+
+
+def _aggregate(buckets, labels, seconds, reps, score_sum, score_count):
+    """Sum the rollup measures of all rows sharing a (bucket, label) key."""
+    keys = buckets.astype(np.int64) * 256 + labels
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    return {
+        'bucket': unique_keys // 256,
+        'label': (unique_keys % 256).astype(np.uint8),
+        'seconds': np.bincount(inverse, weights=seconds).astype(np.int32),
+        'reps': np.bincount(inverse, weights=reps).astype(np.int32),
+        'score_sum': np.bincount(inverse, weights=score_sum),
+        'score_count': np.bincount(inverse, weights=score_count).astype(np.int32),
+    }
+
+
+class TelemetryStore:
+    """Per-user pose telemetry with minute/day/month rollups and retention-based compaction."""
+
+    def __init__(self, root='telemetry', raw_retention_days=7, minute_retention_days=90):
+        self.root = root
+        self.raw_retention_days = raw_retention_days
+        self.minute_retention_days = minute_retention_days
+        self._stop = threading.Event()
+        self._thread = None
+        os.makedirs(root, exist_ok=True)
+        self._labels_path = os.path.join(root, 'labels.json')
+        self.labels = list(DEFAULT_LABELS)
+        with self._labels_lock():
+            if os.path.exists(self._labels_path):
+                self._load_labels()
+            else:
+                self._save_labels()
+        self._recover()
+
+    def _user_lock(self, user_id):
+        return _file_lock(os.path.join(self.root, f'{user_id}.lock'))
+
+    def _labels_lock(self):
+        return _file_lock(os.path.join(self.root, 'labels.lock'))
+
+    def compaction_lock(self):
+        """The lock compaction and the jobs run before it hold, so the processes of a store take turns."""
+        return _file_lock(os.path.join(self.root, 'compaction.lock'))
+
+    def _recover(self):
+        """Finish or roll back the merges a crash interrupted and cut off the rows it left half appended."""
+        for user_id in os.listdir(self.root):
+            if not os.path.isdir(os.path.join(self.root, user_id)):
+                continue
+            with self._user_lock(user_id):
+                self._recover_user(user_id)
+
+    def _recover_user(self, user_id):
+        for level in ('raw',) + ROLLUP_RESOLUTIONS:
+            level_path = self._path(user_id, level)
+            if not os.path.isdir(level_path):
+                continue
+
+            # A merge swaps <partition>.tmp in through <partition>.old. Without the partition the crash came
+            # between the two renames: the merged rows are complete once their row count was written.
+            for name in sorted(os.listdir(level_path)):
+                if not name.endswith('.old'):
+                    continue
+                path, old_path = os.path.join(level_path, name[:-len('.old')]), os.path.join(level_path, name)
+                if not os.path.exists(path):
+                    tmp_path = path + '.tmp'
+                    os.rename(tmp_path if os.path.exists(os.path.join(tmp_path, ROWS_FILE)) else old_path, path)
+                shutil.rmtree(old_path, ignore_errors=True)
+            for name in os.listdir(level_path):
+                if name.endswith('.tmp'):
+                    shutil.rmtree(os.path.join(level_path, name))
+
+            schema = RAW_COLUMNS if level == 'raw' else ROLLUP_COLUMNS
+            for partition in self._partitions(user_id, level):
+                path = self._path(user_id, level, partition)
+                _truncate_columns(path, schema, _committed_rows(path, schema))
+
+    def _load_labels(self):
+        with open(self._labels_path) as f:
+            self.labels = json.load(f)
+
+    def _reload_labels(self):
+        # Pick up the labels other processes have given a code since labels.json was read
+        with self._labels_lock():
+            self._load_labels()
+
+    def _save_labels(self):
+        # Swap the new file in, a crash must never leave a truncated labels.json the store cannot open
+        tmp_path = self._labels_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.labels, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._labels_path)
+
+    def label_code(self, label):
+        if label not in self.labels:
+            with self._labels_lock():
+                self._load_labels()
+                if label not in self.labels:
+                    if len(self.labels) >= 256:
+                        raise ValueError('Too many distinct pose labels')
+                    self.labels.append(label)
+                    self._save_labels()
+        return self.labels.index(label)
+
+    def label_name(self, code):
+        if code >= len(self.labels):
+            self._reload_labels()
+        return self.labels[code]
+
+    def _path(self, user_id, level, partition=''):
+        return os.path.join(self.root, str(user_id), level, partition)
+
+    def append(self, user_id, timestamps, labels, scores=None, reps=None):
+        """
+        Append per-second samples for a user and update the rollups.
+
+        timestamps are epoch seconds, labels are pose label strings, scores are similarity scores (NaN when
+        unknown) and reps the number of reps completed during each second.
+        """
+        ts = np.asarray(timestamps, dtype=np.int64)
+        if len(ts) == 0:
+            return
+        scores = np.full(len(ts), np.nan, dtype=np.float32) if scores is None else np.asarray(scores, np.float32)
+        reps = np.zeros(len(ts), dtype=np.uint16) if reps is None else np.asarray(reps, np.uint16)
+
+        with self._user_lock(user_id):
+            # Encode the labels once per distinct value instead of once per sample.
+            names, inverse = np.unique(np.asarray(labels, dtype=str), return_inverse=True)
+            codes = np.array([self.label_code(name) for name in names], dtype=np.uint8)[inverse]
+
+            raw = {'ts': ts, 'label': codes, 'score': scores, 'reps': reps}
+            self._append_partitioned(user_id, 'raw', raw, RAW_COLUMNS, ts)
+
+            has_score = ~np.isnan(scores)
+            for resolution in ROLLUP_RESOLUTIONS:
+                rollup = _aggregate(bucket_start(ts, resolution), codes, np.ones(len(ts)), reps,
+                                    np.where(has_score, scores, 0.0), has_score)
+                self._append_partitioned(user_id, resolution, rollup, ROLLUP_COLUMNS, rollup['bucket'])
+
+    def _append_partitioned(self, user_id, level, columns, schema, ts):
+        partitions = _partition_names(ts, level)
+        for partition in np.unique(partitions):
+            mask = partitions == partition
+            _append_columns(self._path(user_id, level, partition),
+                            {name: values[mask] for name, values in columns.items()}, schema)
+
+    def _partitions(self, user_id, level):
+        path = self._path(user_id, level)
+        if not os.path.isdir(path):
+            return []
+        # Skip the temporary directories of a merge, a crash leaves them to _recover.
+        return sorted(name for name in os.listdir(path) if '.' not in name)
+
+    def partition_rows(self, user_id, level):
+        """The number of committed rows of every partition of a user, keyed by partition name."""
+        schema = RAW_COLUMNS if level == 'raw' else ROLLUP_COLUMNS
+        return {partition: _committed_rows(self._path(user_id, level, partition), schema)
+                for partition in self._partitions(user_id, level)}
+
+    def read(self, user_id, level, start, end, label=None):
+        """Read the raw samples or rollup rows of a user with start <= ts/bucket < end."""
+        schema = RAW_COLUMNS if level == 'raw' else ROLLUP_COLUMNS
+        key = 'ts' if level == 'raw' else 'bucket'
+        first, last = _partition_names([start, max(end - 1, start)], level)
+        parts = [_read_columns(self._path(user_id, level, partition), schema)
+                 for partition in self._partitions(user_id, level) if first <= partition <= last]
+        if not parts:
+            return {name: np.zeros(0, dtype=dtype) for name, dtype in schema.items()}
+        columns = {name: np.concatenate([part[name] for part in parts]) for name in schema}
+        mask = (columns[key] >= start) & (columns[key] < end)
+        if label is not None:
+            if label not in self.labels:
+                self._reload_labels()
+            mask &= columns['label'] == (self.labels.index(label) if label in self.labels else -1)
+        return {name: values[mask] for name, values in columns.items()}
+
+    def pose_seconds(self, user_id, label, start, end):
+        """
+        Seconds spent in a pose between start and end, read from the coarsest rollups that fit.
+
+        Whole months come from the month rollups, whole days from the day rollups and only the remaining edges
+        from the minute rollups, so a month-long query touches a handful of rows.
+        """
+        start, end = int(bucket_start(start, 'minute')), int(bucket_start(end, 'minute'))
+        if start >= end:
+            return 0
+        for resolution in ('month', 'day'):
+            first = self._next_bucket(start, resolution)
+            last = int(bucket_start(end, resolution))
+            if first < last:
+                covered = int(self.read(user_id, resolution, first, last, label)['seconds'].sum())
+                return (covered + self.pose_seconds(user_id, label, start, first)
+                        + self.pose_seconds(user_id, label, last, end))
+        return int(self.read(user_id, 'minute', start, end, label)['seconds'].sum())
+
+    @staticmethod
+    def _next_bucket(ts, resolution):
+        """The first bucket start of the resolution at or after ts."""
+        current = int(bucket_start(ts, resolution))
+        if current == ts:
+            return current
+        if resolution == 'day':
+            return current + 86400
+        month = _to_datetime64(current).astype('datetime64[M]') + 1
+        return int(month.astype('datetime64[s]').astype(np.int64))
+
+    def compact(self, now=None):
+        """Drop raw and minute partitions past their retention and merge duplicate rollup rows."""
+        now = int(time.time() if now is None else now)
+        raw_cutoff = _partition_names([now - self.raw_retention_days * 86400], 'raw')[0]
+        minute_cutoff = _partition_names([now - self.minute_retention_days * 86400], 'minute')[0]
+
+        for user_id in os.listdir(self.root):
+            if not os.path.isdir(os.path.join(self.root, user_id)):
+                continue
+            with self._user_lock(user_id):
+                for partition in self._partitions(user_id, 'raw'):
+                    if partition < raw_cutoff:
+                        shutil.rmtree(self._path(user_id, 'raw', partition))
+                for partition in self._partitions(user_id, 'minute'):
+                    if partition < minute_cutoff:
+                        shutil.rmtree(self._path(user_id, 'minute', partition))
+                for resolution in ROLLUP_RESOLUTIONS:
+                    for partition in self._partitions(user_id, resolution):
+                        self._merge_partition(self._path(user_id, resolution, partition))
+
+    def start_compaction(self, interval=3600, before_compact=None):
+        """
+        Run compact() every interval seconds on a background thread, until stop_compaction().
+
+        before_compact is called before every compact(), and the compaction is skipped when it fails, so a job
+        reading the raw samples never misses the ones compact() drops. Both run under compaction_lock().
+        """
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._compact_loop, args=(interval, before_compact),
+                                            daemon=True, name='telemetry-compaction')
+            self._thread.start()
+
+    def stop_compaction(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _compact_loop(self, interval, before_compact):
+        while not self._stop.wait(interval):
+            try:
+                with self.compaction_lock():
+                    if before_compact is not None:
+                        before_compact()
+                    self.compact()
+            except Exception:
+                logger.exception('Compacting the telemetry store failed')
+
+    @staticmethod
+    def _merge_partition(path):
+        columns = _read_columns(path, ROLLUP_COLUMNS)
+        merged = _aggregate(columns['bucket'], columns['label'], columns['seconds'], columns['reps'],
+                            columns['score_sum'], columns['score_count'])
+        if len(merged['bucket']) == len(columns['bucket']):
+            return
+
+        # Write the merged partition next to the old one and swap it in, so a crash never loses rows.
+        tmp_path = path + '.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        _append_columns(tmp_path, merged, ROLLUP_COLUMNS)
+        old_path = path + '.old'
+        os.rename(path, old_path)
+        os.rename(tmp_path, path)
+        shutil.rmtree(old_path)
+
+
+def month_start(now=None):
+    """Epoch seconds of the start of the current UTC month."""
+    now = datetime.now(timezone.utc) if now is None else now
+    return int(datetime(now.year, now.month, 1, tzinfo=timezone.utc).timestamp())
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The repository root, where the modules live. The root __init__.py is not a package, so the tests import the
+# modules from the root like the benchmarks do.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
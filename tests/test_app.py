@@ -0,0 +1,54 @@
+import os
+from datetime import datetime
+
+import pytest
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+import app as web  # noqa: E402
+from telemetry import TelemetryStore  # noqa: E402
+
+NOW = 1_700_000_000
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    web.repository.init_schema()
+    monkeypatch.setattr(web, 'telemetry_store', TelemetryStore(str(tmp_path / 'telemetry')))
+    client = web.app.test_client()
+    with client.session_transaction() as session:
+        session['loggedin'], session['id'] = True, 1
+    return client
+
+
+def test_telemetry_rejects_unknown_labels(client):
+    response = client.post('/telemetry', json={'samples': [[NOW, 'T Pose', 0.9, 0], [NOW + 1, 'x' * 40, 0.5, 0]]})
+    assert response.status_code == 400
+    assert web.telemetry_store.labels == web.DEFAULT_LABELS
+
+    response = client.post('/telemetry', json={'samples': [[NOW, 'T Pose', 0.9, 0], [NOW + 1, 'Tree Pose', None, 1]]})
+    assert response.status_code == 200 and response.get_json()['recorded'] == 2
+
+
+def test_home_shows_the_mastered_poses(client):
+    if web.repository.get_user_by_email('ada@example.com') is None:
+        web.repository.create_user('Ada', 'ada@example.com', 'hash')
+    user_id = web.repository.get_user_by_email('ada@example.com')['id']
+    with client.session_transaction() as session:
+        session['id'] = user_id
+    web.repository.upsert_mastered_poses([(user_id, 'T Pose', datetime(2023, 11, 15)),
+                                          (user_id, 'Tree Pose', datetime(2023, 11, 16))])
+
+    page = client.get('/').get_data(as_text=True)
+    assert '<h3>2</h3>\n                <p>Poses mastered</p>' in page.replace('\r\n', '\n')
+
+
+def test_booking_errors_map_to_status_codes(client):
+    assert client.post('/classes/999/book').status_code == 404
+    assert client.post('/classes/999/cancel').status_code == 404
+
+    # A class that exists but is not open for booking, and a cancel without a booking, conflict with its state.
+    class_id = web.repository.create_class('Hatha', 'Instructor', datetime(2030, 1, 1), 60, 'Hatha')
+    assert client.post(f'/classes/{class_id}/book').status_code == 409
+    web.bookings.open_class(class_id, 1)
+    assert client.post(f'/classes/{class_id}/cancel').status_code == 409
@@ -0,0 +1,82 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from booking import BOOKED, WAITLISTED, BookingEngine, BookingError, ClassNotFound
+from repository import create_repository
+
+
+@pytest.fixture
+def repository(tmp_path):
+    repository = create_repository(f'sqlite:///{tmp_path / "yoga_ai.db"}', pool_size=16)
+    repository.init_schema()
+    repository.backend.execute_many('insert_user', [(f'User {user}', f'user{user}@example.com', '-', datetime.now())
+                                                    for user in range(40)])
+    yield repository
+    repository.close()
+
+
+def new_class(repository, engine, capacity):
+    class_id = repository.create_class('Hatha', 'Instructor', datetime.now() + timedelta(days=1), 60, 'Hatha')
+    engine.open_class(class_id, capacity)
+    return class_id
+
+
+def test_concurrent_bookings_never_oversell(repository):
+    engine = BookingEngine(repository)
+    class_id = new_class(repository, engine, 10)
+    barrier = threading.Barrier(40)
+    statuses = {}
+
+    def book(user_id):
+        barrier.wait()
+        statuses[user_id] = engine.book(class_id, user_id)
+
+    threads = [threading.Thread(target=book, args=(user_id,)) for user_id in range(1, 41)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(statuses.values()).count(BOOKED) == 10
+    assert engine.availability(class_id) == {'capacity': 10, 'booked': 10, 'waitlisted': 30}
+
+
+def test_cancelling_promotes_the_first_waitlisted_user(repository):
+    engine = BookingEngine(repository)
+    class_id = new_class(repository, engine, 2)
+    assert [engine.book(class_id, user_id) for user_id in (1, 2, 3, 4)] == [BOOKED, BOOKED, WAITLISTED, WAITLISTED]
+
+    assert engine.cancel(class_id, 1) == 3
+    assert engine.booking(class_id, 3)['status'] == BOOKED
+    # A waitlisted user leaving hands nothing over.
+    assert engine.cancel(class_id, 4) is None
+    assert engine.cancel(class_id, 2) is None
+    assert engine.availability(class_id) == {'capacity': 2, 'booked': 1, 'waitlisted': 0}
+
+
+def test_raising_the_capacity_promotes_the_waitlist(repository):
+    engine = BookingEngine(repository)
+    class_id = new_class(repository, engine, 1)
+    for user_id in (1, 2, 3):
+        engine.book(class_id, user_id)
+
+    assert engine.open_class(class_id, 5) == [2, 3]
+    assert engine.availability(class_id) == {'capacity': 5, 'booked': 3, 'waitlisted': 0}
+
+
+def test_unknown_classes_and_missing_bookings(repository):
+    engine = BookingEngine(repository)
+    with pytest.raises(ClassNotFound):
+        engine.book(999, 1)
+
+    class_id = repository.create_class('Hatha', 'Instructor', datetime.now() + timedelta(days=1), 60, 'Hatha')
+    with pytest.raises(BookingError) as error:
+        engine.book(class_id, 1)
+    assert not isinstance(error.value, ClassNotFound)
+
+    engine.open_class(class_id, 1)
+    with pytest.raises(BookingError) as error:
+        engine.cancel(class_id, 1)
+    assert not isinstance(error.value, ClassNotFound)
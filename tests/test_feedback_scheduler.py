@@ -0,0 +1,67 @@
+import threading
+from time import perf_counter, sleep
+
+from FeedbackScheduler import FeedbackScheduler
+
+# The longest a call of the loop into the scheduler may take, a thread switch but far below a frame.
+MAX_CALL_SECONDS = 0.05
+
+
+class HangingSink:
+    min_interval = 0.0
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Event()
+
+    def send(self, event):
+        self.started.set()
+        self.release.wait(10)
+
+
+class RecordingSink:
+    def __init__(self, min_interval, seconds=0.0):
+        self.min_interval = min_interval
+        self.seconds = seconds
+        self.events = []
+
+    def send(self, event):
+        self.events.append((perf_counter(), event))
+        sleep(self.seconds)
+
+
+def test_a_hanging_sink_never_blocks_the_loop():
+    sink = HangingSink()
+    scheduler = FeedbackScheduler([sink], queue_size=16, sink_queue_size=2)
+    slowest = 0.0
+    # A stand-in loop at 100 frames per second, with a new pose every 20 frames and a rep every 5
+    for frame in range(300):
+        timestamp = frame / 100
+        start = perf_counter()
+        scheduler.updatePose(('T Pose', 'Tree Pose', 'Unknown Pose')[frame // 20 % 3], timestamp)
+        scheduler.updateReps(frame // 5, timestamp=timestamp)
+        scheduler.emit('flow', 'demo', f'frame {frame}', timestamp)
+        slowest = max(slowest, perf_counter() - start)
+        sleep(0.001)
+
+    assert sink.started.is_set()
+    assert slowest < MAX_CALL_SECONDS
+    assert scheduler.stats['sinks'][0]['dropped'] > 0
+    sink.release.set()
+    scheduler.close(timeout=1.0)
+
+
+def test_events_wait_out_the_rate_limit_instead_of_being_dropped():
+    sink = RecordingSink(min_interval=0.2, seconds=0.1)
+    scheduler = FeedbackScheduler([sink])
+    for reps in range(1, 6):
+        scheduler.updateReps(reps, timestamp=reps * 0.05)
+        sleep(0.05)
+    scheduler.emit('pose', 'T Pose', 'T Pose achieved')
+    scheduler.close()
+
+    messages = [event.message for _, event in sink.events]
+    # The first rep goes out at once, the reps that came in meanwhile collapse into the newest one
+    assert messages == ['reps rep 1', 'reps rep 5', 'T Pose achieved']
+    times = [sent for sent, _ in sink.events]
+    assert all(later - earlier >= 0.2 + 0.1 - 0.01 for earlier, later in zip(times, times[1:]))
@@ -0,0 +1,32 @@
+import cv2
+import numpy as np
+
+from FrameRing import CapturedFrames, FrameRing
+
+
+def test_views_outlive_the_released_ring():
+    producer = FrameRing(slots=2, frame_shape=(4, 6, 3), consumers=1)
+    consumer = FrameRing(producer.name)
+    producer.write(np.full((4, 6, 3), 7, np.uint8))
+    frame, _ = consumer.read(0)
+
+    consumer.release()
+    producer.release()
+    # Unmapped memory would crash the process here.
+    assert frame.shape == (4, 6, 3) and int(frame.sum()) == 7 * frame.size
+
+
+def test_a_short_video_is_read_through_the_capture_process(tmp_path):
+    path = str(tmp_path / 'short.avi')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 10, (32, 24))
+    for value in (40, 120, 200):
+        writer.write(np.full((24, 32, 3), value, np.uint8))
+    writer.release()
+
+    frames = [frame.mean() for frame in CapturedFrames(path, width=None, height=None)]
+    assert len(frames) == 3
+    assert np.allclose(frames, [40, 120, 200], atol=3)
+
+    for frame in CapturedFrames(path, width=None, height=None):
+        pass
+    assert frame.shape == (24, 32, 3) and abs(frame.mean() - 200) <= 3
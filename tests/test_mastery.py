@@ -0,0 +1,72 @@
+import time
+
+import numpy as np
+
+from mastery import MasteryEvaluator, run_job
+from repository import create_repository
+from telemetry import TelemetryStore
+
+DAY = 1_700_006_400  # 2023-11-15 00:00:00 UTC
+
+
+def hold(store, start, seconds, label='T Pose', score=90.0):
+    store.append(1, start + np.arange(seconds), [label] * seconds, np.full(seconds, score))
+
+
+def evaluator(store, **options):
+    options = dict({'hold_seconds': 30, 'required_holds': 2}, **options)
+    return MasteryEvaluator(store, **options)
+
+
+def test_late_samples_complete_a_hold(tmp_path):
+    store = TelemetryStore(str(tmp_path))
+    hold(store, DAY + 1000, 20)
+    assert evaluator(store, required_holds=1).evaluate() == []
+
+    # The first seconds of the same hold arrive after the job ran.
+    hold(store, DAY + 985, 15)
+    mastery = evaluator(store, required_holds=1)
+    assert mastery.evaluate() == [('1', 'T Pose', DAY + 1019)]
+
+
+def test_a_hold_across_midnight_counts_once(tmp_path):
+    store = TelemetryStore(str(tmp_path))
+    hold(store, DAY + 86400 - 20, 40)
+    hold(store, DAY + 3000, 30)
+    mastery = evaluator(store)
+    assert mastery.evaluate() == [('1', 'T Pose', DAY + 86400 + 19)]
+    assert {day: state['holds'] for day, state in mastery.state['1']['days'].items()} == {
+        '2023-11-15': {'T Pose': [DAY + 3029]}, '2023-11-16': {'T Pose': [DAY + 86400 + 19]}}
+
+
+def test_holds_outlive_the_compacted_raw_samples(tmp_path):
+    store = TelemetryStore(str(tmp_path))
+    hold(store, DAY, 30)
+    mastery = evaluator(store)
+    assert mastery.evaluate() == []
+    mastery.save_state()
+
+    # The first hold's raw partition is dropped before the second hold comes in.
+    store.compact(now=DAY + 10 * 86400)
+    assert store.partition_rows(1, 'raw') == {}
+    hold(store, DAY + 10 * 86400, 30)
+    assert evaluator(store).evaluate() == [('1', 'T Pose', DAY + 10 * 86400 + 29)]
+
+
+def test_the_job_runs_before_every_compaction(tmp_path):
+    store = TelemetryStore(str(tmp_path))
+    repository = create_repository('sqlite:///:memory:')
+    repository.init_schema()
+    repository.create_user('Ada', 'ada@example.com', 'hash')
+    hold(store, DAY, 30)
+    hold(store, DAY + 100, 30)
+
+    store.start_compaction(interval=0.01, before_compact=lambda: run_job(store, repository, required_holds=2))
+    deadline = time.time() + 5
+    while store.partition_rows(1, 'raw') and time.time() < deadline:
+        time.sleep(0.01)
+    store.stop_compaction()
+
+    assert store.partition_rows(1, 'raw') == {}
+    assert repository.count_mastered_poses(1) == 1
+    repository.close()
@@ -0,0 +1,102 @@
+import numpy as np
+
+from MultiPersonPose import MultiPersonPoseDetector, Track, matchBoxes, padBoxes
+
+
+class ClosedPose:
+    # Stands in for the Pose function of a track, the tests only check that it gets reset and closed.
+    closed = False
+    resets = 0
+
+    def reset(self):
+        self.resets += 1
+
+    def close(self):
+        self.closed = True
+
+
+def standInDetector(detections, **options):
+    # A detector whose person detector finds the boxes of detections(frame_index), and whose tracks never find
+    # any landmarks, so they only coast on their boxes.
+    detector = MultiPersonPoseDetector(**options)
+    detector.detector_runs = []
+    detector.created = []
+
+    def detectPeople(frame):
+        detector.detector_runs.append(detector.frame_index)
+        return np.array(detections(detector.frame_index), dtype=float).reshape(-1, 4)
+
+    def newPose():
+        detector.created.append(ClosedPose())
+        return detector.created[-1]
+
+    detector.detectPeople = detectPeople
+    detector._processTrack = lambda track, frame: None
+    detector._newPose = newPose
+    return detector
+
+
+def test_detection_matches_the_padded_box_of_a_track():
+    # The tight box of the landmarks and the looser box of the person detector around the same person.
+    landmark_box = np.array([[100, 100, 160, 300]])
+    detection = np.array([[50, 50, 210, 350]])
+    assert matchBoxes(landmark_box, detection) == []
+    assert matchBoxes(padBoxes(landmark_box, 0.2), detection) == [(0, 0)]
+
+
+def test_duplicate_tracks_keep_the_one_with_landmarks():
+    detector = MultiPersonPoseDetector(pool_size=0)
+    poses = [ClosedPose() for _ in range(3)]
+    detector.tracks = [Track(1, [100, 100, 160, 300], poses[0]), Track(2, [102, 98, 161, 302], poses[1]),
+                       Track(3, [400, 100, 460, 300], poses[2])]
+    detector.tracks[0].missed = 1
+
+    detector._suppressDuplicates()
+    assert [track.track_id for track in detector.tracks] == [2, 3]
+    assert [pose.closed for pose in poses] == [True, False, False]
+    detector.close()
+
+
+def test_a_lost_track_coasts_until_the_next_detection():
+    detector = standInDetector(lambda frame_index: [[100, 100, 160, 300]], detect_every=15, max_missed=100)
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    for _ in range(30):
+        detector.process(frame)
+
+    # The person is confirmed on the second frame, then the lost track does not run the detector on every frame.
+    assert detector.detector_runs == [0, 1, 15]
+    assert [track.track_id for track in detector.tracks] == [1]
+    assert detector.tracks[0].missed == 29
+    detector.close()
+
+
+def test_a_flickering_detection_does_not_start_a_track():
+    # A false positive of the person detector, found on the periodic runs only.
+    detector = standInDetector(lambda frame_index: [[100, 100, 160, 300]] if frame_index % 15 == 0 else [],
+                               detect_every=15)
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    for _ in range(45):
+        detector.process(frame)
+
+    assert detector.tracks == []
+    assert detector.created == []
+    detector.close()
+
+
+def test_dropped_tracks_hand_their_pose_to_the_next_track():
+    detector = MultiPersonPoseDetector(pool_size=1)
+    poses = [ClosedPose() for _ in range(3)]
+    detector.tracks = [Track(1, [100, 100, 160, 300], poses[0]), Track(2, [102, 98, 161, 302], poses[1]),
+                       Track(3, [104, 99, 162, 301], poses[2])]
+
+    # Two duplicates are dropped, the pool keeps one of their poses and closes the other.
+    detector._suppressDuplicates()
+    assert [track.track_id for track in detector.tracks] == [1]
+    assert [pose.closed for pose in poses] == [False, False, True]
+
+    # The next track gets the pooled pose, reset for the new person.
+    assert detector._newPose() is poses[1]
+    assert poses[1].resets == 1
+    assert detector._pool == []
+    detector.close()
+    assert poses[0].closed
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from PoseScoring import alignPose, prepareTemplate, scorePose
+
+
+def makeLandmarks(generator, visibility):
+    # Random landmarks in pixel coordinates with the given visibility column.
+    return np.concatenate([generator.uniform(0, 640, (33, 2)), generator.uniform(-50, 50, (33, 1)),
+                           visibility[:, np.newaxis]], axis=1)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_identical_pose_scores_100_at_any_visibility(seed):
+    generator = np.random.default_rng(seed)
+    landmarks = makeLandmarks(generator, generator.uniform(0.05, 1.0, 33))
+    template = prepareTemplate(landmarks)
+
+    aligned, disparity = alignPose(landmarks, template)
+    score, deviations = scorePose(landmarks, template)
+
+    assert disparity == pytest.approx(0.0, abs=1e-9)
+    assert score == pytest.approx(100.0, abs=1e-6)
+    np.testing.assert_allclose(deviations, 0.0, atol=1e-9)
+    np.testing.assert_allclose(aligned, template.shape, atol=1e-9)
+
+
+def test_moved_scaled_and_rotated_pose_scores_100_with_different_visibility():
+    generator = np.random.default_rng(0)
+    reference = makeLandmarks(generator, generator.uniform(0.05, 1.0, 33))
+    template = prepareTemplate(reference)
+
+    # Rotate, scale and move the reference, and see it with a different visibility.
+    angle = np.radians(25)
+    rotation = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+    live = reference.copy()
+    live[:, :2] = reference[:, :2] @ rotation.T * 1.7 + (120, -40)
+    live[:, 3] = generator.uniform(0.05, 1.0, 33)
+
+    _, disparity = alignPose(live, template)
+    assert disparity == pytest.approx(0.0, abs=1e-9)
+
+
+def test_session_disparity_matches_single_frames():
+    generator = np.random.default_rng(3)
+    template = prepareTemplate(makeLandmarks(generator, generator.uniform(0.05, 1.0, 33)))
+    session = np.stack([makeLandmarks(generator, generator.uniform(0.05, 1.0, 33)) for _ in range(4)])
+
+    _, disparities = alignPose(session, template)
+    for frame, disparity in zip(session, disparities):
+        assert alignPose(frame, template)[1] == pytest.approx(disparity)
+    assert np.all((disparities > 0) & (disparities <= 1))
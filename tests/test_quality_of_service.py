@@ -0,0 +1,62 @@
+import pytest
+
+from QualityOfService import QOS_LEVELS, QoSController, QoSLevel
+
+
+def feed(qos, latency, frames):
+    # The number of the frame the level changed on, None if it did not change.
+    for frame in range(1, frames + 1):
+        if qos.update(latency):
+            return frame
+    return None
+
+
+def test_steps_down_after_down_frames_over_budget():
+    qos = QoSController(target_fps=10, down_frames=5)
+    assert feed(qos, 0.09, 100) is None
+    assert feed(qos, 0.15, 100) == 5
+    assert qos.level == QOS_LEVELS[1]
+
+
+def test_steps_up_only_after_up_frames_with_headroom():
+    qos = QoSController(target_fps=10, down_frames=5, up_frames=60, headroom=0.7)
+    feed(qos, 0.15, 5)
+    assert qos.index == 1
+
+    # The slowdown of the level above is measured once the average settled: 0.15 / 0.075 = 2.
+    assert feed(qos, 0.075, 5) is None
+
+    # Predicted at 0.02 * 2 = 40 ms above, under 70% of the budget once the average came down.
+    changed = feed(qos, 0.02, 200)
+    assert changed is not None and changed >= 60
+    assert qos.index == 0
+
+
+def test_keeps_the_level_without_headroom():
+    qos = QoSController(target_fps=10, down_frames=5, up_frames=60, headroom=0.7)
+    feed(qos, 0.15, 5)
+    feed(qos, 0.075, 5)
+
+    # Predicted at 0.05 * 2 = 100 ms above, over the budget, so the controller stays.
+    assert feed(qos, 0.05, 500) is None
+    assert qos.index == 1
+
+
+def test_skips_frames_at_a_skipping_level():
+    qos = QoSController(levels=(QoSLevel(360, 0, 3),))
+    assert [qos.shouldDetect() for _ in range(7)] == [True, False, False, True, False, False, True]
+
+
+def test_exclude_replaces_the_model_and_keeps_the_level():
+    qos = QoSController(target_fps=10, down_frames=1)
+    for _ in range(3):
+        qos.update(1.0)
+    assert qos.level == QoSLevel(360, 0, 1)
+
+    qos.exclude(0, 'no network')
+    assert qos.level == QoSLevel(360, 1, 1)
+    assert qos.levels == (QoSLevel(640, 1, 1), QoSLevel(480, 1, 1), QoSLevel(360, 1, 1), QoSLevel(360, 1, 2),
+                          QoSLevel(270, 1, 2), QoSLevel(270, 1, 3))
+
+    with pytest.raises(ValueError):
+        qos.exclude(1, 'no network')
@@ -0,0 +1,28 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from PoseLandmarks import LEFT_SHOULDER, LEFT_WRIST
+from RealTimePoseDetection import _SKELETON, detectPose
+
+
+class StandInPose:
+    '''Returns the same landmarks for every image, the left wrist hidden.'''
+
+    def process(self, image):
+        landmarks = [SimpleNamespace(x=0.2 + 0.015 * index, y=0.5, z=0.0, visibility=0.9) for index in range(33)]
+        landmarks[LEFT_WRIST].y, landmarks[LEFT_WRIST].visibility = 0.1, 0.1
+        return SimpleNamespace(pose_landmarks=SimpleNamespace(landmark=landmarks))
+
+
+def test_the_reused_skeleton_keeps_the_visibility():
+    image = np.zeros((100, 200, 3), np.uint8)
+    detected, landmarks, skeleton = detectPose(image, StandInPose(), display=False, return_skeleton=True)
+    assert skeleton.shape == (33, 4) and len(landmarks) == 33
+    assert skeleton[LEFT_WRIST, 3] < 0.5
+
+    # A skipped frame draws the cached skeleton, exactly like the detected frame, without the hidden wrist.
+    skipped = _SKELETON.draw(np.zeros_like(image), skeleton)
+    assert np.array_equal(skipped, detected)
+    wrist_x, shoulder_x = int(skeleton[LEFT_WRIST, 0]), int(skeleton[LEFT_SHOULDER, 0])
+    assert not skipped[10, wrist_x].any() and skipped[50, shoulder_x].any()
@@ -0,0 +1,128 @@
+import threading
+
+import pytest
+
+from repository import ConnectionPool, DatabaseError, IntegrityError, SQLiteBackend, create_repository
+
+
+@pytest.fixture(params=['memory', 'file'])
+def repository(request, tmp_path):
+    url = 'sqlite:///:memory:' if request.param == 'memory' else f'sqlite:///{tmp_path / "yoga_ai.db"}'
+    repository = create_repository(url, pool_size=4)
+    repository.init_schema()
+    yield repository
+    repository.close()
+
+
+def run_with_timeout(target, timeout=5):
+    # A deadlock fails the test instead of hanging the run.
+    errors = []
+
+    def run():
+        try:
+            target()
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), 'deadlocked'
+    if errors:
+        raise errors[0]
+
+
+def test_statements_inside_a_transaction_join_it(repository):
+    backend = repository.backend
+
+    def book():
+        with backend.transaction() as transaction:
+            transaction.insert('insert_user', ('Ada', 'ada@example.com', 'hash', None))
+            # The repository's own queries see the uncommitted row and are rolled back with it.
+            assert repository.get_user_by_email('ada@example.com')['full_name'] == 'Ada'
+            repository.create_user('Grace', 'grace@example.com', 'hash')
+            with backend.transaction() as nested:
+                assert nested is transaction
+            raise RuntimeError('abort')
+
+    with pytest.raises(RuntimeError):
+        run_with_timeout(book)
+    assert repository.list_users() == []
+
+
+def test_constraint_violations(repository):
+    repository.create_user('Ada', 'ada@example.com', 'hash')
+    with pytest.raises(IntegrityError):
+        with repository.backend.transaction() as transaction:
+            transaction.insert('insert_user', ('Ada', 'ada@example.com', 'hash', None))
+
+    # A failed query outside a transaction neither loses the database nor the connection.
+    with pytest.raises(DatabaseError):
+        repository.create_user('Ada', 'ada@example.com', 'hash')
+    assert [user['email'] for user in repository.list_users()] == ['ada@example.com']
+
+
+def test_concurrent_writes_all_land(repository):
+    def sign_up(worker):
+        for index in range(20):
+            repository.create_user('User', f'user{worker}.{index}@example.com', 'hash')
+
+    threads = [threading.Thread(target=sign_up, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(repository.list_users()) == 160
+
+
+def test_statements_are_translated_once():
+    backend = SQLiteBackend(':memory:')
+    sql = backend.statement('user_by_email')
+    assert sql == 'SELECT * FROM users WHERE email = ?'
+    assert backend.statement('user_by_email') is sql
+    # The backend's own dialect replaces the shared statement.
+    assert 'ON CONFLICT' in backend.statement('upsert_mastered_pose')
+    backend.close()
+
+
+class StandInConnection:
+    def __init__(self, number):
+        self.number = number
+        self.closed = self.rolled_back = False
+
+    def close(self):
+        self.closed = True
+
+    def rollback(self):
+        self.rolled_back = True
+
+
+def test_pool_reuses_the_last_connection_and_drops_failed_ones():
+    opened = []
+
+    def connect():
+        opened.append(StandInConnection(len(opened)))
+        return opened[-1]
+
+    checked = []
+    pool = ConnectionPool(connect, size=2, check=checked.append, check_after=0)
+    with pool.connection() as first, pool.connection() as second, pool.connection() as third:
+        pass
+    # The pool keeps the two connections returned first, the last one returned is closed.
+    assert [conn.closed for conn in (first, second, third)] == [True, False, False]
+
+    # The connection returned last is handed out first, and checked after being idle.
+    with pool.connection() as conn:
+        assert conn is second and checked == [second]
+
+    # A connection a query failed on is closed, unless it holds the database.
+    with pytest.raises(ValueError), pool.connection() as conn:
+        raise ValueError
+    assert conn.closed
+
+    pool = ConnectionPool(connect, size=1, close_on_error=False)
+    with pytest.raises(ValueError), pool.connection() as conn:
+        raise ValueError
+    assert conn.rolled_back and not conn.closed
+    with pool.connection() as again:
+        assert again is conn
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+
+from repository import create_repository
+from schedule import ScheduleIndex
+
+NOW = datetime(2024, 5, 1, 8, 0)
+
+
+def worker(path):
+    # One repository and index per worker process, sharing the database file.
+    repository = create_repository(f'sqlite:///{path}')
+    repository.init_schema()
+    return repository, ScheduleIndex(repository, check_interval=0)
+
+
+def names(index):
+    return [row['name'] for row in index.next_classes(now=NOW)]
+
+
+def test_writes_of_one_worker_reach_the_index_of_another(tmp_path):
+    path = tmp_path / 'yoga_ai.db'
+    repository_a, index_a = worker(path)
+    repository_b, index_b = worker(path)
+
+    class_id = index_a.create_class('Hatha', 'Asha', NOW + timedelta(hours=1), 60, 'hatha')
+    assert names(index_a) == names(index_b) == ['Hatha']
+
+    index_a.update_class(class_id, 'Vinyasa', 'Asha', NOW + timedelta(hours=2), 60, 'vinyasa')
+    assert names(index_b) == ['Vinyasa']
+
+    # Writes straight to the repository, e.g. an admin script, are seen as well.
+    repository_b.create_class('Yin', 'Ravi', NOW + timedelta(minutes=30), 45, 'yin')
+    assert names(index_a) == names(index_b) == ['Yin', 'Vinyasa']
+
+    index_b.delete_class(class_id)
+    assert names(index_a) == ['Yin']
+    repository_a.close()
+    repository_b.close()
+
+
+def test_cached_reads_make_no_queries(tmp_path, monkeypatch):
+    repository = create_repository(f'sqlite:///{tmp_path / "yoga_ai.db"}')
+    repository.init_schema()
+    index = ScheduleIndex(repository, check_interval=60)
+    index.create_class('Hatha', 'Asha', NOW + timedelta(hours=1), 60, 'hatha')
+    assert names(index) == ['Hatha']
+
+    queries = []
+    run = repository.backend._run
+
+    def counted_run(name, *args, **kwargs):
+        queries.append(name)
+        return run(name, *args, **kwargs)
+    monkeypatch.setattr(repository.backend, '_run', counted_run)
+    for _ in range(100):
+        assert names(index) == ['Hatha']
+    assert queries == []
+
+    # Once check_interval has passed a read checks the generation, and only reloads if it changed
+    index._checked_at -= 60
+    assert names(index) == ['Hatha']
+    assert queries == ['generation']
+    repository.close()
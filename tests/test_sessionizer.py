@@ -0,0 +1,73 @@
+from repository import create_repository
+from sessionizer import MemorySessionStore, RepositorySessionStore, Sessionizer
+
+START = 1_700_000_000
+
+
+def test_session_closes_after_idle_gap():
+    closed = []
+    sessionizer = Sessionizer(closed.append, MemorySessionStore())
+    sessionizer.observe_many(1, range(START, START + 90), ['T Pose'] * 90, now=START + 89)
+    sessionizer.expire(START + 150)
+    assert closed == []
+
+    sessionizer.expire(START + 300)
+    assert [(s['user_id'], s['start'], s['end']) for s in closed] == [(1, START, START + 89)]
+    assert closed[0]['pose_seconds'] == {'T Pose': 89}
+
+
+def test_workers_share_the_sessions_of_a_user(tmp_path):
+    closed = []
+    repositories = [create_repository(f'sqlite:///{tmp_path / "yoga_ai.db"}') for _ in range(2)]
+    repositories[0].init_schema()
+    # One sessionizer per worker process, a user's telemetry batches land on either of them
+    workers = [Sessionizer(closed.append, RepositorySessionStore(repository)) for repository in repositories]
+    for batch in range(4):
+        timestamps = range(START + batch * 30, START + (batch + 1) * 30)
+        workers[batch % 2].observe_many(7, timestamps, ['Tree Pose'] * 30, now=timestamps[-1])
+
+    # Both workers expire, the session is emitted once, as one session of two minutes
+    for worker in workers:
+        worker.expire(START + 400)
+    assert len(closed) == 1
+    assert (closed[0]['start'], closed[0]['end'], closed[0]['duration_minutes']) == (START, START + 119, 2)
+    assert closed[0]['pose_seconds'] == {'Tree Pose': 119}
+    for repository in repositories:
+        repository.close()
+
+
+def test_expiry_follows_the_server_clock():
+    closed = []
+    sessionizer = Sessionizer(closed.append, MemorySessionStore())
+    # One client's clock is an hour behind the server, the other's an hour ahead.
+    for user_id, skew in ((1, -3600), (2, 3600)):
+        sessionizer.observe_many(user_id, range(START + skew, START + skew + 90), ['T Pose'] * 90, now=START + 89)
+
+    # Neither is closed while active, and both are closed idle_gap after their last pose arrived.
+    sessionizer.expire(START + 150)
+    assert closed == []
+    sessionizer.observe_many(1, range(START - 3600 + 90, START - 3600 + 200), ['T Pose'] * 110, now=START + 199)
+    sessionizer.expire(START + 300)
+    assert [s['user_id'] for s in closed] == [2]
+    sessionizer.expire(START + 400)
+    assert [(s['user_id'], s['end']) for s in closed] == [(2, START + 3689), (1, START - 3600 + 199)]
+
+
+def test_a_lost_write_is_replayed():
+    closed = []
+    store = MemorySessionStore()
+    sessionizer = Sessionizer(closed.append, store)
+    sessionizer.observe_many(3, range(START, START + 60), ['T Pose'] * 60)
+
+    # Another worker writes the session between this worker's load and save
+    load = store.load
+    def racing_load(user_id):
+        session, version = load(user_id)
+        store.load = load
+        Sessionizer(closed.append, store).observe(user_id, START + 60, 'Tree Pose')
+        return session, version
+    store.load = racing_load
+
+    sessionizer.observe_many(3, range(START + 61, START + 90), ['T Pose'] * 29)
+    sessionizer.flush()
+    assert closed[0]['end'] == START + 89 and closed[0]['pose_seconds'] == {'T Pose': 88, 'Tree Pose': 1}
@@ -0,0 +1,137 @@
+import multiprocessing
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from telemetry import DEFAULT_LABELS, ROLLUP_COLUMNS, TelemetryStore
+
+DAY = 1_700_006_400  # 2023-11-15 00:00:00 UTC
+
+
+def fill(root):
+    store = TelemetryStore(str(root))
+    # Two appends over the same minutes give duplicate rollup rows for compact() to merge.
+    for _ in range(2):
+        store.append(1, DAY + np.arange(120), ['T Pose'] * 60 + ['Tree Pose'] * 60, reps=np.ones(120))
+    return store
+
+
+def test_half_appended_rows_are_cut_off_on_open(tmp_path):
+    store = fill(tmp_path)
+    path = store._path(1, 'raw', '2023-11-15')
+
+    # A crash in the middle of an append: the first column got a row the others did not.
+    with open(os.path.join(path, 'ts'), 'ab') as f:
+        f.write(np.int64(DAY + 500).tobytes())
+    assert len(store.read(1, 'raw', DAY, DAY + 86400)['ts']) == 240
+
+    store = TelemetryStore(str(tmp_path))
+    assert os.path.getsize(os.path.join(path, 'ts')) == 240 * 8
+    store.append(1, [DAY + 600], ['T Pose'])
+    raw = store.read(1, 'raw', DAY, DAY + 86400)
+    assert raw['ts'][-1] == DAY + 600 and len(raw['label']) == len(raw['ts']) == 241
+
+
+def crash_merge(store, resolution, partition, merged):
+    # Run a merge, then put the directories back the way a crash between the two renames leaves them.
+    path = store._path(1, resolution, partition)
+    shutil.copytree(path, path + '.before')
+    store.compact(now=DAY)
+    os.rename(path + '.before', path + '.old')
+    if merged:
+        os.rename(path, path + '.tmp')
+    else:
+        shutil.rmtree(path)
+        os.makedirs(path + '.tmp')
+        with open(os.path.join(path + '.tmp', 'bucket'), 'wb') as f:
+            f.write(b'\0' * 8)
+
+
+def test_interrupted_merge_is_finished_on_open(tmp_path):
+    store = fill(tmp_path)
+    expected = store.pose_seconds(1, 'T Pose', DAY, DAY + 86400)
+    crash_merge(store, 'minute', '2023-11-15', merged=True)
+
+    store = TelemetryStore(str(tmp_path))
+    assert sorted(os.listdir(store._path(1, 'minute'))) == ['2023-11-15']
+    assert len(store.read(1, 'minute', DAY, DAY + 86400)['bucket']) == 2
+    assert store.pose_seconds(1, 'T Pose', DAY, DAY + 86400) == expected == 120
+
+
+def test_merge_without_complete_rows_falls_back_to_the_old_partition(tmp_path):
+    store = fill(tmp_path)
+    crash_merge(store, 'minute', '2023-11-15', merged=False)
+
+    store = TelemetryStore(str(tmp_path))
+    assert sorted(os.listdir(store._path(1, 'minute'))) == ['2023-11-15']
+    rows = store.read(1, 'minute', DAY, DAY + 86400)
+    assert len(rows['bucket']) == 4
+    assert set(rows) == set(ROLLUP_COLUMNS)
+    assert store.pose_seconds(1, 'T Pose', DAY, DAY + 86400) == 120
+
+
+def test_a_crash_while_saving_labels_keeps_the_old_labels(tmp_path, monkeypatch):
+    store = TelemetryStore(str(tmp_path))
+
+    def crash(*args, **kwargs):
+        raise OSError('crashed while writing')
+    monkeypatch.setattr('telemetry.json.dump', crash)
+    with pytest.raises(OSError):
+        store.label_code('Side Plank')
+    monkeypatch.undo()
+
+    assert TelemetryStore(str(tmp_path)).labels == DEFAULT_LABELS
+
+
+def store_bytes(root):
+    return sum(os.path.getsize(os.path.join(path, name)) for path, _, names in os.walk(root) for name in names)
+
+
+def test_storage_stays_bounded_when_compacted(tmp_path):
+    store = TelemetryStore(str(tmp_path), raw_retention_days=2, minute_retention_days=5)
+    sizes = []
+    for day in range(40):
+        # A practice minute every hour, sent in two batches over the same minutes
+        for hour in range(24):
+            start = DAY + day * 86400 + hour * 3600
+            for _ in range(2):
+                store.append(1, start + np.arange(60), ['T Pose'] * 30 + ['Tree Pose'] * 30, reps=np.ones(60))
+        store.compact(now=DAY + (day + 1) * 86400)
+        sizes.append(store_bytes(tmp_path))
+
+    assert len(store._partitions(1, 'raw')) <= 3 and len(store._partitions(1, 'minute')) <= 6
+    for resolution in ('minute', 'day', 'month'):
+        rows = store.read(1, resolution, 0, 2 ** 40)
+        assert len(np.unique(rows['bucket'] * 256 + rows['label'])) == len(rows['bucket'])
+    # Only the day and month rollups keep growing, by a row per label and day
+    assert sizes[-1] - sizes[9] < 30 * 2 * 32 + 1024
+
+
+def append_from_process(root, worker):
+    # Every process gives a new label its code and appends its own seconds of the same user.
+    store = TelemetryStore(root)
+    for batch in range(20):
+        start = DAY + worker * 1000 + batch * 10
+        store.append(1, start + np.arange(10), [f'Pose {worker}'] * 10)
+
+
+def test_processes_share_a_store(tmp_path):
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=append_from_process, args=(str(tmp_path), worker)) for worker in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert [process.exitcode for process in processes] == [0] * 4
+
+    store = TelemetryStore(str(tmp_path))
+    assert sorted(store.labels[len(DEFAULT_LABELS):]) == [f'Pose {worker}' for worker in range(4)]
+    raw = store.read(1, 'raw', DAY, DAY + 86400)
+    assert len(raw['ts']) == 800
+    for worker in range(4):
+        seconds = (raw['ts'] >= DAY + worker * 1000) & (raw['ts'] < DAY + worker * 1000 + 200)
+        assert seconds.sum() == 200
+        assert {store.labels[code] for code in raw['label'][seconds]} == {f'Pose {worker}'}
+        assert store.pose_seconds(1, f'Pose {worker}', DAY, DAY + 86400) == 200
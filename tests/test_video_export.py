@@ -0,0 +1,52 @@
+import cv2
+import numpy as np
+
+from VideoExport import AnnotatedVideoWriter
+
+
+def write_video(path, frames, size=(64, 48)):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 10, size)
+    for value in np.linspace(30, 200, frames):
+        writer.write(np.full((size[1], size[0], 3), value, np.uint8))
+    writer.release()
+
+
+def read_video(path):
+    video = cv2.VideoCapture(path)
+    frames = []
+    while True:
+        ok, frame = video.read()
+        if not ok:
+            break
+        frames.append(frame)
+    video.release()
+    return frames
+
+
+def test_written_frames_read_back_annotated(tmp_path):
+    path = str(tmp_path / 'annotated.mp4')
+    landmarks = np.zeros((33, 4))
+    landmarks[:, 0], landmarks[:, 1], landmarks[:, 3] = np.linspace(20, 140, 33), 60, 1.0
+
+    with AnnotatedVideoWriter(path, 10, (160, 120)) as writer:
+        for _ in range(4):
+            writer.write(np.zeros((120, 160, 3), np.uint8), landmarks, label='T Pose', reps=3)
+        # A frame of another size, like after a quality of service step, is scaled to the video size.
+        writer.write(np.zeros((60, 80, 3), np.uint8))
+
+    frames = read_video(path)
+    assert len(frames) == 5 and all(frame.shape == (120, 160, 3) for frame in frames)
+    # The skeleton and the label are drawn, the scaled blank frame stays black.
+    assert frames[0][58:63, 20:140].max() > 100 and frames[0][:40, :120].max() > 100
+    assert frames[4].max() < 40
+
+
+def test_the_live_loop_records_headless(tmp_path):
+    from RealTimePoseDetection import runPoseClassification
+
+    source, output = str(tmp_path / 'source.mp4'), str(tmp_path / 'live.mp4')
+    write_video(source, 6)
+    runPoseClassification(source, target_fps=0, headless=True, record=output)
+
+    frames = read_video(output)
+    assert len(frames) == 6
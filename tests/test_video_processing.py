@@ -0,0 +1,12 @@
+from VideoProcessing import planSegments
+
+
+def test_segments_cover_every_frame_once():
+    segments = planSegments(1000, 300, 30, keyframes=[0, 250, 310, 640, 900])
+    assert [(start, end) for _, start, end in segments] == [(0, 310), (310, 640), (640, 900), (900, 1000)]
+    assert all(decode_start <= max(start - 30, 0) for decode_start, start, _ in segments)
+
+
+def test_no_frames_give_no_segments():
+    assert planSegments(0, 300, 30) == []
+    assert planSegments(-1, 300, 30, keyframes=[0]) == []
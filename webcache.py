@@ -0,0 +1,104 @@
+# webcache.py
+#
+# HTTP caching for the public pages and the static assets.
+#
+# The public pages (/About, /watch, /try_now, /Camera) have no per-request context, so PageCache renders each of
+# them once and keeps the bytes in memory together with an ETag (a hash of the bytes) and a Last-Modified time
+# (the template's mtime). Responses carry both, and a conditional GET whose If-None-Match or If-Modified-Since
+# still matches gets an empty 304 instead of the page.
+#
+# Static files are fingerprinted: url_for('static', filename=...) adds a v=<content hash> argument, and a static
+# response requested with the current hash is cached by browsers for a year. Changing a file changes its URL, so
+# a stale copy is never used.
+
+import hashlib
+import os
+import threading
+from datetime import datetime, timezone
+
+from flask import Response, render_template, request
+
+STATIC_MAX_AGE = 365 * 24 * 3600
+
+
+class PageCache:
+    """Rendered context-free templates with their ETag and Last-Modified time."""
+
+    def __init__(self, app, max_age=300):
+        self.app = app
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._pages = {}
+
+    def _template_mtime(self, name):
+        return os.path.getmtime(os.path.join(self.app.root_path, self.app.template_folder, name))
+
+    def _render(self, name):
+        mtime = self._template_mtime(name)
+        body = render_template(name).encode('utf-8')
+        # HTTP dates have a resolution of one second
+        last_modified = datetime.fromtimestamp(int(mtime), timezone.utc)
+        return body, hashlib.sha1(body).hexdigest()[:16], last_modified, mtime
+
+    def page(self, name):
+        """The cached (body, etag, last_modified, mtime) of a template, re-rendered in debug mode when it changed."""
+        page = self._pages.get(name)
+        if page is None or (self.app.debug and self._template_mtime(name) != page[3]):
+            with self._lock:
+                page = self._pages[name] = self._render(name)
+        return page
+
+    def response(self, name):
+        """The page as a response, or a 304 when the client's copy is current."""
+        body, etag, last_modified, _ = self.page(name)
+        response = Response(body, mimetype='text/html')
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.cache_control.public = True
+        response.cache_control.max_age = self.max_age
+        return response.make_conditional(request)
+
+
+class AssetVersions:
+    """Content hashes of the files in a static folder, recomputed when a file's mtime changes."""
+
+    def __init__(self, folder):
+        self.folder = folder
+        self._hashes = {}
+
+    def version(self, filename):
+        path = os.path.join(self.folder, filename)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        cached = self._hashes.get(filename)
+        if cached is None or cached[0] != mtime:
+            with open(path, 'rb') as f:
+                cached = self._hashes[filename] = (mtime, hashlib.sha1(f.read()).hexdigest()[:12])
+        return cached[1]
+
+
+def init_app(app, page_max_age=300):
+    """Add fingerprinted static URLs and long-lived static cache headers to an app, return its PageCache."""
+    versions = AssetVersions(app.static_folder)
+
+    @app.url_defaults
+    def fingerprint_static(endpoint, values):
+        if endpoint == 'static' and 'filename' in values and 'v' not in values:
+            version = versions.version(values['filename'])
+            if version is not None:
+                values['v'] = version
+
+    @app.after_request
+    def cache_static(response):
+        if request.endpoint == 'static' and response.status_code in (200, 304):
+            version = request.args.get('v')
+            if version is not None and version == versions.version(request.view_args['filename']):
+                response.cache_control.no_cache = None
+                response.cache_control.public = True
+                response.cache_control.max_age = STATIC_MAX_AGE
+                response.cache_control.immutable = True
+        return response
+
+    return PageCache(app, page_max_age)
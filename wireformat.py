@@ -0,0 +1,194 @@
+# wireformat.py
+#
+# Versioned binary frames for sending pose landmarks between a client and the server.
+#
+# A frame holds the landmarks of one person in one video frame, as detectPose produces them: 33 rows of pixel
+# (x, y, z) and optionally a visibility column. JSON of those tuple lists takes about 2 KB per frame; a binary
+# keyframe takes 245 bytes and a delta frame 146.
+#
+# Every frame starts with a 14 byte little-endian header:
+#
+#     magic       2s       b'LM'
+#     version     uint8    WIRE_VERSION
+#     flags       uint8    DELTA, NO_PERSON, and the delta shift in the high 4 bits
+#     count       uint16   number of landmarks
+#     sequence    uint32   frame number of the stream, delta frames apply to the frame sequence - 1
+#     resolution  float32  pixels per quantization step
+#
+# followed, unless NO_PERSON is set, by count * 3 coordinates and count visibilities (0-255). Keyframes store
+# the coordinates as int16 multiples of the resolution; delta frames store int8 differences to the previous
+# frame in steps of resolution * 2 ** shift. The encoder picks the smallest shift up to max_delta_shift at which
+# every difference fits in an int8 and sends a keyframe when none does, and at least every keyframe_interval
+# frames so a receiver that missed frames can resynchronize. The differences are taken to the frame the decoder
+# reconstructs, so the rounding error of delta frames stays within half a step and does not add up.
+#
+# Encoding and decoding work on NumPy views of the message buffer, no per-landmark Python objects are created.
+#
+# Usage:
+#     encoder, decoder = LandmarkEncoder(), LandmarkDecoder()
+#     message = encoder.encode(landmarks)
+#     landmarks = decoder.decode(message)
+
+import struct
+
+import numpy as np
+
+WIRE_VERSION = 1
+MAGIC = b'LM'
+HEADER = struct.Struct('<2sBBHIf')
+
+DELTA = 1
+NO_PERSON = 2
+SHIFT_BITS = 4
+
+# 1/16 pixel steps keep the int16 coordinates within +-2048 pixels.
+DEFAULT_RESOLUTION = 1 / 16
+
+
+class WireFormatError(ValueError):
+    pass
+
+
+def frame_size(count, flags):
+    """The size in bytes of a frame of count landmarks with the given flags."""
+    if flags & NO_PERSON:
+        return HEADER.size
+    return HEADER.size + count * 3 * (1 if flags & DELTA else 2) + count
+
+
+def split_frames(buffer):
+    """Yield a memoryview of every frame of a buffer holding consecutive frames, without copying them."""
+    view = memoryview(buffer)
+    offset = 0
+    while offset < len(view):
+        if len(view) - offset < HEADER.size:
+            raise WireFormatError('Truncated frame header')
+        _, _, flags, count, _, _ = HEADER.unpack_from(view, offset)
+        size = frame_size(count, flags)
+        if len(view) - offset < size:
+            raise WireFormatError('Truncated frame')
+        yield view[offset:offset + size]
+        offset += size
+
+
+def quantize(landmarks, resolution=DEFAULT_RESOLUTION):
+    """Return the int16 coordinates and uint8 visibilities of an array of (x, y, z[, visibility]) landmarks."""
+    landmarks = np.asarray(landmarks, dtype=np.float32)
+    coordinates = np.clip(np.rint(landmarks[:, :3] / resolution), -32768, 32767).astype(np.int16)
+    if landmarks.shape[1] > 3:
+        visibility = np.rint(np.clip(landmarks[:, 3], 0, 1) * 255).astype(np.uint8)
+    else:
+        visibility = np.full(len(landmarks), 255, dtype=np.uint8)
+    return coordinates, visibility
+
+
+class LandmarkEncoder:
+    """Encodes the landmarks of consecutive frames of one stream."""
+
+    def __init__(self, resolution=DEFAULT_RESOLUTION, keyframe_interval=30, max_delta_shift=3):
+        self.resolution = resolution
+        self.keyframe_interval = keyframe_interval
+        self.max_delta_shift = max_delta_shift
+        self.sequence = 0
+        self._previous = None
+        self._since_keyframe = 0
+
+    def encode(self, landmarks):
+        """Return the frame of the landmarks of the next video frame, an empty list or None if nobody was found."""
+        count = len(landmarks) if landmarks is not None else 0
+        buffer = bytearray(frame_size(count, 0))
+        size = self.encode_into(buffer, 0, landmarks)
+        del buffer[size:]
+        return bytes(buffer)
+
+    def encode_into(self, buffer, offset, landmarks):
+        """Write the frame of the landmarks into a writable buffer at offset and return its size."""
+        sequence = self.sequence
+        self.sequence = (self.sequence + 1) & 0xFFFFFFFF
+
+        if landmarks is None or len(landmarks) == 0:
+            # The next person found starts from a keyframe.
+            self._previous = None
+            HEADER.pack_into(buffer, offset, MAGIC, WIRE_VERSION, NO_PERSON, 0, sequence, self.resolution)
+            return HEADER.size
+
+        coordinates, visibility = quantize(landmarks, self.resolution)
+        count = len(coordinates)
+        flags = 0
+        if self._previous is not None and len(self._previous) == count \
+                and self._since_keyframe < self.keyframe_interval:
+            difference = coordinates.astype(np.int32) - self._previous
+            largest = max(-int(difference.min()), int(difference.max()))
+            shift = 0
+            while shift < self.max_delta_shift and (largest + (1 << shift >> 1)) >> shift > 127:
+                shift += 1
+            # Round the differences to the nearest step.
+            delta = np.right_shift(difference + (1 << shift >> 1), shift)
+            if delta.min() >= -128 and delta.max() <= 127:
+                flags = DELTA | shift << SHIFT_BITS
+
+        size = frame_size(count, flags)
+        HEADER.pack_into(buffer, offset, MAGIC, WIRE_VERSION, flags, count, sequence, self.resolution)
+        start = offset + HEADER.size
+        if flags & DELTA:
+            np.frombuffer(buffer, np.int8, count * 3, start).reshape(count, 3)[:] = delta
+            # Continue from what the decoder reconstructs.
+            self._previous += np.left_shift(delta, shift)
+            self._since_keyframe += 1
+            start += count * 3
+        else:
+            np.frombuffer(buffer, np.int16, count * 3, start).reshape(count, 3)[:] = coordinates
+            self._previous = coordinates.astype(np.int32)
+            self._since_keyframe = 1
+            start += count * 6
+        np.frombuffer(buffer, np.uint8, count, start)[:] = visibility
+        return size
+
+
+class LandmarkDecoder:
+    """Decodes the frames of one stream, keeping the last frame the delta frames apply to."""
+
+    def __init__(self):
+        self.sequence = None
+        self._previous = None
+
+    def decode(self, frame, out=None):
+        """
+        Return the landmarks of a frame as a (count, 4) float32 array of pixel x, y, z and visibility (0-1), or
+        None for a frame without a person. out is an optional array to write the landmarks into.
+        """
+        view = memoryview(frame)
+        if len(view) < HEADER.size:
+            raise WireFormatError('Truncated frame header')
+        magic, version, flags, count, sequence, resolution = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise WireFormatError('Not a landmark frame')
+        if version != WIRE_VERSION:
+            raise WireFormatError(f'Unsupported landmark frame version {version}')
+        if len(view) < frame_size(count, flags):
+            raise WireFormatError('Truncated frame')
+
+        previous_sequence, self.sequence = self.sequence, sequence
+        if flags & NO_PERSON:
+            self._previous = None
+            return None
+
+        if flags & DELTA:
+            if self._previous is None or len(self._previous) != count \
+                    or (previous_sequence + 1) & 0xFFFFFFFF != sequence:
+                # Wait for the next keyframe.
+                self._previous = None
+                raise WireFormatError(f'Delta frame {sequence} does not follow the last decoded frame')
+            delta = np.frombuffer(view, np.int8, count * 3, HEADER.size).reshape(count, 3)
+            coordinates = self._previous + np.left_shift(delta.astype(np.int32), flags >> SHIFT_BITS)
+            start = HEADER.size + count * 3
+        else:
+            coordinates = np.frombuffer(view, np.int16, count * 3, HEADER.size).reshape(count, 3).astype(np.int32)
+            start = HEADER.size + count * 6
+        self._previous = coordinates
+
+        if out is None:
+            out = np.empty((count, 4), dtype=np.float32)
+        np.multiply(coordinates, resolution, out=out[:, :3], casting='unsafe')
+        np.multiply(np.frombuffer(view, np.uint8, count, start), 1 / 255, out=out[:, 3], casting='unsafe')
+        return out